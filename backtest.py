@@ -0,0 +1,249 @@
+"""
+File: backtest.py
+Description: Measures how accurate each source's projections were, by
+             joining them to pro-football-reference.com actuals
+"""
+
+import numpy as np
+import pandas as pd
+
+from player_ids import normalize_name, normalize_position
+import scoring
+
+
+# Columns the error aggregates are kept by. Any coarser breakdown is summed
+# from these
+GROUP_COLUMNS = ["source", "year", "week", "Pos", "stat"]
+
+# Sums kept per group, from which every metric is computed
+_SUM_COLUMNS = ["n", "sum_error", "sum_abs_error", "sum_squared_error",
+                "rank_sum_xy", "rank_sum_xx", "rank_sum_yy"]
+
+# dtypes of the aggregates, so that empty ones concatenate without casting
+_SUM_DTYPES = {"source": "object", "year": "int64", "week": "int64",
+               "Pos": "object", "stat": "object", "n": "int64",
+               **{column: "float64" for column in _SUM_COLUMNS[1:]}}
+
+# Join keys used when players have no IDs
+_NAME_KEY_COLUMNS = ["_Name", "_Pos"]
+
+
+class Backtester:
+    """
+    Compares projections to actuals per player-week. Fantasy points are
+    scored with the same rule set for both, and any other stat columns given
+    are compared as they are. For each (source, year, week, position, stat)
+    only sufficient statistics are kept (counts and sums of errors, absolute
+    errors, squared errors and rank products), so MAE, RMSE, bias and rank
+    correlation for any breakdown are sums over those groups, and adding a
+    week of actuals only computes that week.
+
+    Rank correlation is Spearman's correlation within each (source, year,
+    week, position), averaged over groups weighted by their number of
+    players.
+    """
+
+    def __init__(self, rule_set="ppr", stats=None, key_columns=None):
+        """
+        :param rule_set: the name of a scoring.RULE_SETS rule set, or a rule
+                         set, used to score both projections and actuals
+        :param stats: other stat columns to compare (e.g. ["Pass Yd"])
+        :param key_columns: the columns identifying a player. Defaults to
+                            "Player ID" (see player_ids) if both sides have
+                            it, otherwise the normalized name and position
+        """
+        if isinstance(rule_set, str):
+            rule_set = scoring.RULE_SETS[rule_set]
+        self._engine = scoring.ScoringEngine({"Points": rule_set})
+        self.stats = list(stats or [])
+        self.key_columns = None if key_columns is None else list(key_columns)
+
+        self._sums = _get_empty_sums()
+
+    def compute(self, projections, actuals):
+        """
+        Recomputes the aggregates of every week at once
+
+        :param projections: DataFrame of every source's projections, with
+                            source, year and week columns (like
+                            columnar_store.load_projections returns)
+        :param actuals: DataFrame of actual stats with year and week columns
+        :return: self
+        """
+        self._sums = self._get_sums(projections, actuals)
+        return self
+
+    def add_week(self, projections, actuals, year, week):
+        """
+        Adds (or replaces) one week's aggregates, leaving the others as they
+        are
+
+        :param projections: DataFrame of every source's projections for the
+                            week, with a source column
+        :param actuals: DataFrame of the week's actual stats (e.g. from
+                        pro_football_reference.scrape)
+        :param year: the year
+        :param week: the week
+        :return: self
+        """
+        projections = projections.assign(year=int(year), week=int(week))
+        actuals = actuals.assign(year=int(year), week=int(week))
+        week_sums = self._get_sums(projections, actuals)
+
+        is_week = (self._sums["year"] == int(year)) & \
+            (self._sums["week"] == int(week))
+        frames = [frame for frame in [self._sums[~is_week], week_sums]
+                  if len(frame) > 0]
+        self._sums = pd.concat(frames, ignore_index=True) if frames else \
+            _get_empty_sums()
+        return self
+
+    def summary(self, by=("source",)):
+        """
+        :param by: the columns to break the metrics down by, from source,
+                   year, week and Pos. Every summary is also broken down by
+                   stat
+        :return: DataFrame of the number of player-weeks, MAE, RMSE, bias
+                 (mean of projected - actual) and rank correlation of each
+                 group
+        """
+        by = list(by)
+        unknown = [column for column in by if column not in GROUP_COLUMNS]
+        if unknown:
+            raise ValueError(f"Can't break down by {unknown}, should be "
+                             f"among {GROUP_COLUMNS[:-1]}")
+
+        sums = self._sums.copy()
+        sums[_SUM_COLUMNS] = sums[_SUM_COLUMNS].astype("float64")
+        # Spearman per group, weighted by the group's size when combined
+        denominator = np.sqrt(sums["rank_sum_xx"] * sums["rank_sum_yy"])
+        sums["rank_weight"] = np.where(denominator > 0, sums["n"], 0.0)
+        sums["rank_weighted"] = np.where(
+            denominator > 0,
+            sums["n"] * sums["rank_sum_xy"] /
+            denominator.where(denominator > 0, 1.0), 0.0)
+
+        grouped = sums.groupby(by + ["stat"], sort=True)[
+            _SUM_COLUMNS + ["rank_weight", "rank_weighted"]].sum()
+
+        n = grouped["n"]
+        summary = pd.DataFrame({
+            "Player-Weeks": n.astype("int64"),
+            "MAE": grouped["sum_abs_error"] / n,
+            "RMSE": np.sqrt(grouped["sum_squared_error"] / n),
+            "Bias": grouped["sum_error"] / n,
+            "Rank Corr": grouped["rank_weighted"] /
+                         grouped["rank_weight"].where(
+                             grouped["rank_weight"] > 0),
+        })
+        return summary.reset_index()
+
+    def _get_sums(self, projections, actuals):
+        """
+        Joins projections to actuals and sums their errors
+
+        :param projections: DataFrame of projections with source, year and
+                            week columns
+        :param actuals: DataFrame of actual stats with year and week columns
+        :return: DataFrame of GROUP_COLUMNS and their sufficient statistics
+        """
+        key_columns = self._get_key_columns(projections, actuals)
+        projected = self._get_values(projections, key_columns)
+        actual = self._get_values(actuals, key_columns)
+
+        # The projection's position groups its errors
+        joined = projected.merge(
+            actual.drop(columns=["Pos"]), how="inner",
+            on=["year", "week"] + key_columns, suffixes=("", " Actual"),
+            validate="many_to_one")
+
+        frames = []
+        for stat in ["Points"] + self.stats:
+            frame = joined[["source", "year", "week", "Pos"]].copy()
+            frame["stat"] = stat
+            frame["projected"] = joined[stat]
+            frame["actual"] = joined[f"{stat} Actual"]
+            frames.append(frame.dropna(subset=["projected", "actual"]))
+        long = pd.concat(frames, ignore_index=True)
+        if len(long) == 0:
+            return _get_empty_sums()
+
+        error = long["projected"] - long["actual"]
+        long["n"] = 1
+        long["sum_error"] = error
+        long["sum_abs_error"] = error.abs()
+        long["sum_squared_error"] = error ** 2
+
+        # Rank players within each group, then center the ranks so
+        # Spearman's correlation is a ratio of sums
+        groups = long.groupby(GROUP_COLUMNS, sort=False)
+        group_ids = groups.ngroup()
+        rank_x = groups["projected"].rank()
+        rank_y = groups["actual"].rank()
+        rank_x = rank_x - rank_x.groupby(group_ids).transform("mean")
+        rank_y = rank_y - rank_y.groupby(group_ids).transform("mean")
+        long["rank_sum_xy"] = rank_x * rank_y
+        long["rank_sum_xx"] = rank_x ** 2
+        long["rank_sum_yy"] = rank_y ** 2
+
+        return long.groupby(GROUP_COLUMNS, sort=False)[_SUM_COLUMNS].sum() \
+            .reset_index()
+
+    def _get_values(self, df, key_columns):
+        """
+        :param df: DataFrame of projections or actuals
+        :param key_columns: the columns identifying a player
+        :return: DataFrame of the snapshot and key columns, the position
+                 group, the scored points and the other compared stats
+        """
+        values = pd.DataFrame(index=df.index)
+        for column in ["source", "year", "week"]:
+            if column in df.columns:
+                values[column] = df[column]
+        values["year"] = values["year"].astype("int64")
+        values["week"] = values["week"].astype("int64")
+
+        if key_columns == _NAME_KEY_COLUMNS:
+            values["_Name"] = [normalize_name(name) for name in df["Name"]]
+            values["_Pos"] = [normalize_position(position)
+                              for position in df["Pos"]]
+        else:
+            for column in key_columns:
+                values[column] = df[column]
+
+        values["Pos"] = [normalize_position(position)
+                         for position in df["Pos"]] if "Pos" in df.columns \
+            else ""
+        values["Points"] = self._engine.score(df)["Points"]
+        for stat in self.stats:
+            values[stat] = pd.to_numeric(
+                df[stat].replace("-", np.nan), errors="coerce").astype(
+                "float64") if stat in df.columns else np.nan
+
+        # A player has one line of actuals per week
+        if "source" not in values.columns:
+            values = values.drop_duplicates(
+                subset=["year", "week"] + key_columns, keep="first")
+        return values
+
+    def _get_key_columns(self, projections, actuals):
+        """
+        :param projections: DataFrame of projections
+        :param actuals: DataFrame of actual stats
+        :return: the columns players are joined on
+        """
+        if self.key_columns is not None:
+            return self.key_columns
+        if "Player ID" in projections.columns and \
+                "Player ID" in actuals.columns:
+            return ["Player ID"]
+        return _NAME_KEY_COLUMNS
+
+
+def _get_empty_sums():
+    """
+    :return: an empty DataFrame of GROUP_COLUMNS and their sufficient
+             statistics, with the dtypes of non-empty ones
+    """
+    return pd.DataFrame({column: pd.Series(dtype=dtype)
+                         for column, dtype in _SUM_DTYPES.items()})
@@ -0,0 +1,596 @@
+"""
+File: benchmark.py
+Description: Offline parse benchmarks for every scraper. Pages come from a
+             page cache of recorded pages, or are generated (synthetic pages
+             shaped like each site's, with scalable row counts), so parser
+             regressions show up as numbers without touching the network
+"""
+
+import argparse
+import contextlib
+import io
+import os
+import random
+import re
+import tempfile
+import time
+import tracemalloc
+from urllib.parse import parse_qs, urlparse
+
+import pandas as pd
+
+import fantasy_data
+import football_guys
+import html_tables
+import nfl
+import pro_football_reference
+import sportsline
+import util_scripts
+from page_cache import DEFAULT_TTLS, PageCache
+
+
+# The recorded fantasydata.com page shipped with the repo (2021 week 1, GB
+# quarterbacks), which synthetic fantasydata pages are grown from
+SAMPLE_PAGE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                "sample pages",
+                                "fantasydata 2021 week 1 gb qb")
+_SAMPLE_PAGE_ARGS = {"year": 2021, "week": 1, "playoffs": False,
+                     "team_indx": 11, "pos_indx": 2}
+
+# Teams listed on synthetic projections pages
+_TEAMS = ["ARI", "ATL", "BAL", "BUF", "CHI", "DAL", "GB", "KC", "NE", "SF"]
+
+# Teams in synthetic PFR games
+_PFR_TEAMS = ["KAN", "CLE"]
+
+# Synthetic PFR tables: (table ID, [(header group, [headers])])
+_PFR_TABLES = [
+    ("player_offense",
+     [("", ["Player", "Tm"]),
+      ("Passing", ["Cmp", "Att", "Yds", "TD", "Int", "Sk", "Yds", "Lng",
+                   "Rate"]),
+      ("Rushing", ["Att", "Yds", "TD", "Lng"]),
+      ("Receiving", ["Tgt", "Rec", "Yds", "TD", "Lng"]),
+      ("Fumbles", ["Fmb", "FL"])]),
+    ("player_defense",
+     [("", ["Player", "Tm"]),
+      ("Def Interceptions", ["Int", "Yds", "TD", "Lng", "PD"]),
+      ("", ["Sk"]),
+      ("Tackles", ["Comb", "Solo", "Ast", "TFL", "QBHits"]),
+      ("Fumbles", ["FR", "Yds", "TD", "FF"])]),
+    ("returns",
+     [("", ["Player", "Tm"]),
+      ("Kick Returns", ["Rt", "Yds", "Y/Rt", "TD", "Lng"]),
+      ("Punt Returns", ["Ret", "Yds", "Y/R", "TD", "Lng"])]),
+    ("kicking",
+     [("", ["Player", "Tm"]),
+      ("Scoring", ["XPM", "XPA", "FGM", "FGA"]),
+      ("Punting", ["Pnt", "Yds", "Y/P", "Lng"])]),
+]
+_PFR_SNAP_TABLE = [("", ["Player", "Pos"]), ("Off.", ["Num", "Pct"]),
+                   ("Def.", ["Num", "Pct"]), ("ST", ["Num", "Pct"])]
+# Synthetic PFR columns with fractional values, as (header group, header).
+# Every other box score stat is a whole number
+_PFR_FRACTIONAL = [("Passing", "Rate"), ("Kick Returns", "Y/Rt"),
+                   ("Punt Returns", "Y/R"), ("Punting", "Y/P"), ("", "Sk"),
+                   ("Off.", "Pct"), ("Def.", "Pct"), ("ST", "Pct")]
+
+# Rows per page of each source's synthetic pages, before scaling
+_BASE_ROWS = {"nfl": 100, "football_guys": 60, "sportsline": 300,
+              "fantasy_data": 30, "pro_football_reference": 12}
+
+_SYNTHETIC_YEAR = 2021
+_SYNTHETIC_WEEK = 1
+
+
+def get_pfr_game_page(rows_per_team=12, seed=0):
+    """
+    :param rows_per_team: the number of offensive and defensive players of
+                          each team
+    :param seed: the random seed of the stats
+    :return: HTML of a synthetic pro-football-reference.com box score, with
+             the tables after the first wrapped in comments (like PFR's)
+    """
+    rng = random.Random(seed)
+    tables = []
+    for table_id, groups in _PFR_TABLES:
+        num_rows = rows_per_team if table_id.startswith("player") else 2
+        tables.append(_get_pfr_player_table(table_id, groups, num_rows, rng))
+    tables.append(_get_pfr_team_stats_table(rng))
+    for table_id in ["home_snap_counts", "vis_snap_counts"]:
+        tables.append(_get_pfr_player_table(table_id, _PFR_SNAP_TABLE,
+                                            rows_per_team * 2, rng,
+                                            positions=True))
+
+    body = "".join(f"<div>{table}</div>" if indx == 0
+                   else f'<div class="table_wrapper"><!--\n{table}\n--></div>'
+                   for indx, table in enumerate(tables))
+    return f"<html><body>{body}</body></html>"
+
+
+def get_pfr_week_page(num_games=16):
+    """
+    :param num_games: the number of games in the week
+    :return: HTML of a synthetic pro-football-reference.com week page
+    """
+    games = "".join(
+        '<div class="game_summary"><table class="teams"><tr>'
+        f'<td class="gamelink"><a href="/boxscores/2021091{indx:03d}.htm">'
+        "Final</a></td></tr></table></div>" for indx in range(num_games))
+    return (f'<html><body><div class="game_summaries">{games}</div>'
+            "</body></html>")
+
+
+def get_nfl_page(position, offset, num_players, seed=0):
+    """
+    :param position: the position listed. One of [0: Offense, 7: Kicker,
+                     8: Team Defense]
+    :param offset: the number of the page's first player
+    :param num_players: the total number of players listed for the position
+    :param seed: the random seed of the stats
+    :return: HTML of a synthetic fantasy.nfl.com projections page
+    """
+    rng = random.Random(seed + offset)
+    expected_labels, _ = nfl._get_labels(position)
+    headers = [label.split("_", 1) if "_" in label else ["", label]
+               for label in expected_labels]
+
+    rows = []
+    last = min(offset + nfl.PAGE_SIZE, num_players + 1)
+    for player in range(offset, last):
+        pos_team = "DEF" if position == 8 else \
+            f"{rng.choice(['QB', 'RB', 'WR', 'TE', 'K'])} - " \
+            f"{rng.choice(_TEAMS)}"
+        cells = [f'<td><a class="playerCard playerName">Player {player}</a>'
+                 f" <em>{pos_team}</em></td>",
+                 f"<td>@{rng.choice(_TEAMS)}</td>"]
+        for _ in headers[2:]:
+            cells.append(f"<td>{_get_stat(rng, missing='-')}</td>")
+        rows.append(f"<tr>{''.join(cells)}</tr>")
+
+    return (f'<html><body><span class="paginationTitle">{offset} - '
+            f"{last - 1} of {num_players}</span>"
+            f"<table>{_get_header_rows(headers)}"
+            f"<tbody>{''.join(rows)}</tbody></table></body></html>")
+
+
+def get_football_guys_page(position, num_rows, seed=0):
+    """
+    :param position: the position listed (see football_guys._get_labels)
+    :param num_rows: the number of players
+    :param seed: the random seed of the stats
+    :return: HTML of a synthetic footballguys.com projections page
+    """
+    rng = random.Random(seed)
+    expected_labels, _ = football_guys._get_labels(position)
+    # The first (rank) and last columns are dropped by the parser
+    headers = ["#"] + [label.split(".")[0] for label in expected_labels] + \
+        ["ADD"]
+
+    rows = []
+    for player in range(num_rows):
+        cells = [str(player + 1), f"Player {player}", rng.choice(_TEAMS),
+                 rng.choice(_TEAMS)]
+        if "POS" in expected_labels:
+            cells.append(rng.choice(["RB", "WR", "TE"]))
+        cells += [_get_stat(rng, missing="") for _ in
+                  range(len(headers) - len(cells) - 1)] + ["+"]
+        rows.append("<tr>" + "".join(f"<td>{cell}</td>" for cell in cells)
+                    + "</tr>")
+
+    header_row = "".join(f"<th>{header}</th>" for header in headers)
+    return (f'<html><body><table class="table data"><thead><tr>{header_row}'
+            f"</tr></thead><tbody>{''.join(rows)}</tbody></table>"
+            "</body></html>")
+
+
+def get_sportsline_page(num_rows, seed=0):
+    """
+    :param num_rows: the number of players
+    :param seed: the random seed of the stats
+    :return: HTML of a synthetic sportsline.com projections page
+    """
+    rng = random.Random(seed)
+    headers = ["PLAYER", "POS", "TEAM", "FG", "FGA", "XP", "PASS YDS",
+               "PASS TD", "INT", "RUSH YDS", "RUSH TD", "REC", "REC YDS",
+               "REC TD", "FPTS"]
+    rows = []
+    for player in range(num_rows):
+        cells = [f"Player {player}", rng.choice(["QB", "RB", "WR", "TE"]),
+                 rng.choice(_TEAMS)]
+        cells += [_get_stat(rng, missing="") for _ in headers[3:]]
+        rows.append("<tr>" + "".join(f"<td>{cell}</td>" for cell in cells)
+                    + "</tr>")
+
+    header_row = "".join(f"<th>{header}</th>" for header in headers)
+    return (f"<html><body><table><thead><tr>{header_row}</tr></thead>"
+            f"<tbody>{''.join(rows)}</tbody></table></body></html>")
+
+
+def get_fantasy_data_page(num_rows):
+    """
+    Grows the recorded fantasydata.com sample page to any number of players
+    by repeating its rows
+
+    :param num_rows: the number of players
+    :return: HTML of the page
+    """
+    with open(SAMPLE_PAGE_PATH, encoding="utf-8") as page_file:
+        html = page_file.read()
+
+    def repeat_rows(match):
+        rows = re.findall(r"<tr\b[^>]*\bng-scope\b.*?</tr>", match.group(2),
+                          flags=re.DOTALL)
+        if len(rows) == 0:
+            return match.group(0)
+        repeated = [rows[indx % len(rows)] for indx in range(num_rows)]
+        return match.group(1) + "".join(repeated) + match.group(3)
+
+    return re.sub(r"(<tbody\b[^>]*>)(.*?)(</tbody>)", repeat_rows, html,
+                  flags=re.DOTALL)
+
+
+def get_synthetic_cache(directory, scale=1):
+    """
+    Fills a page cache with synthetic pages of every source, under the URLs
+    the scrapers would fetch them from
+
+    :param directory: the directory to store the cache in
+    :param scale: how many times the default number of rows each page has
+    :return: the PageCache
+    """
+    cache = _get_replay_cache(directory)
+    scale = max(1, int(scale))
+
+    def store(url, source, html):
+        cache.capture(url, source=source, load_function=lambda: html)
+
+    # One fantasy.nfl.com listing per position, 25 players per page
+    for position in [0, 7, 8]:
+        num_players = _BASE_ROWS["nfl"] * scale if position == 0 else 32
+        for offset in range(1, num_players + 1, nfl.PAGE_SIZE):
+            store(nfl.BASE_URL.format(offset=offset, position=position,
+                                      week=_SYNTHETIC_WEEK), "nfl",
+                  get_nfl_page(position, offset, num_players))
+
+    for position in ["qb", "flex", "pk", "td", "flexidp"]:
+        store(football_guys._get_url(week=_SYNTHETIC_WEEK, position=position),
+              "football_guys",
+              get_football_guys_page(position,
+                                     _BASE_ROWS["football_guys"] * scale))
+
+    store(sportsline.URL, "sportsline",
+          get_sportsline_page(_BASE_ROWS["sportsline"] * scale))
+
+    store(fantasy_data._get_url(**_SAMPLE_PAGE_ARGS), "fantasy_data",
+          get_fantasy_data_page(_BASE_ROWS["fantasy_data"] * scale))
+
+    week_html = get_pfr_week_page()
+    store(pro_football_reference._get_landing_page_url(_SYNTHETIC_YEAR,
+                                                       _SYNTHETIC_WEEK),
+          "pro_football_reference", week_html)
+    for indx, url in enumerate(
+            pro_football_reference._get_game_urls(week_html)[:4]):
+        store(url, "pro_football_reference",
+              get_pfr_game_page(_BASE_ROWS["pro_football_reference"] * scale,
+                                seed=indx))
+
+    cache.offline = True
+    return cache
+
+
+def run_suite(cache, repeat=5, verbose=True):
+    """
+    Runs every benchmark on the pages in a page cache. Each benchmark parses
+    all of its pages once per run; the fastest of the runs is kept
+
+    :param cache: a PageCache of recorded (or synthetic) pages
+    :param repeat: the number of timed runs of each benchmark
+    :param verbose: whether to print each result as it finishes
+    :return: DataFrame of each benchmark's pages, rows parsed per run,
+             seconds per run, rows per second and peak memory
+    """
+    results = []
+    with tempfile.TemporaryDirectory() as save_directory:
+        benchmarks = _get_benchmarks(cache, save_directory)
+        for name, cases in benchmarks.items():
+            if len(cases) == 0:
+                continue
+            result = run_benchmark(name, cases, repeat=repeat)
+            results.append(result)
+            if verbose:
+                print(f"{name}: {result['Rows']} rows in "
+                      f"{result['Seconds']:.4f} s ({result['Rows/s']:,.0f} "
+                      f"rows/s), peak {result['Peak MB']:.1f} MB")
+    return pd.DataFrame(results, columns=["Benchmark", "Pages", "Rows",
+                                          "Seconds", "Rows/s", "Peak MB"])
+
+
+def run_benchmark(name, cases, repeat=5):
+    """
+    Times a parse function over a set of pages. Peak memory is measured in a
+    separate run with tracemalloc, so it counts Python and pandas/NumPy
+    allocations but not lxml's internal (C) ones
+
+    :param name: the benchmark's name
+    :param cases: list of functions taking no arguments that each parse one
+                  page (or listing) and return the number of rows parsed
+    :param repeat: the number of timed runs
+    :return: dict of the benchmark's results
+    """
+    def run_cases():
+        # Scrapers print their progress
+        with contextlib.redirect_stdout(io.StringIO()):
+            return sum(case() for case in cases)
+
+    rows = run_cases()  # warm up
+    seconds = []
+    for _ in range(max(1, repeat)):
+        start = time.perf_counter()
+        run_cases()
+        seconds.append(time.perf_counter() - start)
+
+    tracemalloc.start()
+    try:
+        run_cases()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    best = min(seconds)
+    return {"Benchmark": name, "Pages": len(cases), "Rows": rows,
+            "Seconds": best, "Rows/s": rows / best if best > 0 else 0.0,
+            "Peak MB": peak / 1024 ** 2}
+
+
+def compare(results, baseline):
+    """
+    :param results: DataFrame from run_suite
+    :param baseline: DataFrame from an earlier run_suite (e.g. read from its
+                     saved CSV)
+    :return: results with the baseline's rows/s and the relative change
+    """
+    baseline = baseline[["Benchmark", "Rows/s"]].rename(
+        columns={"Rows/s": "Baseline Rows/s"})
+    compared = results.merge(baseline, how="left", on="Benchmark")
+    compared["Change"] = compared["Rows/s"] / compared["Baseline Rows/s"] - 1
+    return compared
+
+
+def _get_benchmarks(cache, save_directory):
+    """
+    Builds each benchmark's cases from the pages in a cache
+
+    :param cache: an offline PageCache
+    :param save_directory: a directory for parsers that also save their
+                           output (SportsLine)
+    :return: dict mapping benchmark name -> list of cases (see
+             run_benchmark)
+    """
+    benchmarks = {name: [] for name in [
+        "util_scripts.read_raw_html_table",
+        "pro_football_reference._parse_pfr_table",
+        "pro_football_reference._parse_game",
+        "pro_football_reference._get_game_urls",
+        "nfl._get_position_df",
+        "football_guys._get_position_df",
+        "fantasy_data._get_team_position_df",
+        "sportsline._parse_page"]}
+
+    for url, source in cache.get_pages():
+        query = {key: values[0]
+                 for key, values in parse_qs(urlparse(url).query).items()}
+
+        if source == "pro_football_reference" and "/boxscores/" in url:
+            html = cache.fetch(url, source=source)
+            table = html_tables.extract_tables(
+                html, ["player_offense"]).get("player_offense")
+            if table is not None:
+                benchmarks["util_scripts.read_raw_html_table"].append(
+                    lambda table=table:
+                    len(util_scripts.read_raw_html_table(table)))
+                benchmarks["pro_football_reference._parse_pfr_table"].append(
+                    lambda table=table:
+                    len(pro_football_reference._parse_pfr_table(table)))
+            benchmarks["pro_football_reference._parse_game"].append(
+                lambda html=html:
+                len(pro_football_reference._parse_game(html)))
+
+        elif source == "pro_football_reference" and "/week_" in url:
+            html = cache.fetch(url, source=source)
+            benchmarks["pro_football_reference._get_game_urls"].append(
+                lambda html=html:
+                len(pro_football_reference._get_game_urls(html)))
+
+        # Each position's listing starts at offset 1 and fetches its other
+        # pages from the cache
+        elif source == "nfl" and query.get("offset") == "1":
+            benchmarks["nfl._get_position_df"].append(
+                lambda query=query: len(_with_cache(
+                    nfl, cache, nfl._get_position_df,
+                    week=int(query["statWeek"]),
+                    position=int(query["position"]))))
+
+        elif source == "football_guys":
+            benchmarks["football_guys._get_position_df"].append(
+                lambda query=query: len(_with_cache(
+                    football_guys, cache, football_guys._get_position_df,
+                    week=int(query["week"]), position=query["pos"])))
+
+        elif source == "fantasy_data":
+            benchmarks["fantasy_data._get_team_position_df"].append(
+                lambda query=query: len(_with_cache(
+                    fantasy_data, cache, fantasy_data._get_team_position_df,
+                    year=int(query["season"]), week=int(query["startweek"]),
+                    playoffs=query["seasontype"] == "3",
+                    team_indx=int(query["team"]),
+                    pos_indx=int(query["position"]), webdriver=None)))
+
+        # Parsing a SportsLine page includes saving it
+        elif source == "sportsline":
+            html = cache.fetch(url, source=source)
+            save_location = os.path.join(save_directory, "sportsline.csv")
+            benchmarks["sportsline._parse_page"].append(
+                lambda html=html, save_location=save_location:
+                len(sportsline._parse_page(html, _SYNTHETIC_YEAR,
+                                           _SYNTHETIC_WEEK, save_location)))
+
+    return benchmarks
+
+
+def _with_cache(module, cache, function, **kwargs):
+    """
+    Calls a scraper function with its module's page cache swapped out
+
+    :param module: the scraper's module
+    :param cache: the PageCache to use
+    :param function: the function to call
+    :param kwargs: the function's arguments
+    :return: what the function returns
+    """
+    module_cache = module.CACHE
+    module.CACHE = cache
+    try:
+        return function(**kwargs)
+    finally:
+        module.CACHE = module_cache
+
+
+def _get_replay_cache(directory):
+    """
+    :param directory: the page cache's directory
+    :return: a PageCache whose pages never expire, so that every page in it
+             can be replayed offline
+    """
+    return PageCache(directory=directory, max_bytes=float("inf"),
+                     ttls={source: None for source in DEFAULT_TTLS})
+
+
+def _get_pfr_player_table(table_id, groups, num_rows, rng, positions=False):
+    """
+    :param table_id: the table's ID
+    :param groups: list of (header group, [headers])
+    :param num_rows: the number of players of each team
+    :param rng: random.Random of the stats
+    :param positions: whether the second column is positions (snap counts)
+                      rather than teams
+    :return: HTML of a PFR player table, with a repeated header row between
+             the teams (like PFR's)
+    """
+    stat_headers = [(group, header) for group, headers in groups
+                    for header in headers][2:]
+    num_cols = len(stat_headers) + 2
+    is_whole = [header not in _PFR_FRACTIONAL for header in stat_headers]
+    column_row = "".join(f"<th>{header}</th>"
+                         for _, headers in groups for header in headers)
+    group_row = "".join(f'<th colspan="{len(headers)}">{group}</th>'
+                        for group, headers in groups)
+
+    rows = []
+    for team_indx, team in enumerate(_PFR_TEAMS):
+        if team_indx > 0:
+            rows.append(f'<tr class="spacer"><td colspan="{num_cols}">'
+                        "</td></tr>")
+            rows.append(f'<tr class="thead">{column_row}</tr>')
+        for player in range(num_rows):
+            player_id = f"Play{team}{player:03d}"
+            second = rng.choice(["QB", "RB", "WR", "TE"]) if positions \
+                else team
+            cells = [f'<th scope="row" data-append-csv="{player_id}">'
+                     f'<a href="/players/P/{player_id}.htm">Player {team} '
+                     f"{player}</a></th>", f"<td>{second}</td>"]
+            cells += [f"<td>{_get_stat(rng, missing='', whole=whole)}</td>"
+                      for whole in is_whole]
+            rows.append(f"<tr>{''.join(cells)}</tr>")
+
+    return (f'<table id="{table_id}"><thead><tr class="over_header">'
+            f"{group_row}</tr><tr>{column_row}</tr></thead>"
+            f"<tbody>{''.join(rows)}</tbody></table>")
+
+
+def _get_pfr_team_stats_table(rng):
+    """
+    :param rng: random.Random of the stats
+    :return: HTML of a PFR team stats table
+    """
+    def numbers(*highs):
+        return "-".join(str(rng.randint(0, high)) for high in highs)
+
+    stats = [("First Downs", (30,)), ("Rush-Yds-TDs", (40, 200, 3)),
+             ("Cmp-Att-Yd-TD-INT", (30, 45, 400, 4, 3)),
+             ("Sacked-Yards", (5, 40)), ("Net Pass Yards", (400,)),
+             ("Total Yards", (500,)), ("Fumbles-Lost", (3, 2)),
+             ("Turnovers", (4,)), ("Penalties-Yards", (10, 90))]
+    rows = "".join(f"<tr><th>{name}</th><td>{numbers(*highs)}</td>"
+                   f"<td>{numbers(*highs)}</td></tr>"
+                   for name, highs in stats)
+    return (f'<table id="team_stats"><thead><tr><th></th>'
+            f"<th>{_PFR_TEAMS[1]}</th><th>{_PFR_TEAMS[0]}</th></tr></thead>"
+            f"<tbody>{rows}</tbody></table>")
+
+
+def _get_header_rows(headers):
+    """
+    :param headers: list of [header group, header]
+    :return: HTML of a <thead> with a row of groups (adjacent equal groups
+             merged with colspans) and a row of headers
+    """
+    groups = []
+    for group, _ in headers:
+        if groups and groups[-1][0] == group:
+            groups[-1][1] += 1
+        else:
+            groups.append([group, 1])
+    group_row = "".join(f'<th colspan="{span}">{group}</th>'
+                        for group, span in groups)
+    header_row = "".join(f"<th>{header}</th>" for _, header in headers)
+    return f"<thead><tr>{group_row}</tr><tr>{header_row}</tr></thead>"
+
+
+def _get_stat(rng, missing, whole=False):
+    """
+    :param rng: random.Random of the stats
+    :param missing: the text of a missing stat
+    :param whole: whether the stat is always a whole number (e.g. a box
+                  score's count)
+    :return: a random stat's text (missing a fifth of the time)
+    """
+    if rng.random() < 0.2:
+        return missing
+    return f"{rng.uniform(0, 120):.1f}" if not whole and rng.random() < 0.5 \
+        else str(rng.randint(0, 120))
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Benchmarks each scraper's parsing offline")
+    parser.add_argument("--cache", help="replay the pages recorded in this "
+                        "page cache directory instead of synthetic pages")
+    parser.add_argument("--scale", type=int, default=1,
+                        help="multiplies the rows of each synthetic page")
+    parser.add_argument("--repeat", type=int, default=5,
+                        help="timed runs of each benchmark")
+    parser.add_argument("--save", help="save the results to this CSV")
+    parser.add_argument("--baseline", help="compare to results saved by an "
+                        "earlier run")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        if args.cache:
+            cache = _get_replay_cache(args.cache)
+            cache.offline = True
+        else:
+            cache = get_synthetic_cache(directory, scale=args.scale)
+        results = run_suite(cache, repeat=args.repeat)
+
+    if args.save:
+        results.to_csv(args.save, index=False)
+    if args.baseline:
+        results = compare(results, pd.read_csv(args.baseline))
+    with pd.option_context("display.width", 120,
+                           "display.max_columns", None):
+        print(results)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,249 @@
+"""
+File: checkpoint.py
+Description: Manifest of completed scraping work, so that an interrupted
+             backfill resumes where it stopped instead of from scratch
+"""
+
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+
+import pandas as pd
+
+
+class CheckpointManifest:
+    """
+    Records completed work at two levels: pages, keyed by (source, year,
+    week, position, team), whose DataFrames are stored alongside the
+    manifest, and partitions, keyed by (source, year, week), whose output is
+    the saved CSV. Every entry stores the SHA-256 checksum of its output, and
+    entries whose output is missing or doesn't match are treated as not done.
+    """
+
+    def __init__(self, directory="checkpoints", enabled=True):
+        """
+        :param directory: the directory to store the manifest and page
+                          outputs in
+        :param enabled: if False, nothing is ever skipped or recorded
+        """
+        self.directory = directory
+        self.enabled = enabled
+
+        self._lock = threading.Lock()
+        self._connection = None
+
+    def _get_connection(self):
+        """
+        Opens the manifest on first use. Must hold self._lock
+
+        :return: the sqlite3 connection to the manifest
+        """
+        if self._connection is None:
+            os.makedirs(os.path.join(self.directory, "pages"), exist_ok=True)
+            self._connection = sqlite3.connect(
+                os.path.join(self.directory, "manifest.sqlite"),
+                check_same_thread=False)
+            # Partitions are stored with an empty position and team
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS units ("
+                "source TEXT, year INTEGER, week INTEGER, position TEXT, "
+                "team TEXT, path TEXT, checksum TEXT, rows INTEGER, "
+                "completed_at REAL, "
+                "PRIMARY KEY (source, year, week, position, team))")
+        return self._connection
+
+    def load_page(self, source, year, week, position, team):
+        """
+        :param source: the source module's name
+        :param year: the year scraped
+        :param week: the week scraped
+        :param position: the position scraped
+        :param team: the team scraped
+        :return: the page's DataFrame if it was completed, otherwise None
+        """
+        entry = self._get_entry(source, year, week, str(position), str(team))
+        if entry is None:
+            return None
+        return pd.read_pickle(entry["path"])
+
+    def save_page(self, source, year, week, position, team, df):
+        """
+        Stores a completed page's DataFrame and marks the page as done
+
+        :param source: the source module's name
+        :param year: the year scraped
+        :param week: the week scraped
+        :param position: the position scraped
+        :param team: the team scraped
+        :param df: the page's DataFrame
+        """
+        if not self.enabled:
+            return
+
+        # The pages directory may not exist yet if nothing was loaded first
+        os.makedirs(os.path.join(self.directory, "pages"), exist_ok=True)
+        file_name = f"{source}_{year}_{week}_{position}_{team}.pkl"
+        path = os.path.join(self.directory, "pages", file_name)
+        temp_path = f"{path}.{threading.get_ident()}.tmp"
+        df.to_pickle(temp_path)
+        os.replace(temp_path, path)
+
+        self._put_entry(source, year, week, str(position), str(team), path,
+                        len(df))
+
+    def is_partition_complete(self, source, year, week, path):
+        """
+        :param source: the source module's name
+        :param year: the year scraped
+        :param week: the week scraped
+        :param path: the path the partition is saved to
+        :return: whether the partition was completed and saved to path, and
+                 the file is unchanged since (its checksum still matches
+                 the one recorded)
+        """
+        entry = self._get_entry(source, year, week, "", "")
+        return (entry is not None
+                and os.path.abspath(entry["path"]) == os.path.abspath(path))
+
+    def complete_partition(self, source, year, week, path, rows):
+        """
+        Marks a partition as done once its output has been saved
+
+        :param source: the source module's name
+        :param year: the year scraped
+        :param week: the week scraped
+        :param path: the path the partition was saved to
+        :param rows: the number of rows saved
+        """
+        if self.enabled:
+            self._put_entry(source, year, week, "", "", path, rows)
+
+    def _get_entry(self, source, year, week, position, team):
+        """
+        Looks up a unit, dropping it if its output is missing or corrupt
+
+        :param source: the source module's name
+        :param year: the year scraped
+        :param week: the week scraped
+        :param position: the position scraped ("" for a partition)
+        :param team: the team scraped ("" for a partition)
+        :return: dict of the unit's output path and row count, or None if
+                 the unit isn't done
+        """
+        if not self.enabled:
+            return None
+
+        key = (source, year, week, position, team)
+        with self._lock:
+            row = self._get_connection().execute(
+                "SELECT path, checksum, rows FROM units WHERE source = ? AND "
+                "year = ? AND week = ? AND position = ? AND team = ?",
+                key).fetchone()
+        if row is None:
+            return None
+
+        path, checksum, rows = row
+        try:
+            valid = _get_checksum(path) == checksum
+        except FileNotFoundError:
+            valid = False
+
+        if not valid:
+            print(f"Output of {key} at {path} is missing or has changed, "
+                  "redoing it")
+            with self._lock:
+                connection = self._get_connection()
+                connection.execute(
+                    "DELETE FROM units WHERE source = ? AND year = ? AND "
+                    "week = ? AND position = ? AND team = ?", key)
+                connection.commit()
+            return None
+
+        return {"path": path, "rows": rows}
+
+    def _put_entry(self, source, year, week, position, team, path, rows):
+        """
+        Records a completed unit with its output's checksum
+
+        :param source: the source module's name
+        :param year: the year scraped
+        :param week: the week scraped
+        :param position: the position scraped ("" for a partition)
+        :param team: the team scraped ("" for a partition)
+        :param path: the path of the unit's output
+        :param rows: the number of rows in the output
+        """
+        checksum = _get_checksum(path)
+        with self._lock:
+            connection = self._get_connection()
+            connection.execute(
+                "INSERT OR REPLACE INTO units VALUES "
+                "(?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (source, year, week, position, team, path, checksum, rows,
+                 time.time()))
+            connection.commit()
+
+    def count_pages(self, source, year, week):
+        """
+        :param source: the source module's name
+        :param year: the year scraped
+        :param week: the week scraped
+        :return: the number of pages of the partition recorded as done
+        """
+        if not self.enabled:
+            return 0
+        with self._lock:
+            return self._get_connection().execute(
+                "SELECT COUNT(*) FROM units WHERE source = ? AND year = ? AND "
+                "week = ? AND position != ''", (source, year, week)
+            ).fetchone()[0]
+
+    def clear(self, source=None, year=None, week=None):
+        """
+        Forgets completed work, so it is redone on the next run. Saved CSVs
+        are kept
+
+        :param source: only forget this source's work, if given
+        :param year: only forget this year's work, if given
+        :param week: only forget this week's work, if given
+        """
+        conditions = []
+        values = []
+        for column, value in [("source", source), ("year", year),
+                              ("week", week)]:
+            if value is not None:
+                conditions.append(f"{column} = ?")
+                values.append(value)
+        where = " AND ".join(conditions) if conditions else "1"
+
+        with self._lock:
+            connection = self._get_connection()
+            # Delete stored page outputs, but not partitions' CSVs
+            paths = connection.execute(
+                f"SELECT path FROM units WHERE {where} AND position != ''",
+                values).fetchall()
+            for (path,) in paths:
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+            connection.execute(f"DELETE FROM units WHERE {where}", values)
+            connection.commit()
+
+
+def _get_checksum(path):
+    """
+    :param path: the path of a file
+    :return: the SHA-256 hash of the file's contents
+    """
+    file_hash = hashlib.sha256()
+    with open(path, "rb") as file:
+        for chunk in iter(lambda: file.read(1024 * 1024), b""):
+            file_hash.update(chunk)
+    return file_hash.hexdigest()
+
+
+# Manifest shared by all scrapers
+MANIFEST = CheckpointManifest()
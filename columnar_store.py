@@ -0,0 +1,239 @@
+"""
+File: columnar_store.py
+Description: Optional typed, partitioned Parquet copy of every scraper's
+             output, and a loader that reads it back with column pruning and
+             filter pushdown
+"""
+
+import os
+import threading
+
+
+# Values the scrapers use for "no value"
+_MISSING_VALUES = ["-", ""]
+
+# Columns that partition the store (stored in the directory names, not in
+# the files)
+PARTITION_COLUMNS = ["source", "year", "week"]
+
+
+class ColumnarStore:
+    """
+    Stores each (source, year, week) as one Parquet file under
+    directory/source=<source>/year=<year>/week=<week>/, with numeric columns
+    stored as numbers and missing values as nulls rather than '-' strings.
+    Needs pyarrow, which is only imported once the store is used.
+    """
+
+    def __init__(self, directory="columnar", enabled=False):
+        """
+        :param directory: the directory to store the partitions in
+        :param enabled: if False, write() does nothing, so scrapers only
+                        write CSVs
+        """
+        self.directory = directory
+        self.enabled = enabled
+
+    def write(self, df, source, year, week):
+        """
+        Writes (or replaces) one partition
+
+        :param df: the DataFrame saved by the scraper
+        :param source: the source module's name
+        :param year: the year scraped
+        :param week: the week scraped
+        :return: the path written to, or None if the store is disabled
+        """
+        if not self.enabled:
+            return None
+
+        pa, _, pq = _import_pyarrow()
+
+        df = get_typed_df(df.drop(columns=PARTITION_COLUMNS, errors="ignore"))
+        table = pa.Table.from_pandas(df, preserve_index=False)
+
+        partition_dir = os.path.join(self.directory, f"source={source}",
+                                     f"year={int(year)}", f"week={int(week)}")
+        os.makedirs(partition_dir, exist_ok=True)
+        path = os.path.join(partition_dir, "data.parquet")
+
+        temp_path = f"{path}.{threading.get_ident()}.tmp"
+        pq.write_table(table, temp_path)
+        os.replace(temp_path, path)
+
+        return path
+
+    def load(self, sources=None, years=None, weeks=None, columns=None,
+             positions=None):
+        """
+        Reads the stored partitions into one DataFrame. Only partitions
+        matching sources, years and weeks are opened, only the requested
+        columns are read, and the position filter is applied while reading.
+        Files are read in parallel
+
+        :param sources: the sources to load (all if None)
+        :param years: the years to load (all if None)
+        :param weeks: the weeks to load (all if None)
+        :param columns: the columns to load besides source, year and week
+                        (all if None)
+        :param positions: the values of Pos to keep (all if None)
+        :return: A DataFrame with source, year and week columns followed by
+                 the requested columns
+        """
+        import pandas as pd
+
+        pa, ds, pq = _import_pyarrow()
+
+        partitioning = ds.partitioning(
+            pa.schema([("source", pa.string()), ("year", pa.int16()),
+                       ("week", pa.int8())]), flavor="hive")
+
+        if not os.path.isdir(self.directory):
+            return pd.DataFrame(columns=PARTITION_COLUMNS)
+        # Listing the partitions with a schema given doesn't open any file
+        dataset = ds.dataset(self.directory, format="parquet",
+                             partitioning=partitioning,
+                             schema=partitioning.schema)
+
+        # Only open the files of the matching partitions
+        partition_filter = _get_partition_filter(ds, sources, years, weeks)
+        files = [fragment.path for fragment in
+                 dataset.get_fragments(filter=partition_filter)]
+        if len(files) == 0:
+            return pd.DataFrame(columns=PARTITION_COLUMNS + list(columns or []))
+
+        # Partitions of different sources have different columns, so read
+        # them under the union of their schemas
+        schema = _unify_schemas(pa, [pq.read_schema(path) for path in files])
+        for field in partitioning.schema:
+            schema = schema.append(field)
+        dataset = ds.dataset(files, schema=schema, format="parquet",
+                             partitioning=partitioning,
+                             partition_base_dir=self.directory)
+
+        if columns is not None:
+            unknown = [column for column in columns
+                       if column not in schema.names]
+            if unknown:
+                raise ValueError(f"Columns {unknown} aren't in any of the "
+                                 "loaded partitions")
+            columns = PARTITION_COLUMNS + [column for column in columns
+                                           if column not in PARTITION_COLUMNS]
+        else:
+            columns = PARTITION_COLUMNS + [name for name in schema.names
+                                           if name not in PARTITION_COLUMNS]
+
+        expression = partition_filter
+        if positions is not None:
+            condition = ds.field("Pos").isin(list(positions))
+            expression = (condition if expression is None
+                          else expression & condition)
+
+        table = dataset.to_table(columns=columns, filter=expression,
+                                 use_threads=True)
+        return table.to_pandas()
+
+
+def get_typed_df(df):
+    """
+    Converts a scraper's string DataFrame to real dtypes: '-' and blank
+    strings become missing values, and columns whose remaining values are
+    all numbers become float64. Columns with no values at all are left
+    untyped, so they take their type from other partitions when loaded.
+    Columns already typed by schema.apply_schema keep their dtypes, except
+    that categories are stored as strings
+
+    :param df: the DataFrame saved by a scraper
+    :return: the typed DataFrame
+    """
+    import pandas as pd
+
+    df = df.copy()
+    for indx in range(len(df.columns)):
+        values = df.iloc[:, indx]
+        # Parquet dictionary-encodes strings anyway, and categories written
+        # as dictionaries can't be unified with other partitions' strings
+        if isinstance(values.dtype, pd.CategoricalDtype):
+            df.isetitem(indx, values.astype(object).where(values.notna()))
+            continue
+        if values.dtype != object:
+            continue
+
+        values = values.where(~values.isin(_MISSING_VALUES))
+        if values.isna().all():
+            df.isetitem(indx, values)
+            continue
+        try:
+            df.isetitem(indx, pd.to_numeric(values).astype("float64"))
+        except (ValueError, TypeError):
+            df.isetitem(indx, values)
+    return df
+
+
+def load_projections(sources=None, years=None, weeks=None, columns=None,
+                     positions=None):
+    """
+    Reads stored projections and stats from the shared store (see
+    ColumnarStore.load)
+
+    :param sources: the sources to load (all if None)
+    :param years: the years to load (all if None)
+    :param weeks: the weeks to load (all if None)
+    :param columns: the columns to load besides source, year and week
+                    (all if None)
+    :param positions: the values of Pos to keep (all if None)
+    :return: A DataFrame of the matching rows
+    """
+    return STORE.load(sources=sources, years=years, weeks=weeks,
+                      columns=columns, positions=positions)
+
+
+def _get_partition_filter(ds, sources, years, weeks):
+    """
+    :param ds: the pyarrow.dataset module
+    :param sources: the sources to load (all if None)
+    :param years: the years to load (all if None)
+    :param weeks: the weeks to load (all if None)
+    :return: a dataset expression selecting the partitions, or None
+    """
+    expression = None
+    for column, values in [("source", sources), ("year", years),
+                           ("week", weeks)]:
+        if values is not None:
+            condition = ds.field(column).isin(list(values))
+            expression = (condition if expression is None
+                          else expression & condition)
+    return expression
+
+
+def _unify_schemas(pa, schemas):
+    """
+    :param pa: the pyarrow module
+    :param schemas: the schemas of the files being read
+    :return: a schema with every column of schemas. A column that is all
+             null in some files takes its type from the others, and integer
+             columns are widened to float if another file stores floats
+    """
+    try:
+        return pa.unify_schemas(schemas, promote_options="permissive")
+    except TypeError:  # pyarrow < 14 only merges null columns
+        return pa.unify_schemas(schemas)
+
+
+def _import_pyarrow():
+    """
+    :return: the pyarrow, pyarrow.dataset and pyarrow.parquet modules
+    """
+    try:
+        import pyarrow
+        import pyarrow.dataset
+        import pyarrow.parquet
+    except ImportError:
+        raise Exception("The columnar store needs pyarrow. Install it with "
+                        "'pip install pyarrow'")
+    return pyarrow, pyarrow.dataset, pyarrow.parquet
+
+
+# Store shared by all scrapers. Set STORE.enabled = True to also write
+# Parquet partitions
+STORE = ColumnarStore()
@@ -0,0 +1,242 @@
+"""
+File: consensus.py
+Description: Combines the sources' projections into consensus projections
+             (weighted mean, weighted median and spread of each stat)
+"""
+
+import numpy as np
+import pandas as pd
+
+
+# Columns identifying a row's source and week
+SNAPSHOT_COLUMNS = ["source", "year", "week"]
+
+
+class ConsensusEngine:
+    """
+    Aligns each source's stat columns per player-week and computes, for each
+    stat, the weighted mean across the sources that project it, the weighted
+    median and the weighted standard deviation (spread). Sources are stacked
+    into a (sources x player-weeks x stats) array, so every statistic is
+    computed with array operations over all players at once.
+
+    compute() recomputes everything from a set of snapshots (e.g. a whole
+    season from columnar_store.load_projections); update() replaces one
+    source's snapshot of a week and recomputes only the player-weeks it
+    touches.
+    """
+
+    def __init__(self, weights=None, key_columns=None, stat_columns=None):
+        """
+        :param weights: dict mapping source -> weight. Sources not in it have
+                        weight 1
+        :param key_columns: the columns identifying a player. Defaults to
+                            "Player ID" (see player_ids) if the data has it,
+                            otherwise Name and Pos
+        :param stat_columns: the stats to combine. Defaults to every numeric
+                             column
+        """
+        self.weights = dict(weights or {})
+        self.key_columns = None if key_columns is None else list(key_columns)
+        self.stat_columns = (None if stat_columns is None
+                             else list(stat_columns))
+
+        # Every source's rows, indexed by (source, year, week, keys...)
+        self._data = None
+        # The consensus, indexed by (year, week, keys...)
+        self.result = None
+
+    def compute(self, df):
+        """
+        Recomputes the consensus from scratch
+
+        :param df: DataFrame of every source's rows, with source, year and
+                   week columns (like columnar_store.load_projections returns)
+        :return: the consensus DataFrame (see _combine)
+        """
+        self._data = self._prepare(df)
+        self.result = self._combine(self._data)
+        return self.get_result()
+
+    def update(self, df, source, year, week):
+        """
+        Replaces a source's snapshot of one week (e.g. a new scrape) and
+        recomputes the consensus of only the player-weeks in the old or new
+        snapshot
+
+        :param df: the source's DataFrame for the week
+        :param source: the source module's name
+        :param year: the year of the snapshot
+        :param week: the week of the snapshot
+        :return: the consensus DataFrame (see _combine)
+        """
+        snapshot = df.drop(columns=SNAPSHOT_COLUMNS, errors="ignore")
+        snapshot.insert(0, "source", source)
+        snapshot.insert(1, "year", int(year))
+        snapshot.insert(2, "week", int(week))
+        snapshot = self._prepare(snapshot)
+
+        if self._data is None:
+            self._data = snapshot
+            self.result = self._combine(self._data)
+            return self.get_result()
+
+        # Drop the source's old snapshot of the week
+        sources = self._data.index.get_level_values("source")
+        years = self._data.index.get_level_values("year")
+        weeks = self._data.index.get_level_values("week")
+        is_old = (sources == source) & (years == int(year)) & \
+            (weeks == int(week))
+        old_keys = self._data.index[is_old].droplevel("source")
+
+        new_columns = snapshot.columns.difference(self._data.columns)
+        for column in new_columns:
+            self._data[column] = np.nan
+        self._data = pd.concat([self._data[~is_old],
+                                snapshot.reindex(columns=self._data.columns)])
+
+        # Recompute only the player-weeks in either snapshot
+        touched = old_keys.union(snapshot.index.droplevel("source"))
+        data_keys = self._data.index.droplevel("source")
+        touched_result = self._combine(self._data[data_keys.isin(touched)])
+
+        result = self.result.reindex(
+            columns=self.result.columns.union(touched_result.columns,
+                                              sort=False))
+        result = result[~result.index.isin(touched)]
+        self.result = pd.concat([result, touched_result]).sort_index()
+        return self.get_result()
+
+    def get_result(self):
+        """
+        :return: the latest consensus, with the year, week and key columns
+                 as regular columns
+        """
+        if self.result is None:
+            return None
+        return self.result.reset_index()
+
+    def _prepare(self, df):
+        """
+        :param df: DataFrame of source rows with source, year and week
+                   columns
+        :return: the rows' stat columns as float64, indexed by source, year,
+                 week and the key columns. Missing values ('-') are NaN
+        """
+        key_columns = self._get_key_columns(df)
+        if self.stat_columns is not None:
+            stat_columns = [column for column in self.stat_columns
+                            if column in df.columns]
+        else:
+            excluded = set(SNAPSHOT_COLUMNS + key_columns)
+            stat_columns = [column for column in df.columns
+                            if column not in excluded]
+
+        stats = {}
+        for column in stat_columns:
+            values = pd.to_numeric(df[column].replace("-", np.nan),
+                                   errors="coerce")
+            # Keep only numeric columns (not e.g. Team or Opp)
+            if self.stat_columns is not None or values.notna().any():
+                stats[column] = values.to_numpy(dtype="float64")
+
+        index = pd.MultiIndex.from_frame(
+            df[SNAPSHOT_COLUMNS + key_columns].astype(
+                {"year": "int64", "week": "int64"}))
+        prepared = pd.DataFrame(stats, index=index)
+
+        # A source lists each player once per week
+        return prepared[~prepared.index.duplicated(keep="last")]
+
+    def _get_key_columns(self, df):
+        """
+        :param df: DataFrame of source rows
+        :return: the columns identifying a player
+        """
+        if self.key_columns is not None:
+            return self.key_columns
+        if "Player ID" in df.columns:
+            return ["Player ID"]
+        return ["Name", "Pos"]
+
+    def _combine(self, data):
+        """
+        Computes the consensus of a set of source rows
+
+        :param data: prepared rows (see _prepare)
+        :return: DataFrame indexed by year, week and the key columns, with
+                 the number of sources projecting each player, then each
+                 stat's weighted mean (named after the stat), weighted median
+                 ("<stat> Median") and weighted standard deviation
+                 ("<stat> Spread")
+        """
+        stat_columns = list(data.columns)
+        source_codes, sources = pd.factorize(
+            data.index.get_level_values("source"))
+        row_codes, rows = pd.factorize(data.index.droplevel("source"))
+
+        # values[source, player-week, stat], NaN where a source is missing
+        values = np.full((len(sources), len(rows), len(stat_columns)), np.nan)
+        values[source_codes, row_codes] = data.to_numpy(dtype="float64")
+
+        source_weights = np.array([self.weights.get(source, 1.0)
+                                   for source in sources], dtype="float64")
+        weights = np.where(np.isnan(values),
+                           0.0, source_weights[:, None, None])
+
+        means, medians, spreads = _get_weighted_stats(values, weights)
+
+        num_sources = np.zeros(len(rows), dtype="int64")
+        np.add.at(num_sources, row_codes, 1)
+
+        columns = {"Sources": num_sources}
+        for indx, column in enumerate(stat_columns):
+            columns[column] = means[:, indx]
+            columns[f"{column} Median"] = medians[:, indx]
+            columns[f"{column} Spread"] = spreads[:, indx]
+
+        index = pd.MultiIndex.from_tuples(
+            rows, names=data.index.names[1:])
+        return pd.DataFrame(columns, index=index).sort_index()
+
+
+def _get_weighted_stats(values, weights):
+    """
+    :param values: array of shape (sources, rows, stats), NaN where missing
+    :param weights: array of the same shape, 0 where values is missing
+    :return: A tuple of arrays of shape (rows, stats): the weighted means,
+             weighted medians and weighted standard deviations. NaN where no
+             source has a value
+    """
+    total_weight = weights.sum(axis=0)
+    has_value = total_weight > 0
+    safe_total = np.where(has_value, total_weight, 1.0)
+
+    filled = np.where(np.isnan(values), 0.0, values)
+    means = (weights * filled).sum(axis=0) / safe_total
+
+    variances = (weights * (filled - means) ** 2).sum(axis=0) / safe_total
+    spreads = np.sqrt(variances)
+
+    # Weighted median: sort each (row, stat) by value (NaNs last) and take
+    # the first value whose cumulative weight reaches half the total
+    order = np.argsort(values, axis=0, kind="stable")
+    sorted_values = np.take_along_axis(values, order, axis=0)
+    cumulative = np.cumsum(np.take_along_axis(weights, order, axis=0), axis=0)
+    median_indx = (cumulative < total_weight / 2).sum(axis=0)
+    median_indx = np.minimum(median_indx, values.shape[0] - 1)
+    medians = np.take_along_axis(sorted_values, median_indx[None], axis=0)[0]
+
+    # When the weight splits exactly in half, average the two middle values
+    # (like np.median)
+    at_half = np.take_along_axis(cumulative, median_indx[None], axis=0)[0]
+    next_indx = np.minimum(median_indx + 1, values.shape[0] - 1)
+    next_values = np.take_along_axis(sorted_values, next_indx[None],
+                                     axis=0)[0]
+    is_split = np.isclose(at_half, total_weight / 2) & ~np.isnan(next_values)
+    medians = np.where(is_split, (medians + next_values) / 2, medians)
+
+    nan = np.full(means.shape, np.nan)
+    return (np.where(has_value, means, nan),
+            np.where(has_value, medians, nan),
+            np.where(has_value, spreads, nan))
@@ -4,36 +4,39 @@ Description: Downloads Fantasy Football projections from fantasydata.com
 """
 
 import time
-import random
-import requests
 import pandas as pd
-import importlib
-from bs4 import BeautifulSoup
-from selenium import webdriver
-from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.common.by import By
-from selenium.webdriver.support import expected_conditions as EC
-import traceback
 
+from checkpoint import MANIFEST
+from columnar_store import STORE
+import html_tables
+from instrumentation import INSTRUMENTATION
+import schema
 import util_scripts
-importlib.reload(util_scripts)
+from page_cache import CACHE
+from request_scheduler import SCHEDULER
+from retry import RETRIER
+from snapshots import SNAPSHOTS
+from webdriver_pool import as_pool
 
 
-NEXT_REQUEST_TIME = 0
-
-
-def scrape(year: int, week: int, webdriver: webdriver, playoffs=False,
-           save_path="projections/projections_{year}_{week}_fantasydata.csv"):
+def scrape(year: int, week: int, webdriver, playoffs=False,
+           save_path="projections/projections_{year}_{week}_fantasydata.csv",
+           resume=False):
     """
     scrapes projections from NFL.com.
 
     :param year: the year to be scraped
     :param week: the week to be scraped
+    :param webdriver: the webdriver used to load each page, or a
+                      WebDriverPool to load several pages at once
+    :param resume: whether to skip work recorded as done in the checkpoint
+                   manifest (a week already saved, or pages already scraped
+                   before an interruption). Meant for backfills of past
+                   weeks; a re-scrape of the current week should fetch the
+                   updated projections
     :return: A DataFrame of each player's projected stats
     """
 
-    dfs = []
-
     # Renumber playoff weeks (to be used when saving the data)
     if playoffs:
         if year <= 2020:
@@ -43,36 +46,72 @@ def scrape(year: int, week: int, webdriver: webdriver, playoffs=False,
     else:
         save_week = week
 
-    print(f"Reading year {year}, week {save_week}...")
-
-    # Keeps track of progress to be printed to the console
-    ordinal_pos_indx = 1
-
-    # Iterates through QB, RB, WR, TE, K, DST, DL, LB, DB, respectively
-    for pos_indx in [2, 3, 4, 5, 6, 7, 9, 10, 11]:
-        print(f"\tReading position {ordinal_pos_indx} / 9...")
-        ordinal_pos_indx = ordinal_pos_indx + 1
-
-        for team_indx in range(0, 32):
-            dfs.append(
-                _get_team_position_df(year=year, week=week, playoffs=playoffs,
-                                      team_indx=team_indx, pos_indx=pos_indx,
-                                      webdriver=webdriver)
-            )
-        time.sleep(10 + random.uniform(0, 5))
-
-    # Save to CSV
-    save_path = save_path.format(year=year, week=save_week)
-
-    merged_df = pd.concat(objs=dfs, join="outer")
-    merged_df.to_csv(path_or_buf=save_path, index=False, na_rep='-')
-    print(f"Year {year}, week {save_week} saved to {save_path}\n")
-
-    return merged_df
+    with INSTRUMENTATION.run("fantasy_data", year=year, week=save_week):
+        save_path = save_path.format(year=year, week=save_week)
+        if resume and MANIFEST.is_partition_complete(
+                "fantasy_data", year, save_week, save_path):
+            print(f"Year {year}, week {save_week} already saved to "
+                  f"{save_path}, skipping\n")
+            # Typed like a freshly scraped week
+            return schema.apply_schema(
+                pd.read_csv(save_path, dtype=str, keep_default_na=False),
+                context=f"fantasy_data {year} week {save_week}")
+
+        print(f"Reading year {year}, week {save_week}...")
+        if resume:
+            num_done = MANIFEST.count_pages("fantasy_data", year, save_week)
+            if num_done > 0:
+                print(f"\tResuming, {num_done} pages already scraped")
+
+        # Iterates through QB, RB, WR, TE, K, DST, DL, LB, DB, respectively
+        pos_indices = [2, 3, 4, 5, 6, 7, 9, 10, 11]
+        work_items = [(pos_indx, team_indx) for pos_indx in pos_indices
+                      for team_indx in range(0, 32)]
+
+        def get_df(driver, work_item):
+            pos_indx, team_indx = work_item
+            if team_indx == 0:  # Print progress to the console
+                print(f"\tReading position "
+                      f"{pos_indices.index(pos_indx) + 1} / 9...")
+            if resume:
+                df = MANIFEST.load_page("fantasy_data", year, save_week,
+                                        pos_indx, team_indx)
+                if df is not None:
+                    return df
+
+            df = _get_team_position_df(year=year, week=week,
+                                       playoffs=playoffs, team_indx=team_indx,
+                                       pos_indx=pos_indx, webdriver=driver)
+            MANIFEST.save_page("fantasy_data", year, save_week, pos_indx,
+                               team_indx, df)
+            return df
+
+        # Results come back in (position, team) order regardless of the pool
+        # size
+        dfs = as_pool(webdriver).map(get_df, work_items)
+
+        # Save to CSV
+        # Concatenating pages with different categories loses the dtypes
+        with INSTRUMENTATION.stage("merge"):
+            merged_df = pd.concat(objs=dfs, join="outer")
+        merged_df = schema.apply_schema(
+            merged_df, context=f"fantasy_data {year} week {save_week}")
+        with INSTRUMENTATION.stage("write"):
+            SNAPSHOTS.save(merged_df, save_path, source="fantasy_data",
+                           year=year, week=save_week, index=False,
+                           na_rep='-', float_format=schema.FLOAT_FORMAT)
+            STORE.write(merged_df, source="fantasy_data", year=year,
+                        week=save_week)
+        INSTRUMENTATION.count("rows", len(merged_df))
+        MANIFEST.complete_partition("fantasy_data", year, save_week,
+                                    save_path, rows=len(merged_df))
+        print(f"Year {year}, week {save_week} saved to {save_path}\n")
+
+        return merged_df
 
 
 def _get_team_position_df(year: int, week: int, playoffs: bool, team_indx: int,
-                          pos_indx: int, webdriver: webdriver):
+                          pos_indx: int, webdriver):
     """
     gets DataFrame and then standardizes its headers
 
@@ -135,54 +174,58 @@ def _get_team_position_df(year: int, week: int, playoffs: bool, team_indx: int,
         raise ValueError(f"Position is {pos_indx}, should be one of "
                          "[2, 3, 4, 5, 6, 7, 9, 10, 11]")
 
+    url = _get_url(year=year, week=week, playoffs=playoffs,
+                   team_indx=team_indx, pos_indx=pos_indx)
+
+    # Served from the page cache if it's fresh
+    html = RETRIER.call(url, CACHE.capture, url, source="fantasy_data",
+                        load_function=lambda: _load_page(webdriver, url))
+
+    return _parse_page(html=html, labels=labels, pos_indx=pos_indx,
+                       team_indx=team_indx)
+
+
+def _get_url(year: int, week: int, playoffs: bool, team_indx: int,
+             pos_indx: int):
+    """
+    :param year: the year to be scraped
+    :param week: the week to be scraped
+    :param playoffs: whether the week is in the playoffs
+    :param team_indx: the team to be scraped
+    :param pos_indx: the position to be scraped
+    :return: the URL of the team's and position's projections page
+    """
     if playoffs:
         seasontype = 3
     else:  # regular season
         seasontype = 1
-    url = ("https://fantasydata.com/nfl/fantasy-football-weekly-projections?"
-           f"position={pos_indx}&team={team_indx}&season={year}"
-           f"&seasontype={seasontype}&scope=2&startweek={week}&endweek={week}")
-
-    # Wait before scraping next URL
-    global NEXT_REQUEST_TIME
-    current_time = time.time()
-    if current_time < NEXT_REQUEST_TIME:
-        time.sleep(NEXT_REQUEST_TIME - current_time)
-
-    # Try scraping URL
-    while True:
-        try:
-            min_delay = 2 + random.uniform(0, 3)
-            current_time = time.time()
-            NEXT_REQUEST_TIME = current_time + min_delay
-
-            webdriver.get(url)
-            element = WebDriverWait(webdriver, timeout=60).until(
-                          EC.visibility_of_element_located((
-                              By.XPATH, "//div[@class='k-grid-header']"))
-                      )
-            time.sleep(1)
-            break  # continue if successful
-        except Exception:  # If unsuccessful, wait and try again
-            print(traceback.format_exc())
-            print("Waiting 30 min to retry...\n")
-            time.sleep(1800)
+    return ("https://fantasydata.com/nfl/fantasy-football-weekly-projections?"
+            f"position={pos_indx}&team={team_indx}&season={year}"
+            f"&seasontype={seasontype}&scope=2&startweek={week}"
+            f"&endweek={week}")
+
+
+@INSTRUMENTATION.stage("parse")
+def _parse_page(html: str, labels: dict, pos_indx: int, team_indx: int):
+    """
+    parses a rendered projections page and standardizes its headers
 
+    :param html: the rendered page's HTML
+    :param labels: dict mapping expected labels to standardized labels
+    :param pos_indx: the position that was scraped
+    :param team_indx: the team that was scraped
+    :return: A DataFrame with standardized headers
+    """
     # Get page contents
-    html = webdriver.page_source
-    soup = BeautifulSoup(html, 'html.parser')
+    root = html_tables.parse_html(html)
 
     # Get headers
-    headers_table = soup.find("div", {"class": "k-grid-header"})
-    headers_table = headers_table.find("table", {"role": "grid"})
-    headers_df = pd.read_html(str(headers_table))[0]
+    headers_table = html_tables.find(root, "div", "k-grid-header")
+    headers_table = html_tables.find(headers_table, "table", role="grid")
 
-    # Merge multi-level headers if applicable:
-    if type(headers_df.columns.values.tolist()[0]) == tuple:
-        headers_df.columns = ['_'.join(col)
-                              for col in headers_df.columns.values]
-
-    actual_labels = headers_df.columns.values.tolist()
+    # Multi-level headers are merged with "_"
+    actual_labels = html_tables.read_headers(headers_table,
+                                             header_style="pandas")
 
     # Check that labels have not changed
     expected_labels = list(labels.keys())
@@ -202,41 +245,40 @@ def _get_team_position_df(year: int, week: int, playoffs: bool, team_indx: int,
     proj_rows = []
     name_rows = []
 
+    grid = html_tables.find(root, "section", "fantasy-stats-section")
+    grid = html_tables.find(grid, "div", "stats-grid-container")
+    grid = html_tables.find(grid, "div", "k-display-block")
+
     # read proj table
-    proj_table = soup.find("section", {"class": "fantasy-stats-section"})
-    proj_table = proj_table.find("div", {"class": "stats-grid-container"})
-    proj_table = proj_table.find("div", {"class": "k-display-block"})
-    proj_table = proj_table.find("div", {"class": "k-grid-content"})
-    proj_table = proj_table.find("table", {"role": "grid"})    
+    proj_table = html_tables.find(grid, "div", "k-grid-content")
+    proj_table = html_tables.find(proj_table, "table", role="grid")
 
-    table_rows = proj_table.find("tbody", {"role": "rowgroup"}).find_all(
-                                        "tr", {"class": "ng-scope"})
+    table_rows = html_tables.find(proj_table, "tbody", role="rowgroup")
+    table_rows = html_tables.find_all(table_rows, "tr", "ng-scope")
 
     # get rid of scrambled (paywalled) rows
-    table_rows = [tag for tag in table_rows if 'scrambled' not in
-                                                ''.join(tag['class'])]
+    table_rows = [tag for tag in table_rows
+                  if 'scrambled' not in tag.get("class", "")]
     num_rows = len(table_rows)
 
-    for table_row in table_rows:            
-        row_cells = table_row.find_all("td", {"role": "gridcell"})
-        row_cells = [cell.get_text() for cell in row_cells]
+    for table_row in table_rows:
+        row_cells = html_tables.find_all(table_row, "td", role="gridcell")
+        row_cells = [html_tables.get_text(cell) for cell in row_cells]
 
         proj_rows.append(row_cells)
 
     # read name table
-    info_table = soup.find("section", {"class": "fantasy-stats-section"})
-    info_table = info_table.find("div", {"class": "stats-grid-container"})
-    info_table = info_table.find("div", {"class": "k-display-block"})
-    info_table = info_table.find("div", {"class": "k-grid-content-locked"})
-    info_table = info_table.find("table")
+    info_table = html_tables.find(grid, "div", "k-grid-content-locked")
+    info_table = html_tables.find(info_table, "table")
 
-    table_rows = info_table.find("tbody")
-    table_rows = table_rows.find_all("tr", {"class": "ng-scope"})
+    table_rows = html_tables.find(info_table, "tbody")
+    table_rows = html_tables.find_all(table_rows, "tr", "ng-scope")
 
     for table_row in range(num_rows):
         row = table_rows[table_row]
-        info_col = row.find("td", {"class": "align-left"})
-        name = info_col.find("a", {"style": "font-weight:bold;"}).get_text()
+        info_col = html_tables.find(row, "td", "align-left")
+        name = html_tables.get_text(
+            html_tables.find(info_col, "a", style="font-weight:bold;"))
 
         name_rows.append([name])
 
@@ -246,4 +288,33 @@ def _get_team_position_df(year: int, week: int, playoffs: bool, team_indx: int,
     df = pd.concat([name_df, proj_df], axis=1)
     df.reset_index(drop=True)
 
-    return df
+    return schema.apply_schema(
+        df, context=f"fantasy_data position {pos_indx}, team {team_indx}")
+
+
+def _load_page(webdriver, url: str):
+    """
+    Loads a projections page once fantasydata.com's politeness schedule
+    allows, and waits for its grid to render
+
+    :param webdriver: the webdriver to load the page with
+    :param url: the URL to load
+    :return: the rendered page's HTML
+    """
+    # Selenium is only imported once a page is actually loaded, so cached
+    # pages can be parsed without it
+    from selenium.webdriver.common.by import By
+    from selenium.webdriver.support import expected_conditions as EC
+    from selenium.webdriver.support.ui import WebDriverWait
+
+    with SCHEDULER.slot(url):
+        webdriver.get(url)
+        with INSTRUMENTATION.stage("wait"):
+            WebDriverWait(webdriver, timeout=60).until(
+                EC.visibility_of_element_located((
+                    By.XPATH, "//div[@class='k-grid-header']"))
+            )
+            time.sleep(1)
+
+    with INSTRUMENTATION.stage("render"):
+        return webdriver.page_source
@@ -3,15 +3,20 @@ File: sportsline.py
 Description: Downloads Fantasy Football projections from SportsLine
 """
 
-import importlib
-import time
-from functools import reduce
-import requests
-import pandas as pd
-from bs4 import BeautifulSoup
+import asyncio
 
+import html_tables
+from instrumentation import INSTRUMENTATION
+from columnar_store import STORE
+import schema
 import util_scripts
-importlib.reload(util_scripts)
+from page_cache import CACHE
+from snapshots import SNAPSHOTS
+
+
+# Pages to scrape: QB, offensive flex, kicker, team defense, and individual
+# defensive players
+POSITIONS = ["qb", "flex", "pk", "td", "flexidp"]
 
 
 def scrape(year, week, 
@@ -24,46 +29,78 @@ def scrape(year, week,
     :return: A DataFrame of each player's projected stats
     """
 
-    print(f"Reading year {year}, week {week}...")
+    with INSTRUMENTATION.run("football_guys", year=year, week=week):
+        print(f"Reading year {year}, week {week}...")
 
-    # Read qb page
-    qb_df = _get_position_df(week=week, position="qb")
-    time.sleep(1)
+        # Read qb, offensive flex, kicker, team defense and individual
+        # defensive player pages
+        position_dfs = [_get_position_df(week=week, position=position)
+                        for position in POSITIONS]
 
-    # Read offensive flex page
-    rec_df = _get_position_df(week=week, position="flex")
-    time.sleep(1)
+        return _save(year=year, week=week, dfs=position_dfs,
+                     save_path=save_path)
 
-    # Read kicker page
-    k_df = _get_position_df(week=week, position="pk")
-    time.sleep(1)
 
-    # Read team defense page
-    td_df = _get_position_df(week=week, position="td")
-    time.sleep(1)
+async def scrape_async(year, week,
+                       save_path="projections/projections_{year}_{week}_footballguys.csv"):
+    """
+    scrapes projections from FootballGuys, fetching every position's page
+    concurrently (still subject to the shared per-host politeness schedule)
+
+    :param year: the current year
+    :param week: the week to be scraped
+    :return: A DataFrame of each player's projected stats
+    """
 
-    # Read individual defensive player page
-    idp_df = _get_position_df(week=week, position="flexidp")
+    with INSTRUMENTATION.run("football_guys", year=year, week=week):
+        print(f"Reading year {year}, week {week}...")
+
+        position_dfs = await asyncio.gather(
+            *[_get_position_df_async(week=week, position=position)
+              for position in POSITIONS])
+
+        return _save(year=year, week=week, dfs=position_dfs,
+                     save_path=save_path)
+
+
+def _save(year, week, dfs, save_path):
+    """
+    merges the position DataFrames and saves them to a CSV
+
+    :param year: the current year
+    :param week: the week that was scraped
+    :param dfs: the DataFrames of each position
+    :param save_path: the path to save to
+    :return: the merged DataFrame
+    """
 
     # Save to CSV
     formatted_week = str(week).zfill(2)
     save_path = save_path.format(year=year, week=formatted_week)
 
-    merged_df = reduce(lambda df1, df2: pd.merge(df1, df2, how="outer"),
-                       [qb_df, rec_df, k_df, td_df, idp_df])
-    merged_df.to_csv(path_or_buf=save_path, index=False, na_rep='-')
+    context = f"football_guys {year} week {week}"
+    merged_df = util_scripts.combine_frames(dfs, keys=["Name", "Team", "Pos"],
+                                            context=context)
+    # Combining positions with different categories loses the dtypes
+    merged_df = schema.apply_schema(merged_df, context=context)
+    with INSTRUMENTATION.stage("write"):
+        SNAPSHOTS.save(merged_df, save_path, source="football_guys",
+                       year=year, week=week, index=False, na_rep='-',
+                       float_format=schema.FLOAT_FORMAT)
+        STORE.write(merged_df, source="football_guys", year=year, week=week)
+    INSTRUMENTATION.count("rows", len(merged_df))
     print(f"Year {year}, week {week} saved to {save_path}\n")
 
     return merged_df
 
 
-def _get_position_df(week, position):
+def _get_labels(position):
     """
-    gets DataFrame and then standardizes its headers
+    gets the expected labels of a position's table, and the labels to change
+    them to
 
-    :param week: the week to be scraped
     :param position: the position to be scraped
-    :return: A DataFrame with standardized headers
+    :return: A tuple of the expected labels and the new labels
     """
 
     # Expected labels and labels to change them to
@@ -98,22 +135,76 @@ def _get_position_df(week, position):
         raise ValueError(f"Position is {position}, should be one of "
                           "[qb, flex, pk, td, flexidp]")
 
-    # Get data from site
-    url = (f"https://www.footballguys.com/projections/inseason?pos={position}"
-           f"&who=996&week={week}")
+    return expected_labels, new_labels
+
+
+def _get_position_df(week, position):
+    """
+    gets DataFrame and then standardizes its headers
+
+    :param week: the week to be scraped
+    :param position: the position to be scraped
+    :return: A DataFrame with standardized headers
+    """
+
+    _get_labels(position)  # check that the position is valid
+
+    url = _get_url(week=week, position=position)
+    html = CACHE.fetch(url, source="football_guys")
+
+    return _parse_position_page(html=html, position=position)
 
-    page = requests.get(url)
-    soup = BeautifulSoup(page.text, 'html.parser')
 
-    tables = soup.select("table.table.data")
+async def _get_position_df_async(week, position):
+    """
+    coroutine version of _get_position_df()
+
+    :param week: the week to be scraped
+    :param position: the position to be scraped
+    :return: A DataFrame with standardized headers
+    """
+
+    _get_labels(position)  # check that the position is valid
+
+    url = _get_url(week=week, position=position)
+    html = await CACHE.fetch_async(url, source="football_guys")
+
+    return _parse_position_page(html=html, position=position)
+
+
+def _get_url(week, position):
+    """
+    :param week: the week to be scraped
+    :param position: the position to be scraped
+    :return: the URL of the position's projections page
+    """
+    return (f"https://www.footballguys.com/projections/inseason?pos={position}"
+            f"&who=996&week={week}")
+
+
+@INSTRUMENTATION.stage("parse")
+def _parse_position_page(html, position):
+    """
+    parses a position's projections page and standardizes its headers
+
+    :param html: the page's HTML
+    :param position: the position that was scraped
+    :return: A DataFrame with standardized headers
+    """
+
+    expected_labels, new_labels = _get_labels(position)
+
+    root = html_tables.parse_html(html)
+
+    tables = root.xpath(f"//table[{html_tables.has_class('table')} and "
+                        f"{html_tables.has_class('data')}]")
 
     if len(tables) != 1:
         raise Exception(f"Expected one table, page has {len(tables)} tables")
 
     # Convert to DataFrame
-    html_table = str(tables[0])
-
-    position_df = pd.read_html(html_table)[0]
+    position_df = html_tables.read_table(tables[0], header_style="pandas",
+                                         convert_numeric=True)
 
     # the first col is indices. The last col is blank. Drop those
     position_df = position_df.drop(position_df.columns[0], axis=1)
@@ -140,4 +231,5 @@ def _get_position_df(week, position):
 
     # replce labels
     position_df = position_df.set_axis(new_labels, axis=1)
-    return position_df
+    return schema.apply_schema(position_df,
+                               context=f"football_guys position {position}")
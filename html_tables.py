@@ -0,0 +1,390 @@
+"""
+File: html_tables.py
+Description: Fast HTML table extraction built on lxml. Header rows are joined,
+             colspans/rowspans are expanded and duplicate headers are renamed
+             in a single pass over the table, without building a
+             BeautifulSoup tree or round-tripping through pd.read_html
+"""
+
+import re
+
+import lxml.html
+
+# numpy and pandas are imported by the functions that build DataFrames, so
+# fetching can start before they have loaded (see scrape.py)
+
+
+_PARSER = lxml.html.HTMLParser(encoding="utf-8")
+# pd.read_html collapses line breaks and runs of whitespace in cell text
+_WHITESPACE = re.compile(r"[\r\n]+|\s{2,}")
+
+
+def parse_html(html):
+    """
+    :param html: an HTML document or fragment, as a str or bytes
+    :return: the root lxml element
+    """
+    if isinstance(html, str):
+        html = html.encode("utf-8")
+    return lxml.html.fromstring(html, parser=_PARSER)
+
+
+def extract_tables(html: str, table_ids):
+    """
+    Finds and parses only the tables with the given IDs, without parsing the
+    rest of the page. Tables wrapped in HTML comments (as pro-football-
+    reference.com ships most of its tables) are found as well. Tables must
+    not contain nested tables
+
+    :param html: the page's HTML
+    :param table_ids: the IDs of the tables to extract
+    :return: dict mapping each table ID found to its <table> lxml element
+    """
+    table_ids = list(table_ids)
+    if len(table_ids) == 0:
+        return {}
+
+    pattern = re.compile(
+        r"<table\b[^>]*?\bid\s*=\s*[\"']?("
+        + "|".join(re.escape(table_id) for table_id in table_ids)
+        + r")[\"'\s>]", re.IGNORECASE)
+
+    tables = {}
+    for match in pattern.finditer(html):
+        table_id = match.group(1)
+        if table_id in tables:  # keep the first copy of each table
+            continue
+
+        end = html.find("</table>", match.end())
+        if end == -1:
+            raise Exception(f"Table {table_id} has no closing tag")
+        fragment = html[match.start():end + len("</table>")]
+
+        tables[table_id] = lxml.html.fragment_fromstring(
+                               fragment.encode("utf-8"), parser=_PARSER)
+        if len(tables) == len(table_ids):
+            break
+
+    return tables
+
+
+def has_class(class_name: str):
+    """
+    :param class_name: a CSS class name
+    :return: an XPath predicate matching elements with that class (like
+             BeautifulSoup's {"class": class_name})
+    """
+    return (f"contains(concat(' ', normalize-space(@class), ' '), "
+            f"' {class_name} ')")
+
+
+def find_all(element, tag: str, class_name: str = None, **attributes):
+    """
+    Finds descendants by tag, class and attribute values
+
+    :param element: the lxml element to search under
+    :param tag: the tag name
+    :param class_name: a class the descendants must have, if any
+    :param attributes: attributes the descendants must have, with their values
+    :return: list of matching lxml elements
+    """
+    predicates = []
+    if class_name is not None:
+        predicates.append(has_class(class_name))
+    for name, value in attributes.items():
+        predicates.append(f"@{name}='{value}'")
+
+    xpath = f".//{tag}"
+    if predicates:
+        xpath += "[" + " and ".join(predicates) + "]"
+    return element.xpath(xpath)
+
+
+def find(element, tag: str, class_name: str = None, **attributes):
+    """
+    Finds the first descendant by tag, class and attribute values
+
+    :param element: the lxml element to search under
+    :param tag: the tag name
+    :param class_name: a class the descendant must have, if any
+    :param attributes: attributes the descendant must have, with their values
+    :return: the first matching lxml element, or None
+    """
+    matches = find_all(element, tag, class_name, **attributes)
+    return matches[0] if matches else None
+
+
+def get_text(element):
+    """
+    :param element: an lxml element
+    :return: the element's text, including its descendants' (like
+             BeautifulSoup's get_text())
+    """
+    return element.text_content()
+
+
+def read_table(table, raw: bool = False, header_style: str = "count",
+               convert_numeric: bool = False):
+    """
+    Reads an HTML table into a DataFrame. Header rows are the rows of <thead>
+    (or, if there isn't one, the leading rows made only of <th> cells); rows
+    of multi-level headers are joined with "_".
+
+    :param table: the <table> lxml element
+    :param raw: if True, cells are lxml elements (for callers that need
+                links or attributes). Otherwise cells are plain strings
+    :param header_style: how headers are named. "count" names them like
+                util_scripts.read_raw_html_table always has (duplicates
+                get a number appended, e.g. "Yds2"). "pandas" names them
+                like pd.read_html (duplicates get ".1" appended, blanks
+                become "Unnamed: ..." and text is stripped, with
+                runs of whitespace collapsed)
+    :param convert_numeric: whether to treat blank cells as missing and
+                convert columns that are entirely numeric to numbers (like
+                pd.read_html). Ignored if raw
+    :return: A DataFrame of the table's body
+    """
+    import numpy as np
+    import pandas as pd
+
+    if header_style not in ["count", "pandas"]:
+        raise ValueError(f"header_style is {header_style}, should be one of "
+                         "[count, pandas]")
+
+    header_rows, body_rows = _split_rows(table)
+    strip = header_style == "pandas"
+
+    header_grid = _expand_spans(header_rows)
+    header_grid = [[_text(cell, strip) for cell in row] for row in header_grid]
+    if header_style == "pandas":
+        headers = _pandas_headers(header_grid)
+    else:
+        headers = _count_headers(header_grid)
+
+    body_grid = _expand_spans(body_rows)
+    if not raw:
+        body_grid = [[_text(cell, strip) for cell in row] for row in body_grid]
+
+    # Tables without headers get numbered columns (like pd.read_html)
+    if len(headers) == 0:
+        headers = list(range(max((len(row) for row in body_grid),
+                                 default=0)))
+
+    # Pad or trim each row to the header width (like pd.read_html)
+    num_cols = len(headers)
+    body_grid = [row[:num_cols] + [None] * (num_cols - len(row))
+                 for row in body_grid]
+
+    df = pd.DataFrame(body_grid, columns=headers)
+
+    if convert_numeric and not raw:
+        # Blank cells are missing values (like pd.read_html)
+        df = df.replace("", np.nan)
+        for column_indx in range(num_cols):
+            column = df.iloc[:, column_indx]
+            try:
+                column = pd.to_numeric(column.str.replace(",", "",
+                                                          regex=False))
+            except (ValueError, TypeError, AttributeError):
+                continue
+            df[df.columns[column_indx]] = column
+
+    return df
+
+
+def read_headers(table, header_style: str = "count"):
+    """
+    Reads only the headers of an HTML table
+
+    :param table: the <table> lxml element
+    :param header_style: "count" or "pandas" (see read_table)
+    :return: list of the table's headers
+    """
+    header_rows, _ = _split_rows(table)
+    header_grid = _expand_spans(header_rows)
+    header_grid = [[_text(cell, header_style == "pandas") for cell in row]
+                   for row in header_grid]
+
+    if header_style == "pandas":
+        return _pandas_headers(header_grid)
+    elif header_style == "count":
+        return _count_headers(header_grid)
+    raise ValueError(f"header_style is {header_style}, should be one of "
+                     "[count, pandas]")
+
+
+def _split_rows(table):
+    """
+    :param table: the <table> lxml element
+    :return: A tuple of the list of header <tr>s and the list of body <tr>s
+    """
+    thead = table.find("thead")
+    tbodies = table.findall("tbody")
+
+    if thead is not None:
+        header_rows = thead.findall("tr")
+    else:
+        header_rows = []
+
+    if tbodies:
+        body_rows = [row for tbody in tbodies for row in tbody.findall("tr")]
+    else:
+        body_rows = [row for row in table.findall("tr")]
+
+    # Without a <thead>, leading rows made only of <th> cells are headers
+    if thead is None:
+        while body_rows and all(cell.tag == "th"
+                                for cell in _cells(body_rows[0])):
+            header_rows.append(body_rows.pop(0))
+
+    return header_rows, body_rows
+
+
+def _cells(row):
+    """
+    :param row: a <tr> lxml element
+    :return: list of the row's <th> and <td> elements
+    """
+    return [cell for cell in row if cell.tag in ("th", "td")]
+
+
+def _expand_spans(rows):
+    """
+    Expands colspans and rowspans so that each row has one entry per column
+
+    :param rows: list of <tr> lxml elements
+    :return: list of rows, each a list of cell elements
+    """
+    grid = []
+    # (column index, cell, number of rows it still spans) carried down from
+    # previous rows
+    remainder = []
+
+    for row in rows:
+        values = []
+        next_remainder = []
+        index = 0
+
+        for cell in _cells(row):
+            # Fill in cells spanning down from previous rows
+            while remainder and remainder[0][0] <= index:
+                _, prev_cell, prev_rowspan = remainder.pop(0)
+                values.append(prev_cell)
+                if prev_rowspan > 1:
+                    next_remainder.append((index, prev_cell,
+                                           prev_rowspan - 1))
+                index += 1
+
+            rowspan = _span(cell, "rowspan")
+            for _ in range(_span(cell, "colspan")):
+                values.append(cell)
+                if rowspan > 1:
+                    next_remainder.append((index, cell, rowspan - 1))
+                index += 1
+
+        # Cells spanning down from previous rows after this row's last cell
+        for _, prev_cell, prev_rowspan in remainder:
+            values.append(prev_cell)
+            if prev_rowspan > 1:
+                next_remainder.append((index, prev_cell, prev_rowspan - 1))
+            index += 1
+
+        grid.append(values)
+        remainder = next_remainder
+
+    return grid
+
+
+def _span(cell, attribute):
+    """
+    :param cell: a <th> or <td> lxml element
+    :param attribute: "colspan" or "rowspan"
+    :return: the cell's span (1 if missing or invalid)
+    """
+    try:
+        return max(int(cell.get(attribute, 1)), 1)
+    except ValueError:
+        return 1
+
+
+def _text(cell, strip):
+    """
+    :param cell: an lxml element
+    :param strip: whether to collapse runs of whitespace and strip
+                  surrounding whitespace (like pd.read_html)
+    :return: the cell's text
+    """
+    text = cell.text_content()
+    return _WHITESPACE.sub(" ", text).strip() if strip else text
+
+
+def _count_headers(header_grid):
+    """
+    Joins multi-level headers with "_" and appends a count to duplicates
+    (the second "Yds" becomes "Yds2")
+
+    :param header_grid: list of header rows, each a list of strings
+    :return: list of headers
+    """
+    headers = []
+    for header_row in header_grid:
+        if len(headers) == 0:
+            headers = list(header_row)
+        else:
+            # combine multi-level headers
+            if len(headers) != len(header_row):
+                raise Exception("Lengths of lists aren't the same: {len1} vs "
+                                "{len2}".format(len1=len(headers),
+                                                len2=len(header_row)))
+            headers = [header + "_" + text
+                       for header, text in zip(headers, header_row)]
+
+    # Rename duplicate headers
+    header_counts = {}
+    for index, header in enumerate(headers):
+        if header not in header_counts:
+            header_counts[header] = 1
+        else:
+            header_counts[header] += 1
+            headers[index] = header + str(header_counts[header])
+
+    return headers
+
+
+def _pandas_headers(header_grid):
+    """
+    Names headers like pd.read_html: a single header row is used as is, and
+    multi-level headers are joined with "_" (as the scrapers have always done
+    with read_html's MultiIndex). Blank headers become "Unnamed: ..." and
+    duplicates get ".1", ".2", ... appended
+
+    :param header_grid: list of header rows, each a list of strings
+    :return: list of headers
+    """
+    if len(header_grid) == 0:
+        return []
+
+    num_cols = max(len(row) for row in header_grid)
+    header_grid = [row + [""] * (num_cols - len(row)) for row in header_grid]
+
+    if len(header_grid) == 1:
+        headers = [text if text != "" else f"Unnamed: {col_indx}"
+                   for col_indx, text in enumerate(header_grid[0])]
+    else:
+        headers = []
+        for col_indx in range(num_cols):
+            levels = [row[col_indx] if row[col_indx] != ""
+                      else f"Unnamed: {col_indx}_level_{level}"
+                      for level, row in enumerate(header_grid)]
+            headers.append("_".join(levels))
+
+    # Rename duplicate headers
+    header_counts = {}
+    for index, header in enumerate(headers):
+        if header not in header_counts:
+            header_counts[header] = 0
+        else:
+            header_counts[header] += 1
+            headers[index] = f"{header}.{header_counts[header]}"
+
+    return headers
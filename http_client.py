@@ -0,0 +1,177 @@
+"""
+File: http_client.py
+Description: HTTP client shared by the requests-based scrapers, keeping warm
+             connections to each host, negotiating compression and recording
+             how many bytes each host sends
+"""
+
+import threading
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from request_scheduler import get_host
+
+
+def _get_accept_encoding():
+    """
+    :return: the Accept-Encoding header value. Brotli is only asked for if a
+             decoder for it is installed (urllib3 uses brotli or brotlicffi)
+    """
+    for module in ["brotli", "brotlicffi"]:
+        try:
+            __import__(module)
+            return "gzip, deflate, br"
+        except ImportError:
+            pass
+    return "gzip, deflate"
+
+
+class HttpClient:
+    """
+    A requests.Session with a connection pool per host, so consecutive pages
+    from a site (e.g. NFL.com's paginated listings) reuse one keep-alive
+    connection instead of opening a new TCP and TLS connection each. Every
+    request has a timeout, and the bytes received (before and after
+    decompression) are recorded per host.
+
+    The client doesn't retry by itself; fetches are retried by retry.RETRIER.
+    """
+
+    def __init__(self, timeout=(10, 30), pool_maxsize: int = 10,
+                 headers: dict = None):
+        """
+        :param timeout: seconds to wait for a connection and then between
+                        bytes of the response, as a (connect, read) tuple or
+                        a single number for both
+        :param pool_maxsize: the maximum number of connections kept open to
+                             each host. Should be at least the number of
+                             concurrent fetches to one host
+        :param headers: headers sent with every request, in addition to
+                        Accept-Encoding
+        """
+        self.timeout = timeout
+        self.pool_maxsize = pool_maxsize
+        self.headers = {"Accept-Encoding": _get_accept_encoding(),
+                        **(headers or {})}
+
+        self._session = None
+        self._stats = {}
+        self._lock = threading.Lock()
+
+    def _get_session(self):
+        """
+        Creates the session on first use
+
+        :return: the requests.Session
+        """
+        with self._lock:
+            if self._session is None:
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=10,
+                                      pool_maxsize=self.pool_maxsize,
+                                      max_retries=0)
+                session.mount("http://", adapter)
+                session.mount("https://", adapter)
+                session.headers.update(self.headers)
+                self._session = session
+            return self._session
+
+    def get(self, url: str, params: dict = None, headers: dict = None,
+            timeout=None):
+        """
+        Gets a page. Drop-in for requests.get
+
+        :param url: the URL to get
+        :param params: query parameters
+        :param headers: headers for this request only
+        :param timeout: overrides the client's timeout for this request
+        :return: the requests.Response (its body already read)
+        """
+        response = self._get_session().get(
+            url, params=params, headers=headers,
+            timeout=self.timeout if timeout is None else timeout)
+
+        # Reading the body here lets tell() count the bytes on the wire
+        content_bytes = len(response.content)
+        wire_bytes = response.raw.tell() if response.raw is not None else \
+            content_bytes
+        with self._lock:
+            stats = self._stats.setdefault(get_host(url), {
+                "requests": 0, "wire_bytes": 0, "content_bytes": 0,
+                "compressed": 0, "seconds": 0.0})
+            stats["requests"] += 1
+            stats["wire_bytes"] += wire_bytes
+            stats["content_bytes"] += content_bytes
+            stats["seconds"] += response.elapsed.total_seconds()
+            if response.headers.get("Content-Encoding"):
+                stats["compressed"] += 1
+        return response
+
+    def stats(self):
+        """
+        :return: dict mapping each host to its number of requests, how many
+                 of them were compressed, bytes received over the wire and
+                 after decompression, seconds until the response headers
+                 arrived, and connections opened
+        """
+        connections = self._get_connections()
+        with self._lock:
+            return {host: {**host_stats,
+                           "connections": connections.get(host, 0)}
+                    for host, host_stats in self._stats.items()}
+
+    def _get_connections(self):
+        """
+        :return: dict mapping each host to the number of connections opened
+                 to it
+        """
+        with self._lock:
+            session = self._session
+        if session is None:
+            return {}
+
+        connections = {}
+        for adapter in set(session.adapters.values()):
+            pools = adapter.poolmanager.pools
+            for key in pools.keys():
+                pool = pools.get(key)
+                if pool is not None:
+                    connections[pool.host] = connections.get(pool.host, 0) + \
+                        pool.num_connections
+        return connections
+
+    def reset_stats(self):
+        """
+        Clears the recorded statistics
+        """
+        with self._lock:
+            self._stats = {}
+
+    def report(self):
+        """
+        Prints the requests, connections and bytes received for each host
+        """
+        for host, host_stats in sorted(self.stats().items()):
+            ratio = host_stats["content_bytes"] / host_stats["wire_bytes"] \
+                if host_stats["wire_bytes"] else 1
+            print(f"{host}: {host_stats['requests']} requests over "
+                  f"{host_stats['connections']} connections, "
+                  f"{host_stats['wire_bytes'] / 1024 ** 2:.1f} MB received "
+                  f"({host_stats['compressed']} compressed responses, "
+                  f"{ratio:.1f}x), {host_stats['seconds']:.1f}s waiting "
+                  "for responses")
+
+    def close(self):
+        """
+        Closes the pooled connections. The client opens new ones if it is
+        used again
+        """
+        with self._lock:
+            session, self._session = self._session, None
+        if session is not None:
+            session.close()
+
+
+# Client shared by all scrapers
+CLIENT = HttpClient()
@@ -0,0 +1,247 @@
+"""
+File: instrumentation.py
+Description: Records where each scrape run's time goes (fetching, waiting,
+             backing off, rendering, parsing, normalizing, merging and
+             writing), with the bytes fetched and rows produced, and
+             optionally profiles runs
+"""
+
+import contextvars
+import cProfile
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
+
+# Stages time is recorded under
+STAGES = ["fetch", "wait", "backoff", "render", "parse", "normalize", "merge",
+          "write"]
+
+# The run being recorded in the current thread or task, if any
+_CURRENT_RUN = contextvars.ContextVar("current_run", default=None)
+# The innermost stage being timed in the current thread or task, if any
+_CURRENT_STAGE = contextvars.ContextVar("current_stage", default=None)
+
+
+class Run:
+    """
+    One scrape run's measurements. Stage times are exclusive (a stage nested
+    in another, e.g. waiting for a slot while fetching, is only counted
+    once), and are summed over every thread and task of the run, so with
+    concurrent fetches they can add up to more than the wall-clock time.
+    """
+
+    def __init__(self, source, year=None, week=None):
+        """
+        :param source: the source module's name
+        :param year: the year being scraped
+        :param week: the week being scraped
+        """
+        self.source = source
+        self.year = year
+        self.week = week
+        self.started = datetime.now()
+        self.seconds = {stage: 0.0 for stage in STAGES}
+        self.calls = {stage: 0 for stage in STAGES}
+        self.counts = {"bytes_fetched": 0, "pages_fetched": 0,
+                       "cache_hits": 0, "retries": 0, "key_conflicts": 0,
+                       "rows": 0}
+        self.wall_seconds = None
+        self.error = None
+        self.profile_path = None
+
+        self._start = time.perf_counter()
+        self._lock = threading.Lock()
+
+    def add_time(self, stage, seconds):
+        """
+        :param stage: the stage the time was spent in
+        :param seconds: the number of seconds
+        """
+        with self._lock:
+            self.seconds[stage] = self.seconds.get(stage, 0.0) + seconds
+            self.calls[stage] = self.calls.get(stage, 0) + 1
+
+    def count(self, name, amount=1):
+        """
+        :param name: the counter (e.g. "bytes_fetched" or "rows")
+        :param amount: the amount to add to it
+        """
+        with self._lock:
+            self.counts[name] = self.counts.get(name, 0) + amount
+
+    def get_record(self):
+        """
+        :return: dict of the run's measurements, as saved to JSON
+        """
+        with self._lock:
+            return {
+                "source": self.source,
+                "year": self.year,
+                "week": self.week,
+                "started": self.started.isoformat(timespec="seconds"),
+                "wall_seconds": self.wall_seconds,
+                "stages": {stage: {"seconds": round(self.seconds[stage], 6),
+                                   "calls": self.calls[stage]}
+                           for stage in self.seconds},
+                **self.counts,
+                "error": self.error,
+                "profile": self.profile_path,
+            }
+
+
+class Instrumentation:
+    """
+    Records scrape runs. Scrapers wrap each run in run(), and the code they
+    call marks its stages with stage() and its counts with count(). Outside
+    of a run (or when disabled), stage() and count() do nothing, so
+    instrumented functions can be called on their own at no cost.
+
+    Each finished run is saved as JSON to
+    <directory>/<source>_<year>_<week>_<start time>.json, and, if profiling
+    is on, its cProfile stats are saved next to it (.prof, readable with
+    pstats or snakeviz). cProfile only sees the thread that started the run,
+    so pages loaded by a WebDriverPool's worker threads aren't profiled.
+    """
+
+    def __init__(self, directory="runs", enabled=True, profile=False):
+        """
+        :param directory: the directory to save run records to
+        :param enabled: if False, nothing is recorded or saved
+        :param profile: whether to profile every run
+        """
+        self.directory = directory
+        self.enabled = enabled
+        self.profile = profile
+
+        self.runs = []  # every finished run's record, oldest first
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def run(self, source, year=None, week=None, profile=None):
+        """
+        Context manager recording a scrape run. A run started inside another
+        run is recorded separately
+
+        :param source: the source module's name
+        :param year: the year being scraped
+        :param week: the week being scraped
+        :param profile: whether to profile the run. Defaults to self.profile
+        :return: the Run (its measurements are complete once the
+                 with-statement exits)
+        """
+        if not self.enabled:
+            yield None
+            return
+
+        run = Run(source, year=year, week=week)
+        run_token = _CURRENT_RUN.set(run)
+        stage_token = _CURRENT_STAGE.set(None)
+        profiler = None
+        if self.profile if profile is None else profile:
+            profiler = cProfile.Profile()
+            try:
+                profiler.enable()
+            except ValueError:  # another profiler is already running
+                profiler = None
+
+        try:
+            yield run
+        except BaseException as error:
+            run.error = f"{type(error).__name__}: {error}"
+            raise
+        finally:
+            if profiler is not None:
+                profiler.disable()
+            _CURRENT_STAGE.reset(stage_token)
+            _CURRENT_RUN.reset(run_token)
+            run.wall_seconds = round(time.perf_counter() - run._start, 6)
+            self._save(run, profiler)
+
+    @contextmanager
+    def stage(self, name):
+        """
+        Context manager (or function decorator) timing a stage of the current
+        run. Time spent in stages nested inside it in the same thread is
+        subtracted, so every second is counted once
+
+        :param name: the stage, one of STAGES
+        """
+        run = _CURRENT_RUN.get()
+        if run is None:
+            yield
+            return
+
+        parent = _CURRENT_STAGE.get()
+        frame = {"thread": threading.get_ident(), "nested_seconds": 0.0}
+        token = _CURRENT_STAGE.set(frame)
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            _CURRENT_STAGE.reset(token)
+            run.add_time(name, elapsed - frame["nested_seconds"])
+            if parent is not None and parent["thread"] == frame["thread"]:
+                parent["nested_seconds"] += elapsed
+
+    def count(self, name, amount=1):
+        """
+        Adds to a counter of the current run
+
+        :param name: the counter (e.g. "bytes_fetched" or "rows")
+        :param amount: the amount to add
+        """
+        run = _CURRENT_RUN.get()
+        if run is not None:
+            run.count(name, amount)
+
+    def _save(self, run, profiler):
+        """
+        Saves a finished run's record (and profile)
+
+        :param run: the Run
+        :param profiler: the run's cProfile.Profile, or None
+        """
+        os.makedirs(self.directory, exist_ok=True)
+        name = "_".join(str(part) for part in
+                        [run.source, run.year, run.week,
+                         run.started.strftime("%Y%m%d-%H%M%S-%f")]
+                        if part is not None)
+        base_path = os.path.join(self.directory, name)
+
+        if profiler is not None:
+            profiler.dump_stats(f"{base_path}.prof")
+            run.profile_path = f"{base_path}.prof"
+
+        record = run.get_record()
+        temp_path = f"{base_path}.json.{threading.get_ident()}.tmp"
+        with open(temp_path, "w") as record_file:
+            json.dump(record, record_file, indent=2)
+        os.replace(temp_path, f"{base_path}.json")
+
+        with self._lock:
+            self.runs.append(record)
+
+
+def report(record):
+    """
+    Prints where a run's time went
+
+    :param record: a run record (from Instrumentation.runs or a saved JSON)
+    """
+    print(f"{record['source']} {record['year']} week {record['week']}: "
+          f"{record['wall_seconds']:.1f}s, {record['rows']} rows, "
+          f"{record['bytes_fetched'] / 1024 ** 2:.1f} MB fetched in "
+          f"{record['pages_fetched']} pages ({record['cache_hits']} cached)")
+    for stage, stage_record in record["stages"].items():
+        if stage_record["calls"] > 0:
+            print(f"\t{stage}: {stage_record['seconds']:.2f}s in "
+                  f"{stage_record['calls']} calls")
+
+
+# Instrumentation shared by all scrapers
+INSTRUMENTATION = Instrumentation()
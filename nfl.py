@@ -3,17 +3,32 @@ File: nfl.py
 Description: Downloads Fantasy Football projections from NFL.com
 """
 
-import importlib
-import time
-import random
-from functools import reduce
-import pandas as pd
-import traceback
-import requests
-from bs4 import BeautifulSoup
+import asyncio
+import lxml.etree
 
+import html_tables
+from instrumentation import INSTRUMENTATION
+from columnar_store import STORE
+import schema
 import util_scripts
-importlib.reload(util_scripts)
+from page_cache import CACHE
+from retry import RETRIER
+from snapshots import SNAPSHOTS
+
+
+BASE_URL = ("https://fantasy.nfl.com/research/projections?offset={offset}"
+            "&position={position}&statCategory=projectedStats"
+            "&statSeason=2021&statType=weekProjectedStats&statWeek={week}")
+
+# Number of players listed on each page
+PAGE_SIZE = 25
+
+# Column holding the player cell's "Pos - Team" text until it is split
+POS_TEAM_COLUMN = "_Pos - Team"
+
+_NAME_XPATH = lxml.etree.XPath(
+    f"string(.//a[{html_tables.has_class('playerName')}])")
+_POS_TEAM_XPATH = lxml.etree.XPath("string(.//em)")
 
 
 def scrape(year, week, save_path="projections/projections_{year}_{week}_nfl.csv"):
@@ -25,48 +40,88 @@ def scrape(year, week, save_path="projections/projections_{year}_{week}_nfl.csv"
     :return: A DataFrame of each player's projected stats
     """
 
-    print(f"Reading year {year}, week {week}...")
+    with INSTRUMENTATION.run("nfl", year=year, week=week):
+        print(f"Reading year {year}, week {week}...")
+
+        # Read offense, kicker and defense pages
+        off_df = _get_position_df(week=week, position=0)
+        k_df = _get_position_df(week=week, position=7)
+        def_df = _get_position_df(week=week, position=8)
+
+        return _save(year=year, week=week, dfs=[off_df, k_df, def_df],
+                     save_path=save_path)
+
+
+async def scrape_async(year, week,
+                       save_path="projections/projections_{year}_{week}_nfl.csv",
+                       max_concurrency=4):
+    """
+    scrapes projections from NFL.com. Once each position's page count is
+    known, its pages are fetched concurrently (still subject to the shared
+    per-host politeness schedule) and reassembled in offset order.
+
+    :param year: the current year
+    :param week: the week to be scraped
+    :param max_concurrency: the maximum number of pages being fetched at once
+    :return: A DataFrame of each player's projected stats
+    """
+
+    with INSTRUMENTATION.run("nfl", year=year, week=week):
+        print(f"Reading year {year}, week {week}...")
+
+        semaphore = asyncio.Semaphore(max_concurrency)
+
+        # Read offense, kicker and defense pages
+        off_df, k_df, def_df = await asyncio.gather(
+            *[_get_position_df_async(week=week, position=position,
+                                     semaphore=semaphore)
+              for position in [0, 7, 8]])
+
+        return _save(year=year, week=week, dfs=[off_df, k_df, def_df],
+                     save_path=save_path)
 
-    # Read offense pages
-    off_df = _get_position_df(week=week, position=0)
-    off_df.to_csv(path_or_buf=f"projections_{year}_{week}_nfl.csv",
-                  index=False)
 
-    # Read kicker pages
-    k_df = _get_position_df(week=week, position=7)
-    k_df.to_csv(path_or_buf=f"projections_{year}_{week}_nfl.csv",
-                index=False)
+def _save(year, week, dfs, save_path):
+    """
+    merges the position DataFrames and saves them to a CSV
 
-    # Read defense pages
-    def_df = _get_position_df(week=week, position=8)
-    def_df.to_csv(path_or_buf=f"projections_{year}_{week}_nfl.csv",
-                  index=False)
+    :param year: the current year
+    :param week: the week that was scraped
+    :param dfs: the DataFrames of each position
+    :param save_path: the path to save to
+    :return: the merged DataFrame
+    """
 
     # Save to CSV
     formatted_week = str(week).zfill(2)
     save_path = save_path.format(year=year, week=formatted_week)
 
-    merged_df = reduce(lambda df1, df2: pd.merge(df1, df2, how="full"),
-                       [off_df, k_df, def_df])
-    merged_df = merged_df.replace("-", 0)
-    merged_df.to_csv(path_or_buf=save_path,
-                     index=False, na_rep='-')
+    context = f"nfl {year} week {week}"
+    merged_df = util_scripts.combine_frames(dfs, keys=["Name", "Team", "Pos"],
+                                            context=context)
+    # Stats were already typed when parsed (no projection is 0); combining
+    # positions with different categories loses the dtypes
+    merged_df = schema.apply_schema(merged_df, context=context)
+    with INSTRUMENTATION.stage("write"):
+        SNAPSHOTS.save(merged_df, save_path, source="nfl", year=year,
+                       week=week, index=False, na_rep='-',
+                       float_format=schema.FLOAT_FORMAT)
+        STORE.write(merged_df, source="nfl", year=year, week=week)
+    INSTRUMENTATION.count("rows", len(merged_df))
     print(f"Year {year}, week {week} saved to {save_path}\n")
 
     return merged_df
 
 
-def _get_position_df(week, position):
+def _get_labels(position):
     """
-    gets DataFrame and then standardizes its headers
+    gets the expected labels of a position's table, and the labels to change
+    them to
 
-    :param week: the week to be scraped
     :param position: the position to be scraped. One of [0: Offense, 7: Kicker, 8: Team Defense]
-    :return: A DataFrame with standardized headers
+    :return: A tuple of the expected labels and the new labels
     """
 
-    position = int(position)
-
     # Expected labels and labels to change them to
     if position == 0:  # Offense
         expected_labels = ["Player", "Opp", "Passing_Yds", "Passing_TD",
@@ -95,105 +150,166 @@ def _get_position_df(week, position):
     else:
         raise ValueError(f"Position is {position}, should be one of [0, 7, 8]")
 
-    merged_df = pd.DataFrame()
+    return expected_labels, new_labels
 
-    base_url = ("https://fantasy.nfl.com/research/projections?offset={offset}"
-                "&position={position}&statCategory=projectedStats"
-                "&statSeason=2021&statType=weekProjectedStats&statWeek={week}")
 
-    url = base_url.format(offset=1, position=position, week=week)
+def _get_position_df(week, position):
+    """
+    gets DataFrame and then standardizes its headers
+
+    :param week: the week to be scraped
+    :param position: the position to be scraped. One of [0: Offense, 7: Kicker, 8: Team Defense]
+    :return: A DataFrame with standardized headers
+    """
+
+    position = int(position)
+    _get_labels(position)  # check that the position is valid
 
-    # Try scraping URL
-    while True:
-        try:
-            page = requests.get(url)
-            break  # continue if successful
-        except Exception:  # If unsuccessful, wait and try again
-            print(traceback.format_exc())
-            print("Waiting 30 min to retry...\n")
-            time.sleep(1800)
-    time.sleep(4 + random.uniform(0, 2))
+    url = BASE_URL.format(offset=1, position=position, week=week)
+
+    html = RETRIER.call(url, CACHE.fetch, url, source="nfl")
 
     # find number of players
-    soup = BeautifulSoup(page.text, 'html.parser')
-    num_players = int(soup.find("span",
-                      {"class": "paginationTitle"}).get_text().strip().split(
-                      " of ")[1])
+    num_players, first_page_df = _read_page(html)
     print(f"Position {position}: found {num_players} players")
+    page_dfs = [first_page_df]
 
-    # iterate through each page of 25 players
-    for offset in range(1, num_players+1, 25):
-        url = base_url.format(offset=offset, position=position, week=week)
-        page = requests.get(url)
-        time.sleep(3 + random.uniform(0, 2))
+    # iterate through each remaining page of 25 players
+    for offset in range(1 + PAGE_SIZE, num_players+1, PAGE_SIZE):
+        url = BASE_URL.format(offset=offset, position=position, week=week)
+        html = RETRIER.call(url, CACHE.fetch, url, source="nfl")
         print(f"Scraping position {position}, offset {offset}...")
-        soup = BeautifulSoup(page.text, 'html.parser')
+        page_dfs.append(_read_page(html)[1])
+
+    return _format_position_df(page_dfs=page_dfs, position=position)
+
+
+async def _get_position_df_async(week, position, semaphore):
+    """
+    coroutine version of _get_position_df(). Pages after the first one are
+    fetched concurrently
+
+    :param week: the week to be scraped
+    :param position: the position to be scraped. One of [0: Offense, 7: Kicker, 8: Team Defense]
+    :param semaphore: asyncio.Semaphore limiting the number of pages being
+                      fetched at once
+    :return: A DataFrame with standardized headers
+    """
+
+    position = int(position)
+    _get_labels(position)  # check that the position is valid
+
+    async def fetch_page(offset):
+        url = BASE_URL.format(offset=offset, position=position, week=week)
+        async with semaphore:
+            html = await RETRIER.call_async(url, CACHE.fetch_async, url,
+                                            source="nfl")
+        print(f"Scraping position {position}, offset {offset}...")
+        return html
+
+    html = await fetch_page(offset=1)
+
+    # find number of players
+    num_players, first_page_df = _read_page(html)
+    print(f"Position {position}: found {num_players} players")
+
+    # fetch the remaining pages concurrently; gather() keeps offset order
+    offsets = range(1 + PAGE_SIZE, num_players+1, PAGE_SIZE)
+    pages = await asyncio.gather(*[fetch_page(offset) for offset in offsets])
+    page_dfs = [first_page_df] + [_read_page(html)[1] for html in pages]
 
-        tables = soup.find_all("table")
-        if len(tables) != 1:
-            raise Exception(f"Expected one table, "
-                            f"page has {len(tables)} tables")
+    return _format_position_df(page_dfs=page_dfs, position=position)
 
-        # Convert to DataFrame
-        html_table = tables[0]
-        page_df = util_scripts.read_raw_html_table(html_table)
-        merged_df = pd.concat([merged_df, page_df], axis=0, ignore_index=True)
+
+@INSTRUMENTATION.stage("parse")
+def _read_page(html):
+    """
+    reads one page of projections
+
+    :param html: the page's HTML
+    :return: A tuple of the total number of players listed for the position,
+             and a DataFrame of this page's text. The player cell is split
+             into the player's name (in the first column) and the
+             "Pos - Team" text (in the POS_TEAM_COLUMN column)
+    """
+    import pandas as pd
+
+    root = html_tables.parse_html(html)
+
+    num_players = int(html_tables.get_text(
+                      html_tables.find(root, "span", "paginationTitle")
+                      ).strip().split(" of ")[1])
+
+    tables = html_tables.find_all(root, "table")
+    if len(tables) != 1:
+        raise Exception(f"Expected one table, "
+                        f"page has {len(tables)} tables")
+
+    # Convert to DataFrame
+    html_table = tables[0]
+    raw_df = util_scripts.read_raw_html_table(html_table)
+
+    # Pull the text out column by column
+    player_cells = raw_df.iloc[:, 0].tolist()
+    page_df = pd.DataFrame(
+        {label: [cell.text_content() for cell in raw_df[label]]
+         for label in raw_df.columns[1:]})
+    page_df.insert(loc=0, column=raw_df.columns[0],
+                   value=[_NAME_XPATH(cell) for cell in player_cells])
+    page_df.insert(loc=1, column=POS_TEAM_COLUMN,
+                   value=[_POS_TEAM_XPATH(cell) for cell in player_cells])
+
+    return num_players, page_df
+
+
+@INSTRUMENTATION.stage("normalize")
+def _format_position_df(page_dfs, position):
+    """
+    combines a position's pages, splits out each player's position and team,
+    converts stats to numbers and standardizes the headers
+
+    :param page_dfs: DataFrames of each page's text (from _read_page), in
+                     offset order
+    :param position: the position that was scraped. One of [0: Offense, 7: Kicker, 8: Team Defense]
+    :return: A DataFrame with standardized headers
+    """
+    import pandas as pd
+
+    expected_labels, new_labels = _get_labels(position)
+    merged_df = pd.concat(page_dfs, axis=0, ignore_index=True)
+    pos_team = merged_df.pop(POS_TEAM_COLUMN)
 
     # Check that the labels have not changed
     actual_labels = merged_df.columns.values.tolist()
     if len(expected_labels) != len(actual_labels):
         raise Exception(f"Expected labels for position {position} are "
                         f"{expected_labels}, got labels {actual_labels}")
-    for _, (expected_label, actual_label) in zip(
-            expected_labels, actual_labels):
+    for expected_label, actual_label in zip(expected_labels, actual_labels):
         if expected_label.upper() not in actual_label.upper():
             raise Exception(f"Expected labels for position {position} are "
                             f"{expected_labels}, got labels {actual_labels}")
 
-    # Split player cell to get name, pos, team
-    if position == "0":
-        merged_df.insert(loc=1, column="Name", value="-")
-        merged_df.insert(loc=2, column="Pos", value="-")
-        merged_df.insert(loc=3, column="Team", value="-")
-    elif position == "7":
-        merged_df.insert(loc=1, column="Name", value="-")
-        merged_df.insert(loc=2, column="Pos", value="K")
-        merged_df.insert(loc=3, column="Team", value="-")
-    elif position == "8":
-        merged_df.insert(loc=1, column="Name", value="-")
-        merged_df.insert(loc=2, column="Pos", value="DST")
-
-    for row_indx, row in merged_df.iterrows():
-
-        name = row[0].find("a", {"class": "playerName"}).get_text()
-        merged_df.at[row_indx, "Name"] = name
-
-        if position == "0" or position == "7":
-            pos_team = row[0].find("em").get_text()
-            pos_team_split = pos_team.split(" - ")
-            if len(pos_team_split) == 1:  # If no team specified
-                team = "FA"
-                pos = pos_team_split[0]
-            elif len(pos_team_split) == 2:  # If team is specified
-                pos, team = pos_team_split
-            else:
-                raise Exception(f"Expected 1 or 2 arguments, got "
-                                f"{len(pos_team_split)} in {str(row[0])}")
-
-            merged_df.at[row_indx, "Team"] = team
-            merged_df.at[row_indx, "Pos"] = pos
-
-            for i in range(4, len(row)):
-                merged_df.iat[row_indx, i] = row[i].get_text()
-        elif position == "8":
-            pos = "DST"
-            merged_df.at[row_indx, "Pos"] = pos
-
-            for i in range(3, len(row)):
-                merged_df.iat[row_indx, i] = row[i].get_text()
-
-    merged_df = merged_df.drop(merged_df.columns[0], axis=1)
+    # Stats are every column after the opponent. "-" means no projection
+    stat_labels = actual_labels[2:]
+    merged_df[stat_labels] = merged_df[stat_labels].replace("-", "0").apply(
+                                 pd.to_numeric)
+
+    # Split "Pos - Team" to get pos, team
+    if position in [0, 7]:
+        pos_team_split = pos_team.str.split(" - ", expand=True)
+        if pos_team_split.shape[1] > 2:
+            bad_rows = pos_team[pos_team_split[2].notna()]
+            raise Exception(f"Expected 1 or 2 arguments in \"Pos - Team\", "
+                            f"got {bad_rows.tolist()}")
+        if pos_team_split.shape[1] == 1:  # If no team specified for anyone
+            pos_team_split[1] = None
+
+        merged_df.insert(loc=1, column="Pos", value=pos_team_split[0])
+        merged_df.insert(loc=2, column="Team",
+                         value=pos_team_split[1].fillna("FA"))
+    elif position == 8:
+        merged_df.insert(loc=1, column="Pos", value="DST")
 
     # replce labels
     merged_df = merged_df.set_axis(new_labels, axis=1)
-    return merged_df
+    return schema.apply_schema(merged_df, context=f"nfl position {position}")
@@ -0,0 +1,132 @@
+"""
+File: orchestrator.py
+Description: Refreshes a week's projections from every source at the same
+             time, and writes a summary of the refresh
+"""
+
+import json
+import os
+import threading
+import time
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+from instrumentation import INSTRUMENTATION
+import scrape
+
+
+# Sources refreshed each week. PFR's actual stats are scraped once the games
+# have been played, so they aren't part of the refresh
+WEEKLY_SOURCES = ["sportsline", "football_guys", "nfl", "fantasy_data"]
+
+
+def refresh(year, week, sources=None, browsers=1, use_async=False,
+            resume=False, summary_directory="runs"):
+    """
+    Scrapes each source's week in its own thread, so the refresh takes about
+    as long as the slowest source. Every fetch still goes through the shared
+    request scheduler, so each host keeps its politeness spacing (the
+    sources are on different hosts, so they don't wait on each other). A
+    source that fails is reported in the summary without stopping the others
+
+    :param year: the year to be scraped
+    :param week: the week to be scraped
+    :param sources: the source modules to scrape. Defaults to WEEKLY_SOURCES
+    :param browsers: the number of browser sessions for each browser source
+    :param use_async: whether requests sources fetch their pages
+                      concurrently (see scrape.scrape)
+    :param resume: whether to skip work already recorded in the checkpoint
+                   manifest (see scrape.scrape)
+    :param summary_directory: the directory to save the summary to
+    :return: dict summarizing the refresh: its wall-clock time, the sum of
+             the sources' times, and each source's status, error, rows and
+             run record (see instrumentation)
+    """
+    sources = list(WEEKLY_SOURCES if sources is None else sources)
+    unknown = [source for source in sources if source not in scrape.SOURCES]
+    if unknown:
+        raise ValueError(f"Unknown sources {unknown}, should be among "
+                         f"{list(scrape.SOURCES)}")
+
+    started = datetime.now()
+    start = time.perf_counter()
+    num_runs = len(INSTRUMENTATION.runs)
+
+    def scrape_source(source):
+        source_start = time.perf_counter()
+        result = {"source": source, "status": "ok", "error": None}
+        try:
+            df = scrape.scrape(source, year=year, week=week,
+                               browsers=browsers, use_async=use_async,
+                               resume=resume)
+            result["rows"] = len(df)
+        except Exception as error:
+            print(f"{source} failed:\n{traceback.format_exc()}")
+            result.update(status="failed", rows=0,
+                          error=f"{type(error).__name__}: {error}")
+        result["seconds"] = round(time.perf_counter() - source_start, 3)
+        return result
+
+    with ThreadPoolExecutor(max_workers=len(sources) or 1,
+                            thread_name_prefix="refresh") as executor:
+        results = list(executor.map(scrape_source, sources))
+
+    # Attach each source's run record from this refresh
+    run_records = {record["source"]: record
+                   for record in INSTRUMENTATION.runs[num_runs:]}
+    for result in results:
+        result["run"] = run_records.get(result["source"])
+
+    summary = {
+        "year": year,
+        "week": week,
+        "started": started.isoformat(timespec="microseconds"),
+        "wall_seconds": round(time.perf_counter() - start, 3),
+        "sum_seconds": round(sum(result["seconds"] for result in results),
+                             3),
+        "failed": [result["source"] for result in results
+                   if result["status"] != "ok"],
+        "sources": results,
+    }
+    summary["path"] = _save_summary(summary, summary_directory)
+    return summary
+
+
+def report(summary):
+    """
+    Prints how each source of a refresh went
+
+    :param summary: a refresh summary (from refresh or a saved JSON)
+    """
+    print(f"Year {summary['year']}, week {summary['week']}: "
+          f"{summary['wall_seconds']:.1f}s ({summary['sum_seconds']:.1f}s "
+          f"if run one after another)")
+    for result in summary["sources"]:
+        line = f"\t{result['source']}: {result['status']} in " \
+               f"{result['seconds']:.1f}s, {result['rows']} rows"
+        if result["error"] is not None:
+            line += f" ({result['error']})"
+        print(line)
+
+
+def _save_summary(summary, directory):
+    """
+    Saves a refresh summary to <directory>/refresh_<year>_<week>_<start
+    time>.json. The start time has microseconds, so refreshes started in the
+    same second don't overwrite each other's summaries
+
+    :param summary: the refresh summary
+    :param directory: the directory to save it to
+    :return: the path it was saved to
+    """
+    os.makedirs(directory, exist_ok=True)
+    started = datetime.fromisoformat(summary["started"])
+    path = os.path.join(directory,
+                        f"refresh_{summary['year']}_{summary['week']}_"
+                        f"{started.strftime('%Y%m%d-%H%M%S-%f')}.json")
+    temp_path = f"{path}.{threading.get_ident()}.tmp"
+    with open(temp_path, "w") as summary_file:
+        json.dump(summary, summary_file, indent=2)
+    os.replace(temp_path, path)
+    return path
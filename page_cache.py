@@ -0,0 +1,390 @@
+"""
+File: page_cache.py
+Description: Content-addressed on-disk cache of raw HTML pages, with per-source
+             TTLs, size-bounded LRU eviction, conditional revalidation and an
+             offline (cache-only) mode
+"""
+
+import gzip
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+
+from http_client import CLIENT
+from instrumentation import INSTRUMENTATION
+from request_scheduler import SCHEDULER
+from retry import RETRYABLE_STATUSES
+
+
+# Seconds before a cached page of each source is considered stale. None means
+# the page never expires. Projections change as news breaks (and SportsLine's
+# URL is the same every week), so their pages are revalidated with the
+# server, or reloaded if they were rendered by a browser, on every fetch.
+# PFR's week pages fill in as games are played, so they are too
+DEFAULT_TTLS = {
+    "nfl": 0,
+    "football_guys": 0,
+    "sportsline": 0,
+    "fantasy_data": 0,
+    "pro_football_reference": 0,
+}
+
+# Pages that never change once they exist, and so never expire whatever
+# their source's TTL: box scores of games that have been played
+PERMANENT_URLS = re.compile(
+    r"^https?://(www\.)?pro-football-reference\.com/boxscores/\w+\.htm$")
+
+
+class CacheMissError(Exception):
+    """
+    Raised in offline mode when a page isn't in the cache
+    """
+
+
+class PageCache:
+    """
+    Stores raw pages keyed by URL and request parameters. Page bodies are
+    stored gzipped under the hash of their contents, so identical pages are
+    only stored once, and an SQLite index tracks each key's body, validators
+    (ETag / Last-Modified) and last access time.
+    """
+
+    def __init__(self, directory="page_cache", max_bytes=2 * 1024 ** 3,
+                 ttls=None, offline=False, enabled=True):
+        """
+        :param directory: the directory to store the cache in
+        :param max_bytes: the maximum total size of the stored (compressed)
+                          bodies. Least recently used pages are evicted first
+        :param ttls: dict mapping source -> TTL in seconds (None never
+                     expires). Defaults to DEFAULT_TTLS. Pages matching
+                     PERMANENT_URLS never expire
+        :param offline: if True, pages are only ever served from the cache,
+                        however old they are
+        :param enabled: if False, every fetch goes to the network and nothing
+                        is stored
+        """
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.ttls = dict(DEFAULT_TTLS if ttls is None else ttls)
+        self.offline = offline
+        self.enabled = enabled
+
+        self._lock = threading.Lock()
+        self._connection = None
+
+    def _get_connection(self):
+        """
+        Opens the index on first use. Must hold self._lock
+
+        :return: the sqlite3 connection to the index
+        """
+        if self._connection is None:
+            os.makedirs(os.path.join(self.directory, "bodies"), exist_ok=True)
+            self._connection = sqlite3.connect(
+                os.path.join(self.directory, "index.sqlite"),
+                check_same_thread=False)
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS pages ("
+                "key TEXT PRIMARY KEY, url TEXT, source TEXT, "
+                "content_hash TEXT, size INTEGER, fetched_at REAL, "
+                "last_access REAL, etag TEXT, last_modified TEXT)")
+            self._connection.execute(
+                "CREATE INDEX IF NOT EXISTS pages_last_access "
+                "ON pages (last_access)")
+        return self._connection
+
+    def fetch(self, url, source, params=None):
+        """
+        Gets a page with the shared HTTP client, serving it from the cache when it is fresh
+        and revalidating it with the server when it is stale
+
+        :param url: the URL to get
+        :param source: the source module's name (used to pick the TTL)
+        :param params: query parameters sent with the request
+        :return: the page's HTML
+        """
+        key = get_key(url, params)
+        entry = self._lookup(key, url, source)
+        if entry is not None and (entry["fresh"] or self.offline):
+            INSTRUMENTATION.count("cache_hits")
+            return entry["text"]
+        self._check_online(url)
+
+        response = SCHEDULER.fetch(url, CLIENT.get, url, params=params,
+                                   headers=_get_validators(entry))
+        return self._store_response(key, url, source, entry, response)
+
+    async def fetch_async(self, url, source, params=None):
+        """
+        Coroutine version of fetch()
+
+        :param url: the URL to get
+        :param source: the source module's name (used to pick the TTL)
+        :param params: query parameters sent with the request
+        :return: the page's HTML
+        """
+        key = get_key(url, params)
+        entry = self._lookup(key, url, source)
+        if entry is not None and (entry["fresh"] or self.offline):
+            INSTRUMENTATION.count("cache_hits")
+            return entry["text"]
+        self._check_online(url)
+
+        response = await SCHEDULER.fetch_async(
+            url, CLIENT.get, url, params=params,
+            headers=_get_validators(entry))
+        return self._store_response(key, url, source, entry, response)
+
+    def capture(self, url, source, load_function):
+        """
+        Gets a page rendered by some other means (e.g. webdriver.page_source),
+        serving it from the cache when it is fresh. Rendered pages can't be
+        revalidated, so stale pages are always reloaded
+
+        :param url: the URL being loaded (used as the cache key)
+        :param source: the source module's name (used to pick the TTL)
+        :param load_function: function taking no arguments that loads the page
+                              and returns its HTML
+        :return: the page's HTML
+        """
+        key = get_key(url)
+        entry = self._lookup(key, url, source)
+        if entry is not None and (entry["fresh"] or self.offline):
+            INSTRUMENTATION.count("cache_hits")
+            return entry["text"]
+        self._check_online(url)
+
+        text = load_function()
+        INSTRUMENTATION.count("pages_fetched")
+        INSTRUMENTATION.count("bytes_fetched", len(text.encode("utf-8")))
+        self._store(key=key, url=url, source=source, text=text)
+        return text
+
+    def _check_online(self, url):
+        """
+        Raises CacheMissError if the cache is offline
+
+        :param url: the URL that would be fetched
+        """
+        if self.offline:
+            raise CacheMissError(f"{url} is not cached, and the cache is "
+                                 "offline")
+
+    def _store_response(self, key, url, source, entry, response):
+        """
+        Stores a requests response (or refreshes the entry on a 304)
+
+        :param key: the cache key
+        :param url: the URL that was fetched
+        :param source: the source module's name
+        :param entry: the stale cache entry, if any
+        :param response: the requests.Response
+        :return: the page's HTML
+        """
+        INSTRUMENTATION.count("pages_fetched")
+        INSTRUMENTATION.count("bytes_fetched", len(response.content))
+        # Raise on rate limiting and server errors so that they are retried
+        if response.status_code in RETRYABLE_STATUSES:
+            response.raise_for_status()
+        if response.status_code == 304 and entry is not None:
+            self._touch(key, fetched=True)
+            return entry["text"]
+
+        # Don't cache error pages
+        if response.status_code == 200:
+            self._store(key=key, url=url, source=source, text=response.text,
+                        etag=response.headers.get("ETag"),
+                        last_modified=response.headers.get("Last-Modified"))
+        return response.text
+
+    def _lookup(self, key, url, source):
+        """
+        :param key: the cache key
+        :param url: the URL of the page
+        :param source: the source module's name (used to pick the TTL)
+        :return: dict of the entry's text, validators and whether it is fresh,
+                 or None if the key isn't cached
+        """
+        if not self.enabled:
+            return None
+
+        with self._lock:
+            row = self._get_connection().execute(
+                "SELECT content_hash, fetched_at, etag, last_modified "
+                "FROM pages WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return None
+
+        content_hash, fetched_at, etag, last_modified = row
+        try:
+            with gzip.open(self._body_path(content_hash), "rt",
+                           encoding="utf-8") as body_file:
+                text = body_file.read()
+        except FileNotFoundError:
+            return None
+
+        ttl = self.ttls.get(source)
+        fresh = ttl is None or time.time() - fetched_at < ttl or \
+            PERMANENT_URLS.match(url) is not None
+        self._touch(key)
+
+        return {"text": text, "fresh": fresh, "etag": etag,
+                "last_modified": last_modified}
+
+    def _touch(self, key, fetched=False):
+        """
+        Marks an entry as recently used (and, after a successful
+        revalidation, as recently fetched)
+
+        :param key: the cache key
+        :param fetched: whether to also reset the entry's TTL
+        """
+        now = time.time()
+        with self._lock:
+            connection = self._get_connection()
+            if fetched:
+                connection.execute("UPDATE pages SET last_access = ?, "
+                                   "fetched_at = ? WHERE key = ?",
+                                   (now, now, key))
+            else:
+                connection.execute("UPDATE pages SET last_access = ? "
+                                   "WHERE key = ?", (now, key))
+            connection.commit()
+
+    def _store(self, key, url, source, text, etag=None, last_modified=None):
+        """
+        Stores a page's body and index entry, then evicts old pages if the
+        cache is too large
+
+        :param key: the cache key
+        :param url: the URL of the page
+        :param source: the source module's name
+        :param text: the page's HTML
+        :param etag: the response's ETag header, if any
+        :param last_modified: the response's Last-Modified header, if any
+        """
+        if not self.enabled:
+            return
+
+        data = text.encode("utf-8")
+        content_hash = hashlib.sha256(data).hexdigest()
+
+        with self._lock:
+            connection = self._get_connection()
+            body_path = self._body_path(content_hash)
+            if not os.path.exists(body_path):
+                temp_path = f"{body_path}.{threading.get_ident()}.tmp"
+                with gzip.open(temp_path, "wb") as body_file:
+                    body_file.write(data)
+                os.replace(temp_path, body_path)
+
+            now = time.time()
+            connection.execute(
+                "INSERT OR REPLACE INTO pages VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (key, url, source, content_hash, os.path.getsize(body_path),
+                 now, now, etag, last_modified))
+            connection.commit()
+
+            self._evict(connection)
+
+    def _evict(self, connection):
+        """
+        Evicts least recently used pages until the cache fits in max_bytes.
+        Must hold self._lock
+
+        :param connection: the sqlite3 connection to the index
+        """
+        # Bodies may be shared between keys, so count each body once
+        total = connection.execute(
+            "SELECT COALESCE(SUM(size), 0) FROM "
+            "(SELECT DISTINCT content_hash, size FROM pages)").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+
+        rows = connection.execute("SELECT key, content_hash, size FROM pages "
+                                  "ORDER BY last_access").fetchall()
+        for key, content_hash, size in rows:
+            if total <= self.max_bytes:
+                break
+            connection.execute("DELETE FROM pages WHERE key = ?", (key,))
+            still_used = connection.execute(
+                "SELECT 1 FROM pages WHERE content_hash = ? LIMIT 1",
+                (content_hash,)).fetchone()
+            if still_used is None:
+                try:
+                    os.remove(self._body_path(content_hash))
+                except FileNotFoundError:
+                    pass
+                total -= size
+        connection.commit()
+
+    def _body_path(self, content_hash):
+        """
+        :param content_hash: the SHA-256 hash of a page's contents
+        :return: the path the gzipped body is stored at
+        """
+        return os.path.join(self.directory, "bodies", f"{content_hash}.html.gz")
+
+    def get_pages(self, source=None):
+        """
+        Lists the cached pages (e.g. to replay them offline)
+
+        :param source: if given, only this source's pages are listed
+        :return: list of (url, source) tuples, oldest fetch first
+        """
+        query = "SELECT url, source FROM pages"
+        params = ()
+        if source is not None:
+            query += " WHERE source = ?"
+            params = (source,)
+        with self._lock:
+            return self._get_connection().execute(
+                query + " ORDER BY fetched_at", params).fetchall()
+
+    def clear(self):
+        """
+        Deletes every cached page
+        """
+        with self._lock:
+            connection = self._get_connection()
+            hashes = connection.execute(
+                "SELECT DISTINCT content_hash FROM pages").fetchall()
+            for (content_hash,) in hashes:
+                try:
+                    os.remove(self._body_path(content_hash))
+                except FileNotFoundError:
+                    pass
+            connection.execute("DELETE FROM pages")
+            connection.commit()
+
+
+def get_key(url, params=None):
+    """
+    :param url: the URL of a page
+    :param params: the query parameters sent with the request, if any
+    :return: the page's cache key
+    """
+    key_data = json.dumps([url, sorted((params or {}).items())])
+    return hashlib.sha256(key_data.encode("utf-8")).hexdigest()
+
+
+def _get_validators(entry):
+    """
+    :param entry: a stale cache entry, or None
+    :return: headers for a conditional request revalidating entry
+    """
+    headers = {}
+    if entry is not None:
+        if entry["etag"]:
+            headers["If-None-Match"] = entry["etag"]
+        if entry["last_modified"]:
+            headers["If-Modified-Since"] = entry["last_modified"]
+    return headers
+
+
+# Cache shared by all scrapers
+CACHE = PageCache()
@@ -0,0 +1,445 @@
+"""
+File: player_ids.py
+Description: Resolves each source's player names to one player ID, using
+             pro-football-reference.com's IDs where the player is known
+"""
+
+import difflib
+import hashlib
+import re
+import sqlite3
+import threading
+import unicodedata
+
+import pandas as pd
+
+
+# Spellings of each team's abbreviation across sources -> the abbreviation
+# used here. Relocated teams keep one code
+TEAM_CODES = {
+    "ARI": "ARI", "ARZ": "ARI", "CRD": "ARI",
+    "ATL": "ATL",
+    "BAL": "BAL", "RAV": "BAL",
+    "BUF": "BUF",
+    "CAR": "CAR",
+    "CHI": "CHI",
+    "CIN": "CIN",
+    "CLE": "CLE", "CLV": "CLE",
+    "DAL": "DAL",
+    "DEN": "DEN",
+    "DET": "DET",
+    "GB": "GB", "GNB": "GB",
+    "HOU": "HOU", "HST": "HOU", "HTX": "HOU",
+    "IND": "IND", "CLT": "IND",
+    "JAX": "JAX", "JAC": "JAX",
+    "KC": "KC", "KAN": "KC",
+    "LV": "LV", "LVR": "LV", "OAK": "LV", "RAI": "LV",
+    "LAC": "LAC", "SD": "LAC", "SDG": "LAC",
+    "LAR": "LAR", "LA": "LAR", "STL": "LAR", "RAM": "LAR",
+    "MIA": "MIA",
+    "MIN": "MIN",
+    "NE": "NE", "NWE": "NE",
+    "NO": "NO", "NOR": "NO",
+    "NYG": "NYG",
+    "NYJ": "NYJ",
+    "PHI": "PHI",
+    "PIT": "PIT",
+    "SF": "SF", "SFO": "SF",
+    "SEA": "SEA",
+    "TB": "TB", "TAM": "TB",
+    "TEN": "TEN", "OTI": "TEN",
+    "WAS": "WAS", "WSH": "WAS",
+}
+
+# Team nicknames (as in DST names like "Green Bay Packers") -> team code
+TEAM_NICKNAMES = {
+    "cardinals": "ARI", "falcons": "ATL", "ravens": "BAL", "bills": "BUF",
+    "panthers": "CAR", "bears": "CHI", "bengals": "CIN", "browns": "CLE",
+    "cowboys": "DAL", "broncos": "DEN", "lions": "DET", "packers": "GB",
+    "texans": "HOU", "colts": "IND", "jaguars": "JAX", "chiefs": "KC",
+    "raiders": "LV", "chargers": "LAC", "rams": "LAR", "dolphins": "MIA",
+    "vikings": "MIN", "patriots": "NE", "saints": "NO", "giants": "NYG",
+    "jets": "NYJ", "eagles": "PHI", "steelers": "PIT", "49ers": "SF",
+    "seahawks": "SEA", "buccaneers": "TB", "titans": "TEN",
+    "football team": "WAS", "commanders": "WAS", "redskins": "WAS",
+}
+
+# Positions across sources -> the position group players are matched within
+POSITION_GROUPS = {
+    "QB": "QB",
+    "RB": "RB", "FB": "RB",
+    "WR": "WR",
+    "TE": "TE",
+    "K": "K", "PK": "K",
+    "P": "P",
+    "DST": "DST", "DEF": "DST", "D/ST": "DST",
+    "DL": "DL", "DE": "DL", "DT": "DL", "NT": "DL",
+    "LB": "LB", "OLB": "LB", "ILB": "LB", "MLB": "LB",
+    "DB": "DB", "CB": "DB", "S": "DB", "SS": "DB", "FS": "DB",
+}
+
+_SUFFIXES = {"jr", "sr", "ii", "iii", "iv", "v"}
+
+# Minimum similarity of two first names (e.g. "mitch" and "mitchell") for
+# players in the same block to be the same player
+_FIRST_NAME_SIMILARITY = 0.75
+
+
+def normalize_name(name):
+    """
+    Normalizes a player's name so that sources' spellings compare equal:
+    accents, punctuation, suffixes (Jr., III, ...) and case are dropped
+
+    :param name: the name as a source lists it
+    :return: the normalized name, e.g. "D.J. Moore Jr." -> "dj moore"
+    """
+    if not isinstance(name, str):
+        return ""
+    name = unicodedata.normalize("NFKD", name)
+    name = "".join(char for char in name if not unicodedata.combining(char))
+    name = re.sub(r"[.'’`]", "", name.lower())
+    words = re.sub(r"[^a-z0-9]+", " ", name).split()
+    while len(words) > 1 and words[-1] in _SUFFIXES:
+        words.pop()
+    return " ".join(words)
+
+
+def normalize_team(team):
+    """
+    :param team: a team abbreviation as a source lists it
+    :return: the team's code (see TEAM_CODES), or "" if it isn't a team
+             (e.g. "FA")
+    """
+    if not isinstance(team, str):
+        return ""
+    return TEAM_CODES.get(team.strip().upper(), "")
+
+
+def normalize_position(position):
+    """
+    :param position: a position as a source lists it (e.g. "OLB", "PK")
+    :return: the position group (see POSITION_GROUPS), or "" if unknown
+    """
+    if not isinstance(position, str):
+        return ""
+    position = position.strip().upper()
+    if position not in POSITION_GROUPS:
+        # Players listed at several positions (e.g. "RB/WR") use the first
+        position = re.split(r"[/,-]", position)[0]
+    return POSITION_GROUPS.get(position, "")
+
+
+def get_team_from_name(name):
+    """
+    :param name: a team defense's name (e.g. "Green Bay Packers", "Packers")
+    :return: the team's code, or "" if no team's nickname is in name
+    """
+    normalized = normalize_name(name)
+    for nickname, team in TEAM_NICKNAMES.items():
+        if nickname in normalized:
+            return team
+    return normalize_team(name)
+
+
+class PlayerResolver:
+    """
+    Keeps a persistent crosswalk from each source's (name, team, position)
+    to a player ID. Players are registered from pro-football-reference.com
+    stats, whose IDs are canonical. Other sources' players are matched
+    against the registered players in the same block (normalized surname,
+    position group and team), then, for players who changed teams, the same
+    surname and position group. Players that can't be matched get a
+    provisional ID, which is taken over by the PFR ID once that player is
+    registered.
+    """
+
+    def __init__(self, path="player_ids.sqlite"):
+        """
+        :param path: the path of the SQLite database holding the players and
+                     the crosswalk
+        """
+        self.path = path
+
+        self._lock = threading.Lock()
+        self._connection = None
+        # player_id -> (normalized name, position group, team)
+        self._players = {}
+        # (surname, position group, team) -> player IDs, and
+        # (surname, position group) -> player IDs
+        self._blocks = {}
+        self._surname_blocks = {}
+        # (source, normalized name, position group, team) -> player ID
+        self._crosswalk = {}
+
+    def _get_connection(self):
+        """
+        Opens the database and loads it into memory on first use. Must hold
+        self._lock
+
+        :return: the sqlite3 connection
+        """
+        if self._connection is None:
+            connection = sqlite3.connect(self.path, check_same_thread=False)
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS players ("
+                "player_id TEXT PRIMARY KEY, name TEXT, position TEXT, "
+                "team TEXT)")
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS crosswalk ("
+                "source TEXT, name TEXT, position TEXT, team TEXT, "
+                "player_id TEXT, "
+                "PRIMARY KEY (source, name, position, team))")
+            connection.commit()
+
+            for player_id, name, position, team in connection.execute(
+                    "SELECT player_id, name, position, team FROM players"):
+                self._index_player(player_id, name, position, team)
+            for source, name, position, team, player_id in connection.execute(
+                    "SELECT source, name, position, team, player_id "
+                    "FROM crosswalk"):
+                self._crosswalk[(source, name, position, team)] = player_id
+
+            self._connection = connection
+        return self._connection
+
+    def _index_player(self, player_id, name, position, team):
+        """
+        Adds a registered player to the in-memory blocking index
+
+        :param player_id: the player's PFR ID
+        :param name: the normalized name
+        :param position: the position group
+        :param team: the team code
+        """
+        old = self._players.get(player_id)
+        if old is not None:
+            old_surname = _get_surname(old[0])
+            self._blocks.get((old_surname, old[1], old[2]), set()).discard(
+                player_id)
+            self._surname_blocks.get((old_surname, old[1]), set()).discard(
+                player_id)
+
+        self._players[player_id] = (name, position, team)
+        surname = _get_surname(name)
+        self._blocks.setdefault((surname, position, team), set()).add(
+            player_id)
+        self._surname_blocks.setdefault((surname, position), set()).add(
+            player_id)
+
+    def register_players(self, df, id_column="ID", name_column="Name",
+                         team_column="Team", position_column="Pos"):
+        """
+        Registers the players of pro-football-reference.com stats under their
+        PFR IDs (updating their team and position), and hands provisional
+        IDs of matching players over to them
+
+        :param df: a DataFrame from pro_football_reference.scrape
+        :param id_column: the column of PFR IDs
+        :param name_column: the column of names
+        :param team_column: the column of team abbreviations
+        :param position_column: the column of positions
+        :return: the number of players registered
+        """
+        players = df[df[id_column].notna() & (df[id_column] != "-")]
+        players = players.drop_duplicates(subset=id_column, keep="last")
+
+        rows = []
+        for player_id, name, team, position in zip(
+                players[id_column], players[name_column],
+                players[team_column], players[position_column]):
+            rows.append((player_id, normalize_name(name),
+                         normalize_position(position), normalize_team(team)))
+
+        with self._lock:
+            connection = self._get_connection()
+            for row in rows:
+                self._index_player(*row)
+
+            # Provisional IDs of the same players now resolve to PFR IDs
+            replaced = {}
+            for key, player_id in self._crosswalk.items():
+                if player_id.startswith("~"):
+                    match = self._match(key[1], key[2], key[3])
+                    if match is not None:
+                        replaced[key] = match
+            self._crosswalk.update(replaced)
+
+            with connection:
+                connection.executemany(
+                    "INSERT OR REPLACE INTO players VALUES (?, ?, ?, ?)", rows)
+                connection.executemany(
+                    "INSERT OR REPLACE INTO crosswalk VALUES (?, ?, ?, ?, ?)",
+                    [key + (player_id,)
+                     for key, player_id in replaced.items()])
+        return len(rows)
+
+    def resolve(self, df, source, name_column="Name", team_column="Team",
+                position_column="Pos"):
+        """
+        Finds the player ID of each row of a source's DataFrame. Rows seen
+        before are looked up in the crosswalk; new ones are matched within
+        their block and added to it
+
+        :param df: a source's DataFrame
+        :param source: the source module's name
+        :param name_column: the column of names
+        :param team_column: the column of team abbreviations (optional for
+                            team defenses, whose team is read from the name)
+        :param position_column: the column of positions
+        :return: Series of player IDs, aligned with df's index. Team
+                 defenses get "DST-<team>"
+        """
+        names = df[name_column].tolist()
+        positions = [normalize_position(position)
+                     for position in df[position_column]]
+        if team_column in df.columns:
+            teams = [normalize_team(team) for team in df[team_column]]
+        else:
+            teams = [""] * len(df)
+
+        ids = []
+        new_entries = {}
+        with self._lock:
+            connection = self._get_connection()
+            for name, position, team in zip(names, positions, teams):
+                if position == "DST":
+                    team = team or get_team_from_name(name)
+                    ids.append(f"DST-{team}" if team else None)
+                    continue
+
+                normalized = normalize_name(name)
+                key = (source, normalized, position, team)
+                player_id = self._crosswalk.get(key)
+                if player_id is None:
+                    player_id = self._match(normalized, position, team)
+                    if player_id is None:
+                        player_id = _get_provisional_id(normalized, position)
+                    self._crosswalk[key] = player_id
+                    new_entries[key] = player_id
+                ids.append(player_id)
+
+            if new_entries:
+                with connection:
+                    connection.executemany(
+                        "INSERT OR REPLACE INTO crosswalk "
+                        "VALUES (?, ?, ?, ?, ?)",
+                        [key + (player_id,)
+                         for key, player_id in new_entries.items()])
+
+        return pd.Series(ids, index=df.index, name="Player ID")
+
+    def add_ids(self, df, source, **columns):
+        """
+        :param df: a source's DataFrame
+        :param source: the source module's name
+        :param columns: column names passed on to resolve()
+        :return: a copy of df with a "Player ID" column after the name
+        """
+        df = df.copy()
+        ids = self.resolve(df, source, **columns)
+        name_column = columns.get("name_column", "Name")
+        df.insert(loc=df.columns.get_loc(name_column) + 1,
+                  column="Player ID", value=ids)
+        return df
+
+    def set_id(self, source, name, team, position, player_id):
+        """
+        Overrides the crosswalk entry of one of a source's players (for
+        players the matching gets wrong)
+
+        :param source: the source module's name
+        :param name: the name as the source lists it
+        :param team: the team as the source lists it
+        :param position: the position as the source lists it
+        :param player_id: the player's ID
+        """
+        key = (source, normalize_name(name), normalize_position(position),
+               normalize_team(team))
+        with self._lock:
+            connection = self._get_connection()
+            self._crosswalk[key] = player_id
+            with connection:
+                connection.execute(
+                    "INSERT OR REPLACE INTO crosswalk VALUES (?, ?, ?, ?, ?)",
+                    key + (player_id,))
+
+    def _match(self, name, position, team):
+        """
+        Matches a player against the registered players in its block. Must
+        hold self._lock
+
+        :param name: the normalized name
+        :param position: the position group
+        :param team: the team code
+        :return: the matching player's ID, or None if there is no unique match
+        """
+        surname = _get_surname(name)
+        for candidates in [self._blocks.get((surname, position, team)),
+                           self._surname_blocks.get((surname, position))]:
+            if not candidates:
+                continue
+            player_id = self._pick(name, candidates)
+            if player_id is not None:
+                return player_id
+        return None
+
+    def _pick(self, name, candidates):
+        """
+        :param name: the normalized name
+        :param candidates: IDs of registered players with the same surname
+        :return: the ID of the candidate with the same name or, failing
+                 that, the only candidate with a compatible first name.
+                 None if there is no such candidate
+        """
+        exact = [player_id for player_id in candidates
+                 if self._players[player_id][0] == name]
+        if len(exact) == 1:
+            return exact[0]
+        if len(exact) > 1:
+            return None
+
+        first_name = name.split(" ")[0] if name else ""
+        compatible = [player_id for player_id in candidates
+                      if _first_names_match(
+                          first_name, self._players[player_id][0].split(" ")[0])]
+        if len(compatible) == 1:
+            return compatible[0]
+        return None
+
+
+def _get_surname(name):
+    """
+    :param name: a normalized name
+    :return: the name's last word
+    """
+    return name.rsplit(" ", 1)[-1] if name else ""
+
+
+def _first_names_match(first_name1, first_name2):
+    """
+    :param first_name1: a normalized first name
+    :param first_name2: another normalized first name
+    :return: whether they could be the same person's (e.g. "j" and "josh",
+             "mitch" and "mitchell")
+    """
+    if not first_name1 or not first_name2:
+        return False
+    if first_name1[0] != first_name2[0]:
+        return False
+    if len(first_name1) == 1 or len(first_name2) == 1:
+        return True
+    if first_name1.startswith(first_name2) or \
+            first_name2.startswith(first_name1):
+        return True
+    return difflib.SequenceMatcher(None, first_name1, first_name2).ratio() \
+        >= _FIRST_NAME_SIMILARITY
+
+
+def _get_provisional_id(name, position):
+    """
+    :param name: a normalized name
+    :param position: the position group
+    :return: an ID for a player not (yet) known to pro-football-reference.com
+    """
+    digest = hashlib.sha1(f"{name}|{position}".encode("utf-8")).hexdigest()
+    return f"~{digest[:10]}"
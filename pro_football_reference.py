@@ -3,111 +3,274 @@ File: pro_football_reference.py
 Description: Downloads historical data from pro-football-reference.com
 """
 
-import requests
+import asyncio
 import pandas as pd
-import importlib
-import bs4
-from bs4 import BeautifulSoup
-import time
-import random
-from functools import reduce
-import traceback
-import sys
-import re
-
+import lxml.etree
+import lxml.html
+from concurrent.futures import ProcessPoolExecutor
+
+import html_tables
+from instrumentation import INSTRUMENTATION
+from columnar_store import STORE
+import schema
 import util_scripts
-importlib.reload(util_scripts)
+from page_cache import CACHE
+from request_scheduler import SCHEDULER
+from snapshots import SNAPSHOTS
+from webdriver_pool import as_pool
+
+
+# Team defense stats as (team stats header, index within the hyphenated
+# header or None, new name). Each team's stats are its opponent's offense
+TEAM_DEFENSE_STATS = [
+    ("First Downs", None, "Def 1D"),
+    ("Rush-Yds-TDs", 0, "Def Rush Att"),
+    ("Rush-Yds-TDs", 1, "Def Rush Yd"),
+    ("Rush-Yds-TDs", 2, "Def Rush TD"),
+    ("Cmp-Att-Yd-TD-INT", 0, "Def Pass Comp"),
+    ("Cmp-Att-Yd-TD-INT", 1, "Def Pass Att"),
+    ("Cmp-Att-Yd-TD-INT", 2, "Def Pass Yd Gross"),
+    ("Cmp-Att-Yd-TD-INT", 3, "Def Pass TD"),
+    ("Cmp-Att-Yd-TD-INT", 4, "Def Int"),
+    ("Sacked-Yards", 0, "Def Sack"),
+    ("Sacked-Yards", 1, "Def Sack Yd"),
+    ("Net Pass Yards", None, "Def Pass Yd Net"),
+    ("Total Yards", None, "Def Yd"),
+    ("Fumbles-Lost", 0, "Def Fum"),
+    ("Fumbles-Lost", 1, "Def Fum Rec"),
+    ("Turnovers", None, "Def TO"),
+]
+
+# Tables read from each game page
+GAME_TABLE_IDS = ["player_offense", "player_defense", "kicking", "returns",
+                  "team_stats", "home_snap_counts", "vis_snap_counts"]
+
+_count_links = lxml.etree.XPath("count(.//a)")
 
 
 def scrape(year, week, webdriver,
-           save_path="historical_{year}_{week}_pro-football-reference.csv"):
+           save_path="historical_{year}_{week}_pro-football-reference.csv",
+           parse_workers=None):
     """
     scrapes projections from pro-football-reference.com.com.
 
     :param year: the year to be scraped
     :param week: the week to be scraped
+    :param webdriver: the webdriver used to load each game, or a
+                      WebDriverPool to load several games at once
+    :param parse_workers: if set, games are parsed by a pool of this many
+                          processes while the next games are fetched.
+                          Otherwise each game is parsed before the next one
+                          is fetched. The output is the same either way
+    :return: A DataFrame of each player's stats
+    """
+
+    with INSTRUMENTATION.run("pro_football_reference", year=year, week=week):
+        # Find all games for that week
+        landing_page_url = _get_landing_page_url(year=year, week=week)
+
+        print(f"Reading year {year}, week {week}...")
+        html = CACHE.fetch(landing_page_url, source="pro_football_reference")
+        game_urls = _get_game_urls(html)
+
+        return _scrape_games(year=year, week=week, game_urls=game_urls,
+                             webdriver=webdriver, save_path=save_path,
+                             parse_workers=parse_workers)
+
+
+async def scrape_async(year, week, webdriver,
+                       save_path="historical_{year}_{week}_pro-football-reference.csv",
+                       parse_workers=None):
+    """
+    coroutine version of scrape(). The landing page is fetched without
+    blocking the event loop, and the (blocking) webdriver game loop runs in a
+    worker thread
+
+    :param year: the year to be scraped
+    :param week: the week to be scraped
+    :param parse_workers: the number of processes parsing games (see scrape)
     :return: A DataFrame of each player's stats
     """
 
-    # Find all games for that week
-    landing_page_url = ("https://www.pro-football-reference.com/years/"
-                        f"{year}/week_{week}.htm")
+    with INSTRUMENTATION.run("pro_football_reference", year=year, week=week):
+        # Find all games for that week
+        landing_page_url = _get_landing_page_url(year=year, week=week)
+
+        print(f"Reading year {year}, week {week}...")
+        html = await CACHE.fetch_async(landing_page_url,
+                                       source="pro_football_reference")
+        game_urls = _get_game_urls(html)
+
+        return await asyncio.to_thread(_scrape_games, year=year, week=week,
+                                       game_urls=game_urls,
+                                       webdriver=webdriver,
+                                       save_path=save_path,
+                                       parse_workers=parse_workers)
+
+
+def _get_landing_page_url(year, week):
+    """
+    :param year: the year to be scraped
+    :param week: the week to be scraped
+    :return: the URL of the page listing the week's games
+    """
+    return ("https://www.pro-football-reference.com/years/"
+            f"{year}/week_{week}.htm")
+
 
-    print(f"Reading year {year}, week {week}...")
-    page = requests.get(landing_page_url)
-    time.sleep(6 + random.uniform(0, 4))
-    soup = BeautifulSoup(page.text, 'html.parser')
+@INSTRUMENTATION.stage("parse")
+def _get_game_urls(html):
+    """
+    Finds the URL of each game listed on a week's landing page
 
-    games_html = soup.find("div", {"class": "game_summaries"})
-    games_html = games_html.find_all("div", {"class": "game_summary"})
+    :param html: the landing page's HTML
+    :return: list of game URLs
+    """
+    root = html_tables.parse_html(html)
+
+    games_html = html_tables.find(root, "div", "game_summaries")
+    games_html = html_tables.find_all(games_html, "div", "game_summary")
     base_url = "https://www.pro-football-reference.com"
 
     game_urls = []
 
     for game_html in games_html:
-        game_element = game_html.find("td", {"class": "gamelink"})
-        path = game_element.find("a")["href"]
+        game_element = html_tables.find(game_html, "td", "gamelink")
+        path = html_tables.find(game_element, "a").get("href")
         game_urls.append(base_url + path)
 
-    """"""
-    stat_dfs = []
+    return game_urls
 
-    webdriver.set_page_load_timeout(10)
 
-    num_games = len(games_html)
-    game_index = 1
+def _scrape_games(year, week, game_urls, webdriver, save_path,
+                  parse_workers=None):
+    """
+    Scrapes each game's stats and saves them to a CSV
+
+    :param year: the year to be scraped
+    :param week: the week to be scraped
+    :param game_urls: the URL of each of the week's games
+    :param webdriver: the webdriver (or WebDriverPool) used to load each game
+    :param save_path: the path to save to
+    :param parse_workers: if set, the number of processes parsing games
+                          while the next games are fetched
+    :return: A DataFrame of each player's stats
+    """
+
+    pool = as_pool(webdriver)
+    num_games = len(game_urls)
 
-    for game_url in game_urls:
+    if parse_workers:
+        executor = ProcessPoolExecutor(max_workers=parse_workers)
+    else:
+        executor = None
+
+    def scrape_game(driver, work_item):
+        game_index, game_url = work_item
         print(f"\tReading game {game_index} / {num_games}...")
-        game_index = game_index + 1
 
-        webdriver.get(game_url)
-        time.sleep(6 + random.uniform(0, 4))
+        html = CACHE.capture(game_url, source="pro_football_reference",
+                             load_function=lambda: _load_page(driver,
+                                                              game_url))
+        if executor is None:
+            return _parse_game(html)
+
+        # Parse in another process while the next game is fetched
+        return executor.submit(_parse_game, html)
+
+    # Results come back in game order regardless of the pool size
+    try:
+        stat_dfs = pool.map(scrape_game, enumerate(game_urls, start=1))
+        if executor is not None:
+            # Waiting for the other processes counts as parsing
+            with INSTRUMENTATION.stage("parse"):
+                stat_dfs = [future.result() for future in stat_dfs]
+    finally:
+        if executor is not None:
+            executor.shutdown()
+
+    # Save to CSV
+    save_path = save_path.format(year=year, week=week)
+
+    # Concatenating games with different categories loses the dtypes
+    with INSTRUMENTATION.stage("merge"):
+        df = pd.concat(stat_dfs)
+    df = schema.apply_schema(df, context=f"pro_football_reference {year} "
+                                         f"week {week}",
+                             source="pro_football_reference")
+    df = df.sort_values(by=["Pos", "Name"])
 
-        html = webdriver.page_source
-        soup = BeautifulSoup(html, 'html.parser')
+    # Missing values are saved as '-'
+    with INSTRUMENTATION.stage("write"):
+        SNAPSHOTS.save(df, save_path, source="pro_football_reference",
+                       year=year, week=week, index=False, na_rep="-",
+                       float_format=schema.FLOAT_FORMAT)
+        STORE.write(df, source="pro_football_reference", year=year,
+                    week=week)
+    INSTRUMENTATION.count("rows", len(df))
+    print(f"Year {year}, week {week} saved to {save_path}")
 
-        off_df = _get_offense_stats(soup)
-        idp_df = _get_idp_stats(soup)
-        kick_df = _get_kick_stats(soup)
-        ret_df = _get_ret_stats(soup)
-        dst_df = _get_team_defense_stats(soup)
+    return df
 
-        player_pos_dict = _get_player_position_dict(soup=soup)
 
-        off_df.insert(loc=3, column="Pos",
-                      value=off_df["ID"].map(player_pos_dict))
-        idp_df.insert(loc=3, column="Pos",
-                      value=idp_df["ID"].map(player_pos_dict))
-        kick_df.insert(loc=3, column="Pos",
-                       value=kick_df["ID"].map(player_pos_dict))
-        ret_df.insert(loc=3, column="Pos",
-                      value=ret_df["ID"].map(player_pos_dict))
+@INSTRUMENTATION.stage("parse")
+def _parse_game(html):
+    """
+    Parses a game's box score page
 
-        merged_df = reduce(lambda df1, df2:
-                           pd.merge(df1, df2, how="outer"),
-                           [off_df, idp_df, dst_df, kick_df, ret_df])
+    :param html: the game page's HTML
+    :return: DataFrame of each player's and team defense's stats in the game
+    """
+    # Only parse the tables that are used, not the whole page
+    tables = html_tables.extract_tables(html, GAME_TABLE_IDS)
 
-        stat_dfs.append(merged_df)
+    off_df = _get_offense_stats(tables)
+    idp_df = _get_idp_stats(tables)
+    kick_df = _get_kick_stats(tables)
+    ret_df = _get_ret_stats(tables)
+    dst_df = _get_team_defense_stats(tables)
 
-    # Save to CSV
-    save_path = save_path.format(year=year, week=week)
+    player_pos_dict = _get_player_position_dict(tables=tables)
 
-    df = pd.concat(stat_dfs)
-    df = df.sort_values(by=["Pos", "Name"])
+    off_df.insert(loc=3, column="Pos",
+                  value=off_df["ID"].map(player_pos_dict))
+    idp_df.insert(loc=3, column="Pos",
+                  value=idp_df["ID"].map(player_pos_dict))
+    kick_df.insert(loc=3, column="Pos",
+                   value=kick_df["ID"].map(player_pos_dict))
+    ret_df.insert(loc=3, column="Pos",
+                  value=ret_df["ID"].map(player_pos_dict))
 
-    df = df.replace(re.compile("^\s*$"), "-")
-    df = df.fillna("-")
+    # Players are identified by their PFR ID. Team defenses have none, so
+    # they are told apart by name and team
+    merged_df = util_scripts.combine_frames(
+        [off_df, idp_df, dst_df, kick_df, ret_df],
+        keys=["Name", "ID", "Team", "Pos"], context="pro_football_reference")
+
+    return schema.apply_schema(merged_df, context="pro_football_reference",
+                               source="pro_football_reference")
 
-    df.to_csv(path_or_buf=save_path, index=False)
-    print(f"Year {year}, week {week} saved to {save_path}")
 
+def _load_page(webdriver, url):
+    """
+    Loads a page with the webdriver once the host's politeness schedule allows
 
-def _get_offense_stats(soup):
+    :param webdriver: the webdriver to load the page with
+    :param url: the URL to load
+    :return: the page's HTML
+    """
+    webdriver.set_page_load_timeout(10)
+    SCHEDULER.fetch(url, webdriver.get, url)
+    with INSTRUMENTATION.stage("render"):
+        return webdriver.page_source
+
+
+def _get_offense_stats(tables):
     """
     Gets offensive player stats
 
-    :param soup: BeautifulSoup representation of the page
+    :param tables: dict mapping table ID -> lxml table (from
+                   html_tables.extract_tables)
     :return: DataFrame of each offensive player's stats
     """
 
@@ -123,7 +286,7 @@ def _get_offense_stats(soup):
               "Receiving_TD": "Rec Td", "Receiving_Lng": "Rec Long",
               "Fumbles_Fmb": "Off Fum", "Fumbles_FL": "Off Fum Lost"}
 
-    off_table = soup.find("table", {"id": "player_offense"})
+    off_table = tables.get("player_offense")
     stats_df = _parse_pfr_table(table=off_table)
     stats_df.name = "Offense Stats"
 
@@ -133,11 +296,12 @@ def _get_offense_stats(soup):
     return stats_df
 
 
-def _get_idp_stats(soup):
+def _get_idp_stats(tables):
     """
     Gets defensive player stats
 
-    :param soup: BeautifulSoup representation of the page
+    :param tables: dict mapping table ID -> lxml table (from
+                   html_tables.extract_tables)
     :return: DataFrame of each defensive player's stats
     """
     
@@ -153,7 +317,7 @@ def _get_idp_stats(soup):
               "Fumbles_FR": "Def Fum Rec", "Fumbles_Yds": "Def Fum Yd",
               "Fumbles_TD": "Def Fum Td", "Fumbles_FF": "Def FF"}
 
-    idp_table = soup.find("table", {"id": "player_defense"})
+    idp_table = tables.get("player_defense")
     stats_df = _parse_pfr_table(table=idp_table)
     stats_df.name = "IDP Stats"
 
@@ -163,11 +327,12 @@ def _get_idp_stats(soup):
     return stats_df
 
 
-def _get_ret_stats(soup):
+def _get_ret_stats(tables):
     """
     Gets kick and punt return stats
 
-    :param soup: BeautifulSoup representation of the page
+    :param tables: dict mapping table ID -> lxml table (from
+                   html_tables.extract_tables)
     :return: DataFrame of each returner's stats (may be empty)
     """
 
@@ -178,7 +343,7 @@ def _get_ret_stats(soup):
               "Punt Returns_Yds": "PR Yd", "Punt Returns_Y/R": "PR Avg",
               "Punt Returns_TD": "PR Td", "Punt Returns_Lng": "PR Long"}
 
-    ret_table = soup.find("table", {"id": "returns"})
+    ret_table = tables.get("returns")
 
     # May not exist (e.g. 2014 NOR vs GNB)
     if ret_table is None:
@@ -193,11 +358,12 @@ def _get_ret_stats(soup):
     return stats_df
 
 
-def _get_kick_stats(soup):
+def _get_kick_stats(tables):
     """
     Gets kick and punt stats
 
-    :param soup: BeautifulSoup representation of the page
+    :param tables: dict mapping table ID -> lxml table (from
+                   html_tables.extract_tables)
     :return: DataFrame of each kicker's stats (may be empty)
     """
 
@@ -207,7 +373,7 @@ def _get_kick_stats(soup):
               "Punting_Pnt": "Punt", "Punting_Yds": "Punt Yd",
               "Punting_Y/P": "Punt Avg", "Punting_Lng": "Punt Long"}
 
-    kick_table = soup.find("table", {"id": "kicking"})
+    kick_table = tables.get("kicking")
     stats_df = _parse_pfr_table(table=kick_table)
     stats_df.name = "Kicking Stats"
 
@@ -217,79 +383,43 @@ def _get_kick_stats(soup):
     return stats_df
 
 
-def _get_team_defense_stats(soup):
+def _get_team_defense_stats(tables):
     """
     Gets team defense stats
 
-    :param soup: BeautifulSoup representation of the page
+    :param tables: dict mapping table ID -> lxml table (from
+                   html_tables.extract_tables)
     :return: DataFrame of each team's defense stats
     """
-    raw_stats_table = soup.find("table", {"id": "team_stats"})
-    raw_stats_df = pd.read_html(str(raw_stats_table))[0]
+    raw_stats_table = tables.get("team_stats")
+    raw_stats_df = html_tables.read_table(raw_stats_table,
+                                          header_style="pandas",
+                                          convert_numeric=True)
 
     # transpose df and fix headers
     raw_stats_df = raw_stats_df.T
     raw_stats_df.columns = raw_stats_df.iloc[0]
     raw_stats_df = raw_stats_df[1:]
 
-    stats_list = []
-    # find first downs
-    stats_list.append(_get_series(df=raw_stats_df, header="First Downs",
-                      index=None, reverse=True, new_name="Def 1D"))
-
-    # find rush attempts allowed
-    stats_list.append(_get_series(df=raw_stats_df, header="Rush-Yds-TDs",
-                      index=0, reverse=True, new_name="Def Rush Att"))
-    # find rush yards allowed
-    stats_list.append(_get_series(df=raw_stats_df, header="Rush-Yds-TDs",
-                      index=1, reverse=True, new_name="Def Rush Yd"))
-    # find rush TDs allowed
-    stats_list.append(_get_series(df=raw_stats_df, header="Rush-Yds-TDs",
-                      index=2, reverse=True, new_name="Def Rush TD"))
-
-    # find pass completions allowed
-    stats_list.append(_get_series(df=raw_stats_df, header="Cmp-Att-Yd-TD-INT",
-                      index=0, reverse=True, new_name="Def Pass Comp"))
-    # find pass attempts allowed
-    stats_list.append(_get_series(df=raw_stats_df, header="Cmp-Att-Yd-TD-INT",
-                      index=1, reverse=True, new_name="Def Pass Att"))
-    # find (gross) pass yards allowed
-    stats_list.append(_get_series(df=raw_stats_df, header="Cmp-Att-Yd-TD-INT",
-                      index=2, reverse=True, new_name="Def Pass Yd Gross"))
-    # find pass TDs allowed
-    stats_list.append(_get_series(df=raw_stats_df, header="Cmp-Att-Yd-TD-INT",
-                      index=3, reverse=True, new_name="Def Pass TD"))
-    # find interceptions
-    stats_list.append(_get_series(df=raw_stats_df, header="Cmp-Att-Yd-TD-INT",
-                      index=4, reverse=True, new_name="Def Int"))
-
-    # find sacks
-    stats_list.append(_get_series(df=raw_stats_df, header="Sacked-Yards",
-                      index=0, reverse=True, new_name="Def Sack"))
-    # find sack yards
-    stats_list.append(_get_series(df=raw_stats_df, header="Sacked-Yards",
-                      index=1, reverse=True, new_name="Def Sack Yd"))
-
-    # find (net) pass yards allowed
-    stats_list.append(_get_series(df=raw_stats_df, header="Net Pass Yards",
-                      index=None, reverse=True, new_name="Def Pass Yd Net"))
-
-    # find (net) total yards allowed
-    stats_list.append(_get_series(df=raw_stats_df, header="Total Yards",
-                      index=None, reverse=True, new_name="Def Yd"))
-
-    # find fumbles
-    stats_list.append(_get_series(df=raw_stats_df, header="Fumbles-Lost",
-                      index=0, reverse=True, new_name="Def Fum"))
-    # find fumbles recovered
-    stats_list.append(_get_series(df=raw_stats_df, header="Fumbles-Lost",
-                      index=1, reverse=True, new_name="Def Fum Rec"))
-
-    # find turnovers
-    stats_list.append(_get_series(df=raw_stats_df, header="Turnovers",
-                      index=None, reverse=True, new_name="Def TO"))
-
-    stats_df = pd.concat(stats_list, axis=1)
+    if len(raw_stats_df) != 2:
+        raise Exception("There should be 2 teams in the team stats table")
+
+    # Split each compound (e.g. "Cmp-Att-Yd-TD-INT") stat once. Only split
+    # on hyphens after a digit, so negative numbers (e.g. "10--5-0") survive
+    split_dfs = {}
+    for header, index, _ in TEAM_DEFENSE_STATS:
+        if index is not None and header not in split_dfs:
+            split_dfs[header] = raw_stats_df[header].astype(str).str.split(
+                                    r"(?<=\d)-", regex=True, expand=True)
+
+    stats_df = pd.DataFrame(
+        {new_name: (raw_stats_df[header] if index is None
+                    else split_dfs[header][index])
+         for header, index, new_name in TEAM_DEFENSE_STATS})
+
+    # Each team's defense stats are the opposing team's offense stats, so
+    # swap the team labels
+    stats_df.index = stats_df.index[::-1]
 
     # Move name from index to a new column
     stats_df.reset_index(inplace=True)
@@ -306,73 +436,18 @@ def _get_team_defense_stats(soup):
     return stats_df
 
 
-def _get_series(df, header, index=None, reverse=False, new_name=None):
-    """
-    gets a stat series (one element per player/team)
-
-    :param df: the DataFrame to parse
-    :param header: the header to look for
-    :param index: the index within the header (if multiple stats
-                are under the same header but separated by a hyphen)
-                Must be an integer or None
-    :param reverse: whether to reverse the series (used for reversing offense / defense stats)
-    :return: A Series of each player/team's stat
-    """ 
-    series = df[header]
-
-    if isinstance(index, int):
-        series = series.apply(lambda text: text.split("-")[index])
-    elif index is not None:
-        raise Exception("Index should be an integer or None")
-
-    if reverse:
-        num_entries = len(series)
-        if num_entries != 2:
-            raise Exception("There should be 2 entries if reversing")
-        series = _reverse_series(series)
-
-    series = series.rename(new_name)
-
-    return series
-
-
-def _reverse_series(series):
-    """
-    reverses order of data relative to indices. Useful for swapping one team's
-    offense with the opposing team's defense
-
-    :param df: the DataFrame to parse
-    :param header: the header to look for
-    :param index: the index within the header (if multiple stats
-                are under the same header but separated by a hyphen)
-                Must be an integer or None
-    :param reverse: whether to reverse the series (used for reversing offense / defense stats)
-    :return: A Series of each player/team's stat
-    """
-    # get indices as list
-    indices = list(series.index)
-    
-    # reverse indices
-    indices = indices[::-1]
-    
-    # set series index
-    series = series.set_axis(indices)
-    
-    # return reversed series
-    return series
-
-
-def _get_player_position_dict(soup):
+def _get_player_position_dict(tables):
     """
     Gets map of player ID -> position
 
-    :param soup: BeautifulSoup object representing the HTML page
+    :param tables: dict mapping table ID -> lxml table (from
+                   html_tables.extract_tables)
     :return: map of player ID -> position
     """
-    home_table = soup.find("table", {"id": "home_snap_counts"})
+    home_table = tables.get("home_snap_counts")
     home_df = _parse_pfr_table(home_table)
 
-    away_table = soup.find("table", {"id": "vis_snap_counts"})
+    away_table = tables.get("vis_snap_counts")
     away_df = _parse_pfr_table(away_table)
 
     combined_df = pd.concat([home_df, away_df], axis=0, ignore_index=True)
@@ -381,36 +456,39 @@ def _get_player_position_dict(soup):
     return players_dict
 
 
-def _parse_pfr_table(table: bs4.element.Tag):
+def _parse_pfr_table(table: lxml.html.HtmlElement):
     """
     Parses a table from PFR in which data rows begin with a linked cell.
     Also inserts a column consisting of each player's ID
-    Is able to ignore header rows in the middle of the table body
+    Is able to ignore header rows in the middle of the table body.
+    Blank cells become missing values
 
     :param table: the table to be parsed
     :return: A plaintext DataFrame of each player's stats
     """
     raw_df = util_scripts.read_raw_html_table(table)
 
-    for index, row in raw_df.iterrows():
-        # Drop row if it isn't a data row
-        first_cell = row.values[0]
-        links = first_cell.find_all("a")
+    # Keep only data rows (rows whose first cell has exactly one link)
+    is_data_row = [_count_links(cell) == 1 for cell in raw_df.iloc[:, 0]]
+    raw_df = raw_df[is_data_row]
 
-        if len(links) == 1:
-            continue
-        else:
-            raw_df = raw_df.drop(axis=0, index=index)
+    # Get unformatted strings from each column's cells, and each player's ID
+    plaintext_df = pd.DataFrame(
+        {label: [_get_cell_text(cell) for cell in raw_df[label]]
+         for label in raw_df.columns})
+    plaintext_df.insert(loc=1, column="ID",
+                        value=[cell.get("data-append-csv")
+                               for cell in raw_df["_Player"]])
 
-    # Add ID column
-    raw_df.insert(loc=1, column="ID",
-                  value=raw_df["_Player"].map(
-                      lambda tag: tag["data-append-csv"]))
+    return plaintext_df
 
-    # Get unformatted strings from tags
-    # doesn't modify cell if it is already a string (e.g. the ID column)
-    plaintext_df = raw_df.applymap(lambda cell: cell.get_text()
-                                   if type(cell) is bs4.element.Tag else cell)
-    plaintext_df = plaintext_df.reset_index(drop=True)
 
-    return plaintext_df
\ No newline at end of file
+def _get_cell_text(cell):
+    """
+    :param cell: an lxml table cell
+    :return: the cell's text, or None if it is blank
+    """
+    text = cell.text_content()
+    if text.isspace() or text == "":
+        return None
+    return text
@@ -0,0 +1,332 @@
+"""
+File: query_store.py
+Description: Indexed SQLite store of every scraper's output, loaded
+             incrementally from the saved CSVs, with a small query API
+"""
+
+import glob
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+
+import pandas as pd
+
+from columnar_store import get_typed_df
+
+
+# Suffix of each source's CSVs -> the source's name in the store
+FILE_SOURCES = {
+    "nfl": "nfl",
+    "fantasydata": "fantasy_data",
+    "footballguys": "football_guys",
+    "sportsline": "sportsline",
+    "pro-football-reference": "pro_football_reference",
+}
+
+# Matches the names the scrapers save their CSVs under, e.g.
+# projections_2021_03_nfl.csv or historical_2021_1_pro-football-reference.csv
+_FILE_NAME = re.compile(r"^(?:projections|historical)_(\d{4})_(\d{1,2})_"
+                        r"(" + "|".join(map(re.escape, FILE_SOURCES)) +
+                        r")\.csv$")
+
+# Each source's headers for the key columns, where they aren't the standard
+# names (SportsLine's CSVs keep the site's headers)
+COLUMN_ALIASES = {
+    "sportsline": {"PLAYER": "Name", "POS": "Pos", "TEAM": "Team"},
+}
+
+# Columns every row has. Stat columns are added as they are first seen
+_KEY_COLUMNS = ["source", "year", "week", "Name", "Pos", "Team"]
+
+
+class QueryStore:
+    """
+    Keeps every (source, year, week) of scraped projections and stats in one
+    wide SQLite table, indexed on (Name, year, week, source) and (Team, year,
+    week). A stat column is added the first time any source reports it, and
+    rows of sources without it have it as NULL. Ingested files are recorded
+    with their checksums, so re-ingesting only loads new or changed weeks.
+    """
+
+    def __init__(self, path="projections.sqlite"):
+        """
+        :param path: the path of the SQLite database
+        """
+        self.path = path
+
+        self._lock = threading.Lock()
+        self._connection = None
+        self._columns = None
+
+    def _get_connection(self):
+        """
+        Opens the database on first use. Must hold self._lock
+
+        :return: the sqlite3 connection
+        """
+        if self._connection is None:
+            connection = sqlite3.connect(self.path, check_same_thread=False)
+            connection.execute("PRAGMA journal_mode = WAL")
+            connection.execute("PRAGMA synchronous = NORMAL")
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS stats ("
+                "source TEXT NOT NULL, year INTEGER NOT NULL, "
+                "week INTEGER NOT NULL, Name TEXT, Pos TEXT, Team TEXT)")
+            connection.execute(
+                "CREATE INDEX IF NOT EXISTS stats_player "
+                "ON stats (Name, year, week, source)")
+            connection.execute(
+                "CREATE INDEX IF NOT EXISTS stats_team "
+                "ON stats (Team, year, week)")
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS files ("
+                "path TEXT PRIMARY KEY, source TEXT, year INTEGER, "
+                "week INTEGER, checksum TEXT, rows INTEGER)")
+            connection.commit()
+
+            self._connection = connection
+            self._columns = [row[1] for row in
+                             connection.execute("PRAGMA table_info(stats)")]
+        return self._connection
+
+    def ingest_directory(self, directory=".", recursive=True):
+        """
+        Loads every scraper CSV under directory that is new or has changed
+        since it was last ingested
+
+        :param directory: the directory to search
+        :param recursive: whether to also search subdirectories
+        :return: the number of files loaded
+        """
+        pattern = (os.path.join(directory, "**", "*.csv") if recursive
+                   else os.path.join(directory, "*.csv"))
+        num_loaded = 0
+        for path in sorted(glob.glob(pattern, recursive=recursive)):
+            if _FILE_NAME.match(os.path.basename(path)):
+                num_loaded += self.ingest_file(path)
+        return num_loaded
+
+    def ingest_file(self, path):
+        """
+        Loads one scraper CSV, replacing any rows previously loaded for its
+        (source, year, week). Files that haven't changed are skipped
+
+        :param path: the path of the CSV, named like the scrapers save them
+        :return: whether the file was loaded
+        """
+        match = _FILE_NAME.match(os.path.basename(path))
+        if match is None:
+            raise ValueError(f"{path} isn't named like a scraper's output, "
+                             "e.g. projections_2021_03_nfl.csv")
+        year, week = int(match.group(1)), int(match.group(2))
+        source = FILE_SOURCES[match.group(3)]
+
+        with open(path, "rb") as file:
+            checksum = hashlib.sha256(file.read()).hexdigest()
+        key = os.path.abspath(path)
+
+        with self._lock:
+            row = self._get_connection().execute(
+                "SELECT checksum FROM files WHERE path = ?", (key,)
+            ).fetchone()
+        if row is not None and row[0] == checksum:
+            return False
+
+        df = pd.read_csv(path, dtype=str, keep_default_na=False)
+        self.ingest_df(df, source=source, year=year, week=week)
+
+        with self._lock:
+            connection = self._get_connection()
+            connection.execute(
+                "INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?, ?, ?)",
+                (key, source, year, week, checksum, len(df)))
+            connection.commit()
+        return True
+
+    def ingest_df(self, df, source, year, week):
+        """
+        Loads a scraped DataFrame, replacing any rows previously loaded for
+        the same (source, year, week). The source's key columns are renamed
+        to Name, Pos and Team (see COLUMN_ALIASES)
+
+        :param df: the DataFrame returned by a scraper
+        :param source: the source module's name
+        :param year: the year scraped
+        :param week: the week scraped
+        """
+        df = df.rename(columns=COLUMN_ALIASES.get(source, {}))
+        df = get_typed_df(df.drop(columns=["source", "year", "week"],
+                                  errors="ignore"))
+
+        lower_names = [str(column).lower() for column in df.columns]
+        if len(set(lower_names)) != len(lower_names):
+            raise ValueError(f"Columns {list(df.columns)} differ only in "
+                             "case, which SQLite can't tell apart")
+
+        with self._lock:
+            connection = self._get_connection()
+            columns = self._add_columns(connection, df)
+
+            # Missing values are stored as NULL
+            values = df.astype(object).where(df.notna(), None)
+            rows = [(source, int(year), int(week)) + tuple(row)
+                    for row in values.itertuples(index=False, name=None)]
+
+            column_list = ", ".join(_quote(column) for column in
+                                    ["source", "year", "week"] + columns)
+            placeholders = ", ".join(["?"] * (len(columns) + 3))
+            with connection:  # one transaction per partition
+                connection.execute(
+                    "DELETE FROM stats WHERE source = ? AND year = ? AND "
+                    "week = ?", (source, int(year), int(week)))
+                connection.executemany(
+                    f"INSERT INTO stats ({column_list}) "
+                    f"VALUES ({placeholders})", rows)
+
+    def _add_columns(self, connection, df):
+        """
+        Adds df's columns that the table doesn't have yet. Must hold
+        self._lock
+
+        :param connection: the sqlite3 connection
+        :param df: the typed DataFrame being loaded
+        :return: df's columns, named as they are in the table
+        """
+        existing = {column.lower(): column for column in self._columns}
+        columns = []
+        for column, dtype in zip(df.columns, df.dtypes):
+            column = str(column)
+            if column.lower() in existing:
+                columns.append(existing[column.lower()])
+                continue
+
+            column_type = "REAL" if pd.api.types.is_numeric_dtype(dtype) \
+                else "TEXT"
+            connection.execute(f"ALTER TABLE stats ADD COLUMN "
+                               f"{_quote(column)} {column_type}")
+            self._columns.append(column)
+            existing[column.lower()] = column
+            columns.append(column)
+        return columns
+
+    def query(self, sql, params=()):
+        """
+        Runs any SELECT against the store
+
+        :param sql: the query, e.g. "SELECT * FROM stats WHERE year = ?"
+        :param params: the query's parameters
+        :return: A DataFrame of the result
+        """
+        with self._lock:
+            cursor = self._get_connection().execute(sql, params)
+            rows = cursor.fetchall()
+            names = [description[0] for description in cursor.description]
+        return pd.DataFrame(rows, columns=names)
+
+    def get_player(self, name, years=None, weeks=None, sources=None,
+                   columns=None):
+        """
+        :param name: the player's name, as the sources list it
+        :param years: the years to include (all if None)
+        :param weeks: the weeks to include (all if None)
+        :param sources: the sources to include (all if None)
+        :param columns: the stat columns to include (all if None)
+        :return: A DataFrame of the player's rows, sorted by year, week and
+                 source
+        """
+        return self._select(("Name", [name]), years=years, weeks=weeks,
+                            sources=sources, columns=columns)
+
+    def get_team(self, team, years=None, weeks=None, sources=None,
+                 columns=None):
+        """
+        :param team: the team's abbreviation, as the sources list it
+        :param years: the years to include (all if None)
+        :param weeks: the weeks to include (all if None)
+        :param sources: the sources to include (all if None)
+        :param columns: the stat columns to include (all if None)
+        :return: A DataFrame of the team's rows, sorted by year, week and
+                 source
+        """
+        return self._select(("Team", [team]), years=years, weeks=weeks,
+                            sources=sources, columns=columns)
+
+    def get_week(self, year, week, sources=None, positions=None,
+                 columns=None):
+        """
+        :param year: the year
+        :param week: the week
+        :param sources: the sources to include (all if None)
+        :param positions: the positions to include (all if None)
+        :param columns: the stat columns to include (all if None)
+        :return: A DataFrame of every row of that week
+        """
+        return self._select(("Pos", positions), years=[year], weeks=[week],
+                            sources=sources, columns=columns)
+
+    def _select(self, condition, years, weeks, sources, columns):
+        """
+        :param condition: tuple of a key column and the values it may have
+                          (any if None)
+        :param years: the years to include (all if None)
+        :param weeks: the weeks to include (all if None)
+        :param sources: the sources to include (all if None)
+        :param columns: the stat columns to include (all if None)
+        :return: A DataFrame of the matching rows. Stat columns that are
+                 NULL in every row are dropped
+        """
+        with self._lock:
+            self._get_connection()
+            table_columns = list(self._columns)
+
+        if columns is None:
+            selected = table_columns
+            drop_empty = True
+        else:
+            unknown = [column for column in columns
+                       if column not in table_columns]
+            if unknown:
+                raise ValueError(f"Columns {unknown} aren't in the store")
+            selected = _KEY_COLUMNS + [column for column in columns
+                                       if column not in _KEY_COLUMNS]
+            drop_empty = False
+
+        clauses = []
+        params = []
+        for column, values in [condition, ("year", years), ("week", weeks),
+                               ("source", sources)]:
+            if values is not None:
+                values = list(values)
+                clauses.append(f"{_quote(column)} IN "
+                               f"({', '.join(['?'] * len(values))})")
+                params.extend(values)
+        where = " WHERE " + " AND ".join(clauses) if clauses else ""
+
+        df = self.query(f"SELECT {', '.join(map(_quote, selected))} "
+                        f"FROM stats{where} ORDER BY year, week, source",
+                        params)
+        if drop_empty:
+            # Most stat columns belong to other sources or positions
+            empty = [column for column in df.columns[len(_KEY_COLUMNS):]
+                     if df[column].isna().all()]
+            df = df.drop(columns=empty)
+        return df
+
+    def close(self):
+        """
+        Closes the database
+        """
+        with self._lock:
+            if self._connection is not None:
+                self._connection.close()
+                self._connection = None
+
+
+def _quote(column):
+    """
+    :param column: a column name
+    :return: the name quoted as an SQL identifier
+    """
+    return '"' + column.replace('"', '""') + '"'
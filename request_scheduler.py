@@ -0,0 +1,300 @@
+"""
+File: request_scheduler.py
+Description: Thread-safe, per-host rate limiter that every scraper routes its
+             fetches through
+"""
+
+import asyncio
+import random
+import threading
+import time
+from contextlib import contextmanager
+from urllib.parse import urlparse
+
+from instrumentation import INSTRUMENTATION
+
+
+class HostPolicy:
+    """
+    Politeness settings for one host.
+
+    :param min_delay: minimum number of seconds between two requests
+    :param jitter: up to this many extra seconds are randomly added to each
+                   request's spacing
+    :param burst: number of requests that may be sent back-to-back after the
+                  host has been idle
+    """
+
+    def __init__(self, min_delay: float, jitter: float = 0, burst: int = 1):
+        if min_delay < 0 or jitter < 0:
+            raise ValueError("min_delay and jitter must be non-negative")
+        if burst < 1:
+            raise ValueError(f"burst is {burst}, should be at least 1")
+
+        self.min_delay = min_delay
+        self.jitter = jitter
+        self.burst = burst
+
+
+class _TokenBucket:
+    """
+    Token bucket for a single host. One token is refilled every min_delay
+    seconds, and each request costs one token plus its share of jitter.
+    Requests that find the bucket empty reserve a future slot, so callers can
+    sleep outside the scheduler's lock.
+    """
+
+    def __init__(self, policy: HostPolicy):
+        self.policy = policy
+        self.tokens = float(policy.burst)
+        self.last_refill = time.monotonic()
+
+    def reserve(self, now: float):
+        """
+        Takes a token and returns how long the caller must wait before using it
+
+        :param now: the current time.monotonic() value
+        :return: the number of seconds to wait
+        """
+        policy = self.policy
+        spacing = policy.min_delay + random.uniform(0, policy.jitter)
+        if spacing == 0:
+            return 0.0
+        # Refill at the host's base rate, measuring the cost of this request
+        # in units of min_delay (or of the full spacing if min_delay is 0)
+        period = policy.min_delay if policy.min_delay > 0 else spacing
+        elapsed = now - self.last_refill
+        self.tokens = min(float(policy.burst),
+                          self.tokens + elapsed / period)
+        self.last_refill = now
+
+        cost = spacing / period
+        if self.tokens >= cost:
+            self.tokens -= cost
+            return 0.0
+
+        wait = (cost - self.tokens) * period
+        self.tokens -= cost
+        return wait
+
+
+class RequestScheduler:
+    """
+    Schedules requests so that each host keeps its own minimum spacing and
+    jitter, while requests to different hosts may overlap. Also records how
+    much time is spent waiting for a slot versus actually fetching.
+    """
+
+    def __init__(self, default_policy: HostPolicy = None):
+        self._default_policy = default_policy or HostPolicy(min_delay=1)
+        self._policies = {}
+        self._buckets = {}
+        self._stats = {}
+        self._lock = threading.Lock()
+
+    def set_policy(self, host: str, min_delay: float, jitter: float = 0,
+                   burst: int = 1):
+        """
+        Sets the politeness policy for a host. The policy also applies to its
+        subdomains (e.g. "nfl.com" covers "fantasy.nfl.com")
+
+        :param host: the host name
+        :param min_delay: minimum number of seconds between two requests
+        :param jitter: up to this many random seconds added to the spacing
+        :param burst: number of requests allowed back-to-back after idling
+        """
+        with self._lock:
+            self._policies[host.lower()] = HostPolicy(min_delay, jitter, burst)
+            # Drop any bucket created under the old policy
+            for bucket_host in list(self._buckets):
+                if self._policy_key(bucket_host) == host.lower():
+                    del self._buckets[bucket_host]
+
+    def _policy_key(self, host: str):
+        """
+        :param host: the host name
+        :return: the most specific configured policy key matching host, or
+                 None if the default policy applies
+        """
+        matches = [key for key in self._policies
+                   if host == key or host.endswith("." + key)]
+        if not matches:
+            return None
+        return max(matches, key=len)
+
+    def _bucket(self, host: str):
+        """
+        Gets (or creates) the token bucket for a host. Must hold self._lock
+
+        :param host: the host name
+        :return: the host's _TokenBucket
+        """
+        if host not in self._buckets:
+            key = self._policy_key(host)
+            policy = (self._policies[key] if key is not None
+                      else self._default_policy)
+            self._buckets[host] = _TokenBucket(policy)
+            self._stats[host] = {"requests": 0, "wait_seconds": 0.0,
+                                 "fetch_seconds": 0.0, "errors": 0}
+        return self._buckets[host]
+
+    def acquire(self, url: str):
+        """
+        Blocks until a request to url's host is allowed
+
+        :param url: the URL about to be requested
+        :return: the number of seconds spent waiting
+        """
+        wait = self._reserve(url)
+        if wait > 0:
+            with INSTRUMENTATION.stage("wait"):
+                time.sleep(wait)
+        return wait
+
+    def _reserve(self, url: str):
+        """
+        Reserves the next slot for url's host without waiting for it
+
+        :param url: the URL about to be requested
+        :return: the number of seconds until the slot is available
+        """
+        host = get_host(url)
+        with self._lock:
+            wait = self._bucket(host).reserve(time.monotonic())
+            self._stats[host]["wait_seconds"] += wait
+        return wait
+
+    def _record_fetch(self, url: str, elapsed: float, failed: bool):
+        """
+        Adds a completed fetch to url's host statistics
+
+        :param url: the URL that was requested
+        :param elapsed: seconds spent fetching
+        :param failed: whether the fetch raised an exception
+        """
+        with self._lock:
+            stats = self._stats[get_host(url)]
+            stats["requests"] += 1
+            stats["fetch_seconds"] += elapsed
+            if failed:
+                stats["errors"] += 1
+
+    @contextmanager
+    def slot(self, url: str):
+        """
+        Context manager that waits for url's host to be available, then times
+        the body of the with-statement as fetch time. Useful for fetches that
+        aren't a single function call (e.g. driving a webdriver)
+
+        :param url: the URL about to be requested
+        """
+        self.acquire(url)
+        start = time.perf_counter()
+        failed = False
+        try:
+            with INSTRUMENTATION.stage("fetch"):
+                yield
+        except BaseException:
+            failed = True
+            raise
+        finally:
+            self._record_fetch(url, time.perf_counter() - start, failed)
+
+    def fetch(self, url: str, fetch_function, *args, **kwargs):
+        """
+        Waits for url's host to be available, then calls fetch_function
+
+        :param url: the URL to be requested (used to pick the host)
+        :param fetch_function: the function that performs the request
+        :param args: positional arguments passed to fetch_function
+        :param kwargs: keyword arguments passed to fetch_function
+        :return: the return value of fetch_function
+        """
+        with self.slot(url):
+            return fetch_function(*args, **kwargs)
+
+    async def acquire_async(self, url: str):
+        """
+        Coroutine version of acquire() that sleeps without blocking the
+        event loop
+
+        :param url: the URL about to be requested
+        :return: the number of seconds spent waiting
+        """
+        wait = self._reserve(url)
+        if wait > 0:
+            with INSTRUMENTATION.stage("wait"):
+                await asyncio.sleep(wait)
+        return wait
+
+    async def fetch_async(self, url: str, fetch_function, *args, **kwargs):
+        """
+        Coroutine version of fetch(). fetch_function is a blocking function
+        (e.g. requests.get), so it is run in a worker thread
+
+        :param url: the URL to be requested (used to pick the host)
+        :param fetch_function: the blocking function that performs the request
+        :param args: positional arguments passed to fetch_function
+        :param kwargs: keyword arguments passed to fetch_function
+        :return: the return value of fetch_function
+        """
+        await self.acquire_async(url)
+        start = time.perf_counter()
+        failed = False
+        try:
+            with INSTRUMENTATION.stage("fetch"):
+                return await asyncio.to_thread(fetch_function, *args,
+                                               **kwargs)
+        except BaseException:
+            failed = True
+            raise
+        finally:
+            self._record_fetch(url, time.perf_counter() - start, failed)
+
+    def stats(self):
+        """
+        :return: dict mapping each host to its number of requests, errors,
+                 seconds spent waiting, and seconds spent fetching
+        """
+        with self._lock:
+            return {host: dict(host_stats)
+                    for host, host_stats in self._stats.items()}
+
+    def reset_stats(self):
+        """
+        Clears the recorded wait/fetch statistics
+        """
+        with self._lock:
+            for host_stats in self._stats.values():
+                host_stats.update(requests=0, wait_seconds=0.0,
+                                  fetch_seconds=0.0, errors=0)
+
+    def report(self):
+        """
+        Prints time spent waiting versus fetching for each host
+        """
+        for host, host_stats in sorted(self.stats().items()):
+            print(f"{host}: {host_stats['requests']} requests, "
+                  f"{host_stats['errors']} errors, "
+                  f"{host_stats['wait_seconds']:.1f}s waiting, "
+                  f"{host_stats['fetch_seconds']:.1f}s fetching")
+
+
+def get_host(url: str):
+    """
+    :param url: a URL
+    :return: the URL's lower-case host name
+    """
+    host = urlparse(url).hostname
+    if host is None:
+        raise ValueError(f"Could not find a host in URL {url}")
+    return host.lower()
+
+
+# Scheduler shared by all scrapers, with the spacing each site has always used
+SCHEDULER = RequestScheduler()
+SCHEDULER.set_policy("fantasydata.com", min_delay=2, jitter=3)
+SCHEDULER.set_policy("nfl.com", min_delay=3, jitter=2)
+SCHEDULER.set_policy("footballguys.com", min_delay=1)
+SCHEDULER.set_policy("sportsline.com", min_delay=1)
+SCHEDULER.set_policy("pro-football-reference.com", min_delay=6, jitter=4)
@@ -0,0 +1,337 @@
+"""
+File: retry.py
+Description: Shared retry policy for fetches: classifies errors, backs off
+             exponentially with jitter, caps the number of attempts and trips
+             a per-host circuit breaker when a site keeps failing
+"""
+
+import asyncio
+import random
+import threading
+import time
+
+import requests
+
+from instrumentation import INSTRUMENTATION
+from request_scheduler import get_host
+
+
+# HTTP statuses worth retrying (rate limited or a server-side failure)
+RETRYABLE_STATUSES = {429, 500, 502, 503, 504}
+
+# Names of selenium exceptions worth retrying. They are matched by name so
+# that selenium is only needed by the scrapers that drive a browser
+_RETRYABLE_EXCEPTION_NAMES = {"TimeoutException", "WebDriverException"}
+
+
+class RetryError(Exception):
+    """
+    Raised when a fetch still fails after the policy's last attempt. The
+    last error is its __cause__
+    """
+
+
+class CircuitOpenError(RetryError):
+    """
+    Raised when a failure opens a host's circuit breaker, and without trying
+    while the breaker is open
+    """
+
+
+class RetryPolicy:
+    """
+    Retry settings. The n-th retry waits between half and all of
+    base_delay * 2 ** (n - 1) seconds, capped at max_delay.
+    """
+
+    def __init__(self, max_attempts: int = 5, base_delay: float = 2,
+                 max_delay: float = 60, failure_threshold: int = 5,
+                 reset_seconds: float = 300):
+        """
+        :param max_attempts: the maximum number of attempts per fetch
+        :param base_delay: seconds to wait before the first retry
+        :param max_delay: the maximum number of seconds between attempts
+        :param failure_threshold: number of fetches from a host in a row
+                                  that fail after all their attempts, which
+                                  opens its circuit breaker
+        :param reset_seconds: seconds an open breaker rejects fetches before
+                              letting one through to test the host
+        """
+        if max_attempts < 1:
+            raise ValueError("max_attempts must be at least 1")
+        if base_delay < 0 or max_delay < 0 or reset_seconds < 0:
+            raise ValueError("base_delay, max_delay and reset_seconds must "
+                             "be non-negative")
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+
+    def get_delay(self, attempt: int):
+        """
+        :param attempt: the number of the attempt that just failed (from 1)
+        :return: the number of seconds to wait before the next attempt
+        """
+        delay = min(self.max_delay, self.base_delay * 2 ** (attempt - 1))
+        return random.uniform(delay / 2, delay)
+
+
+class _CircuitBreaker:
+    """
+    Counts a host's consecutive failed fetches (fetches that ran out of
+    attempts, not single attempts, so one bad page can't open it). Once
+    there are failure_threshold of them the breaker opens and rejects
+    fetches for reset_seconds, after which fetches are let through again:
+    one success closes it, and one failed attempt opens it for another
+    reset_seconds.
+    """
+
+    def __init__(self, policy: RetryPolicy):
+        self.policy = policy
+        self.failures = 0
+        self.opened_at = None
+
+    def allows(self, now: float):
+        """
+        :param now: the current time.monotonic() value
+        :return: whether a fetch may be attempted
+        """
+        return self.opened_at is None or \
+            now - self.opened_at >= self.policy.reset_seconds
+
+    @property
+    def testing(self):
+        """
+        :return: whether the breaker has opened and is letting fetches
+                 through to test the host
+        """
+        return self.opened_at is not None
+
+    def record_success(self):
+        self.failures = 0
+        self.opened_at = None
+
+    def record_failure(self, now: float):
+        """
+        :param now: the current time.monotonic() value
+        :return: whether this failed fetch opened the breaker
+        """
+        self.failures += 1
+        if self.failures >= self.policy.failure_threshold:
+            self.opened_at = now
+            return True
+        return False
+
+
+class Retrier:
+    """
+    Calls fetch functions under a RetryPolicy, with a circuit breaker and
+    statistics per host. Errors that retrying can't fix (e.g. a parse error
+    or a page missing from an offline cache) are raised straight away.
+    """
+
+    def __init__(self, policy: RetryPolicy = None):
+        self.policy = policy or RetryPolicy()
+        self._breakers = {}
+        self._stats = {}
+        self._lock = threading.Lock()
+
+    def call(self, url: str, function, *args, **kwargs):
+        """
+        Calls function until it succeeds, sleeping between attempts
+
+        :param url: the URL being fetched (used to pick the host)
+        :param function: the function that fetches it
+        :param args: positional arguments passed to function
+        :param kwargs: keyword arguments passed to function
+        :return: the return value of function
+        """
+        for attempt in range(1, self.policy.max_attempts + 1):
+            self._check_breaker(url)
+            start = time.perf_counter()
+            try:
+                result = function(*args, **kwargs)
+            except Exception as error:
+                if not is_retryable(error):
+                    raise
+                delay = self._record_failure(url, error, attempt,
+                                             time.perf_counter() - start)
+                with INSTRUMENTATION.stage("backoff"):
+                    time.sleep(delay)
+                self._record_lost(url, delay)
+            else:
+                self._record_success(url)
+                return result
+
+    async def call_async(self, url: str, function, *args, **kwargs):
+        """
+        Coroutine version of call() that sleeps without blocking the event
+        loop
+
+        :param url: the URL being fetched (used to pick the host)
+        :param function: the coroutine function that fetches it
+        :param args: positional arguments passed to function
+        :param kwargs: keyword arguments passed to function
+        :return: the return value of function
+        """
+        for attempt in range(1, self.policy.max_attempts + 1):
+            self._check_breaker(url)
+            start = time.perf_counter()
+            try:
+                result = await function(*args, **kwargs)
+            except Exception as error:
+                if not is_retryable(error):
+                    raise
+                delay = self._record_failure(url, error, attempt,
+                                             time.perf_counter() - start)
+                with INSTRUMENTATION.stage("backoff"):
+                    await asyncio.sleep(delay)
+                self._record_lost(url, delay)
+            else:
+                self._record_success(url)
+                return result
+
+    def _host_state(self, host: str):
+        """
+        Gets (or creates) a host's breaker and statistics. Must hold
+        self._lock
+
+        :param host: the host name
+        :return: A tuple of the host's _CircuitBreaker and statistics dict
+        """
+        if host not in self._breakers:
+            self._breakers[host] = _CircuitBreaker(self.policy)
+            self._stats[host] = {"calls": 0, "retries": 0, "failures": 0,
+                                 "rejected": 0, "trips": 0,
+                                 "seconds_lost": 0.0}
+        return self._breakers[host], self._stats[host]
+
+    def _check_breaker(self, url: str):
+        """
+        Raises CircuitOpenError if url's host's breaker is open
+
+        :param url: the URL about to be fetched
+        """
+        host = get_host(url)
+        with self._lock:
+            breaker, stats = self._host_state(host)
+            if breaker.allows(time.monotonic()):
+                return
+            stats["rejected"] += 1
+            wait = self.policy.reset_seconds - (time.monotonic() -
+                                                breaker.opened_at)
+        raise CircuitOpenError(f"{breaker.failures} fetches from {host} "
+                               f"failed in a row, not fetching {url} for "
+                               f"another {wait:.0f}s")
+
+    def _record_success(self, url: str):
+        """
+        :param url: the URL that was fetched
+        """
+        with self._lock:
+            breaker, stats = self._host_state(get_host(url))
+            breaker.record_success()
+            stats["calls"] += 1
+
+    def _record_failure(self, url: str, error: Exception, attempt: int,
+                        elapsed: float):
+        """
+        Records a failed attempt, and raises RetryError if it was the last
+        one. A fetch that fails for good counts towards the host's breaker,
+        and raises CircuitOpenError if it opened it. While the breaker is
+        testing the host, the first failed attempt reopens it
+
+        :param url: the URL that was fetched
+        :param error: the exception the attempt raised
+        :param attempt: the number of the attempt (from 1)
+        :param elapsed: seconds the attempt took
+        :return: the number of seconds to wait before the next attempt
+        """
+        host = get_host(url)
+        with self._lock:
+            breaker, stats = self._host_state(host)
+            stats["seconds_lost"] += elapsed
+            if attempt == self.policy.max_attempts or breaker.testing:
+                stats["calls"] += 1
+                stats["failures"] += 1
+                if breaker.record_failure(time.monotonic()):
+                    stats["trips"] += 1
+                    raise CircuitOpenError(
+                        f"{breaker.failures} fetches from {host} failed in "
+                        f"a row, giving up on {url} after {attempt} "
+                        f"attempts ({type(error).__name__}: {error})"
+                    ) from error
+                raise RetryError(f"Fetching {url} failed {attempt} times, "
+                                 f"last with {type(error).__name__}: "
+                                 f"{error}") from error
+            stats["retries"] += 1
+
+        INSTRUMENTATION.count("retries")
+        delay = self.policy.get_delay(attempt)
+        print(f"{type(error).__name__} fetching {url}: {error}")
+        print(f"Retrying in {delay:.1f}s (attempt {attempt + 1} of "
+              f"{self.policy.max_attempts})...\n")
+        return delay
+
+    def _record_lost(self, url: str, seconds: float):
+        """
+        :param url: the URL being fetched
+        :param seconds: seconds spent backing off
+        """
+        with self._lock:
+            self._host_state(get_host(url))[1]["seconds_lost"] += seconds
+
+    def stats(self):
+        """
+        :return: dict mapping each host to its number of calls, retries,
+                 failures (calls that ran out of attempts), fetches rejected
+                 by its breaker, breaker trips, and seconds lost to failed
+                 attempts and backing off
+        """
+        with self._lock:
+            return {host: dict(host_stats)
+                    for host, host_stats in self._stats.items()}
+
+    def reset_stats(self):
+        """
+        Clears the recorded statistics (but not the breakers' states)
+        """
+        with self._lock:
+            for host_stats in self._stats.values():
+                host_stats.update(calls=0, retries=0, failures=0, rejected=0,
+                                  trips=0, seconds_lost=0.0)
+
+    def report(self):
+        """
+        Prints the retries and time lost for each host
+        """
+        for host, host_stats in sorted(self.stats().items()):
+            print(f"{host}: {host_stats['calls']} calls, "
+                  f"{host_stats['retries']} retries, "
+                  f"{host_stats['failures']} failures, "
+                  f"{host_stats['rejected']} rejected, "
+                  f"{host_stats['trips']} breaker trips, "
+                  f"{host_stats['seconds_lost']:.1f}s lost")
+
+
+def is_retryable(error: Exception):
+    """
+    :param error: an exception raised while fetching
+    :return: whether the fetch might succeed if tried again (connection
+             errors, timeouts, rate limiting and server errors)
+    """
+    if isinstance(error, RetryError):
+        return False
+    if isinstance(error, requests.HTTPError):
+        return error.response is not None and \
+            error.response.status_code in RETRYABLE_STATUSES
+    if isinstance(error, (requests.ConnectionError, requests.Timeout,
+                          ConnectionError, TimeoutError)):
+        return True
+    return any(error_type.__name__ in _RETRYABLE_EXCEPTION_NAMES
+               for error_type in type(error).__mro__)
+
+
+# Retrier shared by all scrapers
+RETRIER = Retrier()
@@ -0,0 +1,269 @@
+"""
+File: schema.py
+Description: Registry of the canonical columns every scraper produces, with
+             the compact dtype each one is stored as
+"""
+
+from instrumentation import INSTRUMENTATION
+
+
+# Values the scrapers use for "no value"
+MISSING_VALUES = ["-", ""]
+
+# Text columns
+_TEXT_COLUMNS = ["Name", "ID", "Player ID"]
+
+# Columns with few distinct values
+_CATEGORY_COLUMNS = ["Team", "Pos", "Opp"]
+
+# Columns of small whole numbers
+_SMALL_INT_COLUMNS = {"Week": "Int8"}
+
+# Stat columns. Projections are fractional, so stats are float64: float32
+# can't hold decimals like 34.8 exactly, and the error shows up in sums and
+# scores
+_STAT_COLUMNS = [
+    # Passing
+    "Pass Comp", "Pass Att", "Pass Comp Pct", "Pass Yd", "Pass Avg",
+    "Pass Td", "Pass Int", "Pass Rate", "Pass Sack", "Pass Sack Yd",
+    "Pass Long",
+    # Rushing
+    "Rush Att", "Rush Yd", "Rush Avg", "Rush Td", "Rush Long",
+    # Receiving
+    "Rec Tgt", "Rec", "Rec Pct", "Rec Yd", "Rec Td", "Rec Long", "Rec YPT",
+    "Rec YPR",
+    # Fumbles and misc. scoring
+    "Off Fum", "Off Fum Lost", "Fum Lost", "Fum Td", "2pt",
+    # Returns
+    "Ret Td", "KR", "KR Yd", "KR Avg", "KR Td", "KR Long", "PR", "PR Yd",
+    "PR Avg", "PR Td", "PR Long",
+    # Kicking and punting
+    "XP Made", "XP Att", "FG Made", "FG Att", "FG Pct", "FG Long",
+    "FG Made Total", "FG Made 0-19", "FG Made 20-29", "FG Made 30-39",
+    "FG Made 40-49", "FG Made 50+", "Punt", "Punt Yd", "Punt Avg",
+    "Punt Long",
+    # Individual defense
+    "Tkl Total", "Tkl Solo", "Tkl Ast", "Tkl Loss", "Tkl QBHit", "Def Tkl",
+    "Def Ast", "Def Sack", "Def Sack Yd", "Def QBHit", "Def PD", "Def Int",
+    "Def Int Yd", "Def Int Td", "Def Int Long", "Def FF", "Def FR",
+    "Def Fum Rec", "Def Fum Yd", "Def Fum Td", "Def Td", "Def TD",
+    # Team defense
+    "Def Saf", "Def 2pt Ret", "Def Pt", "Def Yd", "Def 1D", "Def Rush Att",
+    "Def Rush Yd", "Def Rush TD", "Def Pass Comp", "Def Pass Att",
+    "Def Pass Yd Gross", "Def Pass Yd Net", "Def Pass TD", "Def Fum",
+    "Def TO",
+    # Fantasy points
+    "FPT", "FPTPG",
+]
+
+# Stat columns that are whole numbers in a box score, as the nullable
+# integer dtype they are stored as for sources of actual stats (see
+# ACTUAL_SOURCES). Counts fit in Int8 and yards in Int16. Projections of the
+# same stats are fractional, so they stay float64, as do averages, rates and
+# sacks (which can be halves)
+_COUNT_COLUMNS = {
+    **{column: "Int8" for column in [
+        "Pass Comp", "Pass Att", "Pass Td", "Pass Int", "Pass Sack",
+        "Rush Att", "Rush Td", "Rec Tgt", "Rec", "Rec Td", "Off Fum",
+        "Off Fum Lost", "KR", "KR Td", "PR", "PR Td", "XP Made", "XP Att",
+        "FG Made", "FG Att", "Punt", "Tkl Total", "Tkl Solo", "Tkl Ast",
+        "Tkl Loss", "Tkl QBHit", "Def PD", "Def Int", "Def Int Td", "Def FF",
+        "Def Fum Rec", "Def Fum Td", "Def 1D", "Def Rush Att", "Def Rush TD",
+        "Def Pass Comp", "Def Pass Att", "Def Pass TD", "Def Fum",
+        "Def TO"]},
+    **{column: "Int16" for column in [
+        "Pass Yd", "Pass Sack Yd", "Pass Long", "Rush Yd", "Rush Long",
+        "Rec Yd", "Rec Long", "KR Yd", "KR Long", "PR Yd", "PR Long",
+        "Punt Yd", "Punt Long", "Def Int Yd", "Def Int Long", "Def Fum Yd",
+        "Def Sack Yd", "Def Yd", "Def Rush Yd", "Def Pass Yd Gross",
+        "Def Pass Yd Net"]},
+}
+
+# Canonical column -> dtype
+COLUMNS = {
+    **{column: "object" for column in _TEXT_COLUMNS},
+    **{column: "category" for column in _CATEGORY_COLUMNS},
+    **_SMALL_INT_COLUMNS,
+    **{column: "float64" for column in _STAT_COLUMNS},
+}
+
+# Sources whose stats are counted in games rather than projected
+ACTUAL_SOURCES = ["pro_football_reference"]
+
+# float_format the scrapers write CSVs with. Whole numbers are written
+# without a trailing ".0" (57, not 57.0) and decimals as they were parsed
+FLOAT_FORMAT = "%.15g"
+
+# Columns every row should have a value in
+REQUIRED_COLUMNS = ["Name"]
+
+# Number of example values kept per issue
+_NUM_EXAMPLES = 3
+
+
+def get_dtypes(source=None):
+    """
+    :param source: the source module's name
+    :return: dict mapping canonical column -> dtype for the source's output:
+             COLUMNS, with count stats as nullable integers if the source
+             reports actual stats
+    """
+    if source in ACTUAL_SOURCES:
+        return {**COLUMNS, **_COUNT_COLUMNS}
+    return COLUMNS
+
+
+@INSTRUMENTATION.stage("normalize")
+def apply_schema(df, context="", source=None):
+    """
+    Converts a parsed DataFrame's canonical columns to their registered
+    dtypes. Missing values ('-' and blanks) become nulls, and values that
+    can't be converted (e.g. text in a stat column) also become nulls and
+    are printed. Columns that aren't registered are left as they are. Use
+    check_schema to get the issues as a DataFrame
+
+    :param df: a DataFrame of canonical columns
+    :param context: what was parsed (e.g. "nfl position 0"), for messages
+    :param source: the source module's name (see get_dtypes)
+    :return: the typed DataFrame
+    """
+    return _convert(df, context=context, verbose=True, source=source)[0]
+
+
+def check_schema(df, source=None):
+    """
+    Finds missing and mis-typed values without changing df
+
+    :param df: a DataFrame of canonical columns
+    :param source: the source module's name (see get_dtypes)
+    :return: DataFrame of issues: the column, the issue ("missing",
+             "not <dtype>" or "column missing"), the number of values
+             affected and a few example values
+    """
+    return _convert(df, context="", verbose=False, source=source)[1]
+
+
+def _convert(df, context, verbose, source=None):
+    """
+    :param df: a DataFrame of canonical columns
+    :param context: what was parsed, for messages
+    :param verbose: whether to print mis-typed values
+    :param source: the source module's name (see get_dtypes)
+    :return: A tuple of the typed DataFrame and the DataFrame of issues
+    """
+    import numpy as np
+    import pandas as pd
+
+    dtypes = get_dtypes(source)
+
+    # Missing values are found for every column in one pass
+    # (columns already typed as nullable integers give nullable booleans)
+    is_missing = (df.isna() | df.isin(MISSING_VALUES)).to_numpy(dtype=bool)
+    typed_columns = [df.iloc[:, indx] for indx in range(len(df.columns))]
+    mistyped = {}  # column position -> (dtype, count, examples)
+
+    # Stat columns are converted together, and one at a time only if one of
+    # them has a value that isn't a plain number
+    float_positions = [indx for indx, column in enumerate(df.columns)
+                       if dtypes.get(column) == "float64"]
+    floats = None
+    if float_positions:
+        block = df.iloc[:, float_positions].to_numpy(dtype=object)
+        block[is_missing[:, float_positions]] = np.nan
+        try:
+            floats = block.astype("float64")
+        except (ValueError, TypeError):
+            floats = None
+    if floats is not None:
+        for block_indx, indx in enumerate(float_positions):
+            typed_columns[indx] = pd.Series(floats[:, block_indx],
+                                            index=df.index,
+                                            name=df.columns[indx])
+        float_positions = []
+
+    for indx, column in enumerate(df.columns):
+        dtype = dtypes.get(column)
+        if dtype is None or (dtype == "float64"
+                             and indx not in float_positions):
+            continue
+
+        values = df.iloc[:, indx]
+        column_missing = is_missing[:, indx]
+        if dtype == "object":
+            typed = values.where(~column_missing)
+        elif dtype == "category":
+            # Rebuild the categories, so that they are sorted and only hold
+            # values that are present
+            typed = values.astype(object).where(~column_missing).astype(
+                "category")
+        else:
+            typed = _to_number(values.where(~column_missing), dtype)
+            is_mistyped = typed.isna().to_numpy() & ~column_missing
+            if is_mistyped.any():
+                mistyped[indx] = (dtype, int(is_mistyped.sum()), list(
+                    values[is_mistyped].unique()[:_NUM_EXAMPLES]))
+        typed_columns[indx] = typed
+
+    issues = []
+    num_missing = is_missing.sum(axis=0)
+    for indx, column in enumerate(df.columns):
+        if column not in dtypes:
+            continue
+        if indx in mistyped:
+            dtype, num_mistyped, examples = mistyped[indx]
+            issues.append((column, f"not {dtype}", num_mistyped, examples))
+            if verbose:
+                print(f"{context}: {num_mistyped} values of {column} "
+                      f"aren't {dtype} (e.g. {examples}), treating them as "
+                      "missing")
+        if num_missing[indx] > 0:
+            issues.append((column, "missing", int(num_missing[indx]), []))
+
+    for column in REQUIRED_COLUMNS:
+        if column not in df.columns:
+            issues.append((column, "column missing", len(df), []))
+
+    if not typed_columns:
+        return df.copy(), _get_issues_df(issues)
+    typed_df = pd.concat(typed_columns, axis=1)
+    typed_df.columns = df.columns
+    return typed_df, _get_issues_df(issues)
+
+
+def _to_number(values, dtype):
+    """
+    :param values: a column of numbers or numeric strings, with nulls
+    :param dtype: "float64" or a nullable integer dtype (e.g. "Int8")
+    :return: the column as dtype. Values that aren't numbers (or, for
+             integer dtypes, whole numbers in range) become nulls
+    """
+    import numpy as np
+    import pandas as pd
+
+    numbers = pd.to_numeric(values, errors="coerce")
+
+    # Retry values with thousands separators (e.g. "1,024")
+    failed = numbers.isna() & values.notna()
+    if failed.any():
+        numbers[failed] = pd.to_numeric(
+            values[failed].astype(str).str.replace(",", "", regex=False),
+            errors="coerce")
+
+    if dtype == "float64":
+        return numbers.astype("float64")
+
+    info = np.iinfo(dtype.lower())
+    is_valid = (numbers % 1 == 0) & (numbers >= info.min) & \
+        (numbers <= info.max)
+    return numbers.where(is_valid).astype(dtype)
+
+
+def _get_issues_df(issues):
+    """
+    :param issues: list of (column, issue, count, examples) tuples
+    :return: the issues as a DataFrame
+    """
+    import pandas as pd
+
+    return pd.DataFrame(issues, columns=["column", "issue", "count",
+                                         "examples"])
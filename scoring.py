@@ -0,0 +1,288 @@
+"""
+File: scoring.py
+Description: Scores projections and historical stats under any number of
+             fantasy scoring systems at once
+"""
+
+import re
+
+import numpy as np
+import pandas as pd
+
+from player_ids import normalize_position
+
+
+# Sources name some stats differently. Points for a stat also apply to its
+# other names (a row only ever has one of them)
+STAT_ALIASES = {
+    "Fum Lost": ["Off Fum Lost"],
+    "Def Td": ["Def TD"],
+    "Def Fum Rec": ["Def FR"],
+    "FG Made": ["FG Made Total"],
+    "Ret Td": ["KR Td", "PR Td"],
+}
+
+# Columns of field goals made by distance, e.g. "FG Made 20-29"
+_FG_BUCKET_COLUMN = re.compile(r"^FG Made (\d+)(?:-(\d+)|\+)$")
+
+_STANDARD = {
+    # Points per unit of each stat, for every row
+    "points": {
+        "Pass Yd": 0.04, "Pass Td": 4, "Pass Int": -2, "2pt": 2,
+        "Rush Yd": 0.1, "Rush Td": 6,
+        "Rec": 0, "Rec Yd": 0.1, "Rec Td": 6,
+        "Ret Td": 6, "Fum Td": 6, "Fum Lost": -2,
+        "XP Made": 1, "FG Made": 3,
+    },
+    # Points overriding "points" for rows of a position
+    "position_points": {
+        "DST": {"Def Sack": 1, "Def Int": 2, "Def Fum Rec": 2, "Def Saf": 2,
+                "Def Td": 6, "Def 2pt Ret": 2},
+    },
+    # Points per field goal made by distance. Rows that only have total
+    # field goals made get "FG Made" points per field goal
+    "fg_buckets": {"0-39": 3, "40-49": 4, "50+": 5},
+    # Team defense points by points allowed
+    "points_allowed": {"0": 10, "1-6": 7, "7-13": 4, "14-20": 1, "21-27": 0,
+                       "28-34": -1, "35+": -4},
+}
+
+
+def extend_rule_set(rule_set, points=None, position_points=None,
+                    fg_buckets=None, points_allowed=None):
+    """
+    :param rule_set: the rule set to start from
+    :param points: points to add to or change in rule_set's "points"
+    :param position_points: dict mapping position -> points to add to or
+                            change in rule_set's "position_points"
+    :param fg_buckets: field goal buckets replacing rule_set's, if given
+    :param points_allowed: points allowed tiers replacing rule_set's, if
+                           given
+    :return: the new rule set
+    """
+    new_rule_set = {
+        "points": {**rule_set.get("points", {}), **(points or {})},
+        "position_points": {position: dict(position_rules) for
+                            position, position_rules in
+                            rule_set.get("position_points", {}).items()},
+        "fg_buckets": dict(fg_buckets if fg_buckets is not None
+                           else rule_set.get("fg_buckets", {})),
+        "points_allowed": dict(points_allowed if points_allowed is not None
+                               else rule_set.get("points_allowed", {})),
+    }
+    for position, position_rules in (position_points or {}).items():
+        new_rule_set["position_points"].setdefault(position, {}).update(
+            position_rules)
+    return new_rule_set
+
+
+RULE_SETS = {
+    "standard": _STANDARD,
+    "half_ppr": extend_rule_set(_STANDARD, points={"Rec": 0.5}),
+    "ppr": extend_rule_set(_STANDARD, points={"Rec": 1}),
+}
+RULE_SETS["idp"] = extend_rule_set(
+    RULE_SETS["ppr"],
+    points={"Tkl Solo": 1, "Tkl Ast": 0.5, "Tkl Loss": 1, "Def Sack": 2,
+            "Def Int": 3, "Def FF": 3, "Def Fum Rec": 2, "Def Td": 6,
+            "Def PD": 1, "Def Saf": 2})
+
+
+class ScoringEngine:
+    """
+    Turns each rule set into a weight vector over the stat columns, so that
+    scoring every row under every rule set is one matrix multiply per
+    position group (rows of positions with their own points, e.g. team
+    defenses, and all other rows).
+
+    A rule set is a dict with these (optional) keys:
+    - "points": dict mapping stat column -> points per unit
+    - "position_points": dict mapping position -> points overriding "points"
+      for rows of that position (e.g. sacks by a team defense)
+    - "fg_buckets": dict mapping a distance range ("0-39", "50+") -> points
+      per field goal made. A source's bucket column (e.g. "FG Made 20-29")
+      scores as the rule bucket containing its shortest distance
+    - "points_allowed": dict mapping a range of points allowed ("1-6",
+      "35+") -> points, for rows with "Def Pt"
+    """
+
+    def __init__(self, rule_sets=None):
+        """
+        :param rule_sets: dict mapping name -> rule set. Defaults to
+                          RULE_SETS
+        """
+        self.rule_sets = dict(RULE_SETS if rule_sets is None else rule_sets)
+        self.positions = sorted({position
+                                 for rule_set in self.rule_sets.values()
+                                 for position in
+                                 rule_set.get("position_points", {})})
+
+    def score(self, df, position_column="Pos"):
+        """
+        Scores every row under every rule set
+
+        :param df: DataFrame of stats (projections or PFR history). Stat
+                   columns may be numbers or strings with '-' for missing
+        :param position_column: the column of positions
+        :return: DataFrame with one column of points per rule set, aligned
+                 with df's index
+        """
+        features, feature_names = self._get_features(df)
+        # Missing stats score 0
+        features = np.nan_to_num(features, nan=0.0)
+
+        if position_column in df.columns:
+            # Normalize each distinct position once
+            codes, uniques = pd.factorize(df[position_column])
+            groups = np.array([normalize_position(position)
+                               for position in uniques] + [""])
+            positions = groups[codes]  # code -1 (missing) -> ""
+        else:
+            positions = np.full(len(df), "")
+
+        scores = np.zeros((len(df), len(self.rule_sets)))
+        remaining = np.ones(len(df), dtype=bool)
+        for position in self.positions:
+            is_position = positions == position
+            remaining &= ~is_position
+            if is_position.any():
+                weights = self._get_weights(df, feature_names, position)
+                scores[is_position] = features[is_position] @ weights
+        if remaining.any():
+            weights = self._get_weights(df, feature_names, None)
+            scores[remaining] = features[remaining] @ weights
+
+        return pd.DataFrame(scores, index=df.index,
+                            columns=list(self.rule_sets))
+
+    def _get_features(self, df):
+        """
+        Builds the stat matrix: each stat column used by any rule set, field
+        goal buckets, total field goals for rows without buckets, and one
+        indicator per points allowed tier
+
+        :param df: DataFrame of stats
+        :return: A tuple of the (rows x features) float64 array and the
+                 feature names
+        """
+        stat_columns = set()
+        for rule_set in self.rule_sets.values():
+            point_dicts = [rule_set.get("points", {})] + list(
+                rule_set.get("position_points", {}).values())
+            for points in point_dicts:
+                for stat in points:
+                    stat_columns.update([stat] + STAT_ALIASES.get(stat, []))
+
+        bucket_columns = [column for column in df.columns
+                          if _FG_BUCKET_COLUMN.match(str(column))]
+        stat_columns = [column for column in df.columns
+                        if column in stat_columns
+                        and column not in bucket_columns]
+
+        features = {column: _to_numeric(df[column])
+                    for column in stat_columns + bucket_columns}
+
+        # Total field goals only count for rows without bucketed field goals
+        if bucket_columns:
+            has_buckets = np.zeros(len(df), dtype=bool)
+            for column in bucket_columns:
+                has_buckets |= ~np.isnan(features[column])
+            for column in ["FG Made"] + STAT_ALIASES["FG Made"]:
+                if column in features:
+                    features[column] = np.where(has_buckets, np.nan,
+                                                features[column])
+
+        # Indicator of each points allowed tier
+        if "Def Pt" in df.columns:
+            points_allowed = _to_numeric(df["Def Pt"])
+            tiers = {tier for rule_set in self.rule_sets.values()
+                     for tier in rule_set.get("points_allowed", {})}
+            for tier in sorted(tiers):
+                low, high = parse_range(tier)
+                features[f"Def Pt {tier}"] = (
+                    (points_allowed >= low) & (points_allowed <= high)
+                ).astype("float64")
+
+        feature_names = list(features)
+        if len(feature_names) == 0:
+            return np.zeros((len(df), 0)), feature_names
+        return np.column_stack([features[name] for name in feature_names]), \
+            feature_names
+
+    def _get_weights(self, df, feature_names, position):
+        """
+        :param df: DataFrame of stats
+        :param feature_names: the names of the stat matrix's columns
+        :param position: the position group being scored, or None for rows
+                         without their own points
+        :return: (features x rule sets) array of points per unit
+        """
+        weights = np.zeros((len(feature_names), len(self.rule_sets)))
+        for rule_indx, rule_set in enumerate(self.rule_sets.values()):
+            points = dict(rule_set.get("points", {}))
+            if position is not None:
+                points.update(rule_set.get("position_points", {}).get(
+                    position, {}))
+            # Other names of a stat score the same
+            for stat, aliases in STAT_ALIASES.items():
+                if stat in points:
+                    for alias in aliases:
+                        points.setdefault(alias, points[stat])
+
+            fg_buckets = [(parse_range(bucket), bucket_points)
+                          for bucket, bucket_points in
+                          rule_set.get("fg_buckets", {}).items()]
+            points_allowed = rule_set.get("points_allowed", {})
+
+            for feature_indx, name in enumerate(feature_names):
+                bucket = _FG_BUCKET_COLUMN.match(name)
+                if bucket is not None:
+                    distance = int(bucket.group(1))
+                    weights[feature_indx, rule_indx] = next(
+                        (bucket_points for (low, high), bucket_points
+                         in fg_buckets if low <= distance <= high), 0)
+                elif name.startswith("Def Pt ") and \
+                        name[len("Def Pt "):] in points_allowed:
+                    weights[feature_indx, rule_indx] = \
+                        points_allowed[name[len("Def Pt "):]]
+                else:
+                    weights[feature_indx, rule_indx] = points.get(name, 0)
+        return weights
+
+
+def score(df, rule_sets=None, position_column="Pos"):
+    """
+    Scores every row of df under every rule set (see ScoringEngine)
+
+    :param df: DataFrame of stats
+    :param rule_sets: dict mapping name -> rule set. Defaults to RULE_SETS
+    :param position_column: the column of positions
+    :return: DataFrame with one column of points per rule set
+    """
+    return ScoringEngine(rule_sets).score(df, position_column=position_column)
+
+
+def parse_range(text):
+    """
+    :param text: a range such as "1-6", "50+" or "0"
+    :return: A tuple of the range's lowest and highest values (inclusive)
+    """
+    match = re.match(r"^\s*(\d+)\s*(?:(\+)|-\s*(\d+))?\s*$", str(text))
+    if match is None:
+        raise ValueError(f"Range is {text}, should look like 1-6, 50+ or 0")
+    low = int(match.group(1))
+    if match.group(2):
+        return low, np.inf
+    if match.group(3):
+        return low, int(match.group(3))
+    return low, low
+
+
+def _to_numeric(values):
+    """
+    :param values: a column of numbers or strings ('-' for missing)
+    :return: the column as a float64 array, NaN where missing
+    """
+    return pd.to_numeric(values.replace("-", np.nan),
+                         errors="coerce").to_numpy(dtype="float64",
+                                                   na_value=np.nan)
@@ -0,0 +1,159 @@
+"""
+File: scrape.py
+Description: Command-line entry point that scrapes one source's week, e.g.
+             python -m scrape --source nfl --year 2021 --week 3, or every
+             weekly source at once with --source all
+"""
+
+import argparse
+import asyncio
+import importlib
+import os
+import sys
+import threading
+
+# Source module -> whether it loads pages with a browser. Modules are only
+# imported once chosen, so a requests-only run never imports selenium
+SOURCES = {
+    "nfl": False,
+    "football_guys": False,
+    "sportsline": False,
+    "fantasy_data": True,
+    "pro_football_reference": True,
+}
+
+
+def scrape(source, year, week, browsers=1, use_async=False, playoffs=False,
+           parse_workers=None, resume=False):
+    """
+    Scrapes one source's week with the source's default save path. Browsers
+    are only started for sources that use them, and only once a page isn't
+    in the page cache
+
+    :param source: the source module's name, one of SOURCES
+    :param year: the year to be scraped
+    :param week: the week to be scraped
+    :param browsers: the number of browser sessions loading pages at once
+    :param use_async: whether to use the source's scrape_async (requests
+                      sources only)
+    :param playoffs: whether week is a playoff week (fantasy_data only)
+    :param parse_workers: the number of processes parsing games
+                          (pro_football_reference only)
+    :param resume: whether to skip work recorded as done in the checkpoint
+                   manifest, e.g. to continue a backfill (fantasy_data only)
+    :return: A DataFrame of each player's projected stats (or, for
+             pro_football_reference, actual stats)
+    """
+    if source not in SOURCES:
+        raise ValueError(f"Source is {source}, should be one of "
+                         f"{list(SOURCES)}")
+    module = importlib.import_module(source)
+    # Requests sources only import pandas once they parse a page, so it is
+    # loaded in the background while their first pages are fetched
+    threading.Thread(target=importlib.import_module, args=("pandas",),
+                     name="import-pandas", daemon=True).start()
+
+    if not SOURCES[source]:
+        if use_async:
+            return asyncio.run(module.scrape_async(year=year, week=week))
+        return module.scrape(year=year, week=week)
+
+    from webdriver_pool import (LazyWebDriver, WebDriverPool,
+                                create_chrome_driver)
+    with WebDriverPool(size=browsers,
+                       factory=lambda: LazyWebDriver(create_chrome_driver)
+                       ) as pool:
+        if source == "fantasy_data":
+            return module.scrape(year=year, week=week, webdriver=pool,
+                                 playoffs=playoffs, resume=resume)
+        return module.scrape(year=year, week=week, webdriver=pool,
+                             parse_workers=parse_workers)
+
+
+def get_parser():
+    """
+    :return: the argparse.ArgumentParser for the command line
+    """
+    parser = argparse.ArgumentParser(
+        prog="python -m scrape",
+        description="Scrapes one source's projections (or PFR's actual "
+                    "stats) for a week")
+    parser.add_argument("--source", required=True,
+                        choices=list(SOURCES) + ["all"],
+                        help="the source to scrape, or all to refresh every "
+                             "weekly source at once (see orchestrator)")
+    parser.add_argument("--year", required=True, type=int)
+    parser.add_argument("--week", required=True, type=int)
+    parser.add_argument("--browsers", type=int, default=1,
+                        help="browser sessions loading pages at once "
+                             "(fantasy_data and pro_football_reference)")
+    parser.add_argument("--async", dest="use_async", action="store_true",
+                        help="fetch pages concurrently (nfl, football_guys "
+                             "and sportsline)")
+    parser.add_argument("--playoffs", action="store_true",
+                        help="week is a playoff week (fantasy_data)")
+    parser.add_argument("--parse-workers", type=int, default=None,
+                        help="processes parsing games "
+                             "(pro_football_reference)")
+    parser.add_argument("--resume", action="store_true",
+                        help="skip weeks and pages already checkpointed, "
+                             "e.g. to continue a backfill (fantasy_data)")
+    parser.add_argument("--offline", action="store_true",
+                        help="only use pages in the page cache")
+    parser.add_argument("--snapshots", action="store_true",
+                        help="also record the scrape in the snapshot store, "
+                             "and only rewrite CSVs that changed (see "
+                             "snapshots)")
+    parser.add_argument("--columnar", action="store_true",
+                        help="also save the scrape as Parquet in the "
+                             "columnar store (see columnar_store, needs "
+                             "pyarrow)")
+    parser.add_argument("--profile", action="store_true",
+                        help="save a cProfile dump of the run to runs/")
+    return parser
+
+
+def main(args=None):
+    """
+    :param args: the command-line arguments. Defaults to sys.argv[1:]
+    :return: the exit status: 1 if a source of a refresh failed, otherwise 0
+    """
+    args = get_parser().parse_args(args)
+    if args.browsers < 1:
+        raise ValueError(f"--browsers is {args.browsers}, should be at "
+                         "least 1")
+
+    # Imported after parsing, so that --help and bad arguments are quick
+    from instrumentation import INSTRUMENTATION, report
+    from page_cache import CACHE
+    from columnar_store import STORE
+    from snapshots import SNAPSHOTS
+
+    CACHE.offline = args.offline
+    SNAPSHOTS.enabled = args.snapshots
+    STORE.enabled = args.columnar
+    INSTRUMENTATION.profile = args.profile
+    # Most sources save to the projections directory by default
+    os.makedirs("projections", exist_ok=True)
+
+    if args.source == "all":
+        import orchestrator
+        summary = orchestrator.refresh(year=args.year, week=args.week,
+                                       browsers=args.browsers,
+                                       use_async=args.use_async,
+                                       resume=args.resume)
+        orchestrator.report(summary)
+        print(f"Summary saved to {summary['path']}")
+        return 1 if summary["failed"] else 0
+
+    scrape(args.source, year=args.year, week=args.week,
+           browsers=args.browsers, use_async=args.use_async,
+           playoffs=args.playoffs, parse_workers=args.parse_workers,
+           resume=args.resume)
+    if INSTRUMENTATION.runs:
+        report(INSTRUMENTATION.runs[-1])
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
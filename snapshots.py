@@ -0,0 +1,463 @@
+"""
+File: snapshots.py
+Description: Store of every scrape of a (source, year, week) that only
+             persists the rows inserted, changed or deleted since the
+             previous scrape, and can rebuild any past scrape or list what
+             moved between two of them
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from datetime import datetime
+
+import schema
+
+
+# Columns identifying a player within a (source, year, week). "Player ID"
+# (see player_ids) is used alone if it's present. SportsLine's output keeps
+# the site's own headers
+_KEY_COLUMNS = ["Name", "ID", "Team", "Pos", "PLAYER", "TEAM", "POS"]
+
+# Change types listed by changes()
+INSERTED = "inserted"
+CHANGED = "changed"
+DELETED = "deleted"
+
+
+class SnapshotStore:
+    """
+    Keeps each scrape of a (source, year, week) as a snapshot. Every row is
+    hashed, and a snapshot only stores a new version of the rows whose hash
+    differs from the previous snapshot (or that are new), and marks the
+    versions of changed and deleted rows as ended. Each row version knows
+    the snapshot it appeared in and the one it was replaced in, so any
+    snapshot is rebuilt with one indexed query rather than by replaying
+    deltas.
+    """
+
+    def __init__(self, path="snapshots.sqlite", enabled=False):
+        """
+        :param path: the path of the SQLite database
+        :param enabled: if False, write() does nothing and save() only
+                        writes the CSV
+        """
+        self.path = path
+        self.enabled = enabled
+
+        self._lock = threading.Lock()
+        self._connection = None
+
+    def _get_connection(self):
+        """
+        Opens the database on first use. Must hold self._lock
+
+        :return: the sqlite3 connection
+        """
+        if self._connection is None:
+            connection = sqlite3.connect(self.path, check_same_thread=False)
+            connection.execute("PRAGMA journal_mode = WAL")
+            connection.execute("PRAGMA synchronous = NORMAL")
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS snapshots ("
+                "id INTEGER PRIMARY KEY AUTOINCREMENT, source TEXT NOT NULL, "
+                "year INTEGER NOT NULL, week INTEGER NOT NULL, "
+                "taken_at REAL NOT NULL, columns TEXT, rows INTEGER, "
+                "inserted INTEGER, changed INTEGER, deleted INTEGER)")
+            connection.execute(
+                "CREATE INDEX IF NOT EXISTS snapshots_partition "
+                "ON snapshots (source, year, week, taken_at)")
+            # A version is part of every snapshot from first_id up to (but
+            # not including) ended_id
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS versions ("
+                "source TEXT NOT NULL, year INTEGER NOT NULL, "
+                "week INTEGER NOT NULL, key TEXT NOT NULL, "
+                "first_id INTEGER NOT NULL, ended_id INTEGER, "
+                "hash TEXT NOT NULL, data TEXT NOT NULL)")
+            connection.execute(
+                "CREATE INDEX IF NOT EXISTS versions_current "
+                "ON versions (source, year, week, ended_id)")
+            connection.execute(
+                "CREATE INDEX IF NOT EXISTS versions_first "
+                "ON versions (source, year, week, first_id)")
+            # The CSV each scrape was last saved to by save(), with the
+            # snapshot it holds
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS outputs ("
+                "path TEXT PRIMARY KEY, source TEXT NOT NULL, "
+                "year INTEGER NOT NULL, week INTEGER NOT NULL, "
+                "snapshot_id INTEGER NOT NULL, checksum TEXT NOT NULL)")
+            connection.commit()
+            self._connection = connection
+        return self._connection
+
+    def write(self, df, source, year, week):
+        """
+        Records a scrape as a new snapshot, storing only its differences
+        from the previous snapshot of the same (source, year, week)
+
+        :param df: the DataFrame saved by the scraper
+        :param source: the source module's name
+        :param year: the year scraped
+        :param week: the week scraped
+        :return: dict of the snapshot's id and its number of rows, inserted
+                 rows, changed rows and deleted rows, or None if the store
+                 is disabled
+        """
+        if not self.enabled:
+            return None
+
+        partition = (source, int(year), int(week))
+        rows = _get_rows(df)
+
+        with self._lock:
+            connection = self._get_connection()
+            current = {key: (rowid, row_hash) for rowid, key, row_hash in
+                       connection.execute(
+                           "SELECT rowid, key, hash FROM versions WHERE "
+                           "source = ? AND year = ? AND week = ? AND "
+                           "ended_id IS NULL", partition)}
+
+            inserted = [key for key in rows if key not in current]
+            changed = [key for key in rows if key in current and
+                       rows[key][0] != current[key][1]]
+            deleted = [key for key in current if key not in rows]
+
+            with connection:  # one transaction
+                snapshot_id = connection.execute(
+                    "INSERT INTO snapshots (source, year, week, taken_at, "
+                    "columns, rows, inserted, changed, deleted) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    (*partition, time.time(),
+                     json.dumps([str(column) for column in df.columns]),
+                     len(rows), len(inserted), len(changed), len(deleted))
+                ).lastrowid
+                connection.executemany(
+                    "UPDATE versions SET ended_id = ? WHERE rowid = ?",
+                    [(snapshot_id, current[key][0])
+                     for key in changed + deleted])
+                connection.executemany(
+                    "INSERT INTO versions VALUES (?, ?, ?, ?, ?, NULL, ?, ?)",
+                    [(*partition, key, snapshot_id, *rows[key])
+                     for key in inserted + changed])
+
+        return {"id": snapshot_id, "rows": len(rows),
+                "inserted": len(inserted), "changed": len(changed),
+                "deleted": len(deleted)}
+
+    def save(self, df, path, source, year, week, **csv_kwargs):
+        """
+        Records a scrape as a snapshot (see write) and saves it to a CSV.
+        The CSV is only rewritten if the scrape changed since the snapshot
+        the CSV holds, or the CSV is missing or was changed by something
+        else. With the store disabled, the CSV is always written
+
+        :param df: the DataFrame saved by the scraper
+        :param path: the path of the CSV
+        :param source: the source module's name
+        :param year: the year scraped
+        :param week: the week scraped
+        :param csv_kwargs: arguments passed to df.to_csv (e.g. na_rep)
+        :return: the snapshot's counts (see write), with "csv_written"
+                 telling whether the CSV was written, or None if the store
+                 is disabled
+        """
+        snapshot = self.write(df, source=source, year=year, week=week)
+        if snapshot is None:
+            df.to_csv(path_or_buf=path, **csv_kwargs)
+            return None
+
+        key = os.path.abspath(path)
+        partition = (source, int(year), int(week))
+        if self._is_output_current(key, partition, snapshot["id"]):
+            print(f"{source} {year} week {week} is unchanged since {path} "
+                  "was saved, not rewriting it")
+            return {**snapshot, "csv_written": False}
+
+        df.to_csv(path_or_buf=path, **csv_kwargs)
+        checksum = _get_checksum(path)
+        with self._lock:
+            connection = self._get_connection()
+            with connection:
+                connection.execute(
+                    "INSERT OR REPLACE INTO outputs VALUES (?, ?, ?, ?, ?, ?)",
+                    (key, *partition, snapshot["id"], checksum))
+        return {**snapshot, "csv_written": True}
+
+    def _is_output_current(self, key, partition, snapshot_id):
+        """
+        :param key: the absolute path of a CSV
+        :param partition: tuple of the source, year and week
+        :param snapshot_id: the partition's latest snapshot
+        :return: whether the CSV was saved from a snapshot of the partition
+                 whose rows and columns are the same as snapshot_id's, and
+                 hasn't changed since
+        """
+        with self._lock:
+            connection = self._get_connection()
+            row = connection.execute(
+                "SELECT snapshot_id, checksum FROM outputs WHERE path = ? AND "
+                "source = ? AND year = ? AND week = ?",
+                (key, *partition)).fetchone()
+            if row is None:
+                return False
+            saved_id, checksum = row
+
+            # Every snapshot since the saved one must have left it as it was
+            snapshots = connection.execute(
+                "SELECT id, columns, inserted + changed + deleted "
+                "FROM snapshots WHERE source = ? AND year = ? AND "
+                "week = ? AND id >= ? AND id <= ? ORDER BY id",
+                (*partition, saved_id, snapshot_id)).fetchall()
+        if len(snapshots) < 2 or snapshots[0][0] != saved_id:
+            return False
+        if any(columns != snapshots[0][1] or num_changes > 0
+               for _, columns, num_changes in snapshots[1:]):
+            return False
+
+        try:
+            return _get_checksum(key) == checksum
+        except FileNotFoundError:
+            return False
+
+    def get_snapshots(self, source=None, year=None, week=None):
+        """
+        :param source: if given, only this source's snapshots are listed
+        :param year: if given, only this year's snapshots are listed
+        :param week: if given, only this week's snapshots are listed
+        :return: DataFrame of the snapshots (oldest first): their ids,
+                 partitions, when they were taken and their number of rows,
+                 inserted rows, changed rows and deleted rows
+        """
+        import pandas as pd
+
+        conditions, params = _get_conditions(source=source, year=year,
+                                             week=week)
+        with self._lock:
+            df = pd.read_sql_query(
+                "SELECT id, source, year, week, taken_at, rows, inserted, "
+                "changed, deleted FROM snapshots" + conditions +
+                " ORDER BY taken_at, id", self._get_connection(),
+                params=params)
+        df["taken_at"] = pd.to_datetime(df["taken_at"].map(
+            datetime.fromtimestamp))
+        return df
+
+    def load(self, source, year, week, snapshot=None):
+        """
+        Rebuilds a snapshot, typed with schema.apply_schema. Rows come back
+        in the order they were first stored, so a row that changed comes
+        after the rows that didn't
+
+        :param source: the source module's name
+        :param year: the year scraped
+        :param week: the week scraped
+        :param snapshot: the snapshot's id, or a datetime to get the latest
+                         snapshot taken at or before it. Defaults to the
+                         latest snapshot
+        :return: the snapshot's DataFrame (with no rows if there was no
+                 snapshot yet)
+        """
+        import pandas as pd
+
+        snapshot_id, columns = self._resolve(source, year, week, snapshot)
+        rows = self._get_snapshot_rows(source, year, week, snapshot_id)
+        df = pd.DataFrame([data for _, data in sorted(rows.values())],
+                          columns=columns)
+        return schema.apply_schema(df, context=f"{source} {year} week {week} "
+                                               f"snapshot {snapshot_id}",
+                                   source=source)
+
+    def changes(self, year, week, since, until=None, sources=None):
+        """
+        Lists what moved between two snapshots of each source's week (e.g.
+        since this morning's scrape)
+
+        :param year: the year
+        :param week: the week
+        :param since: a datetime or a snapshot id (meaning the time it was
+                      taken). Each source's latest snapshot taken at or
+                      before it is compared
+        :param until: a datetime or a snapshot id, like since. Defaults to
+                      each source's latest snapshot
+        :param sources: the sources to compare (all sources with snapshots
+                        of the week if None)
+        :return: DataFrame with a row per changed value: the source, the
+                 player's key, the change (INSERTED, CHANGED or DELETED),
+                 and for changed rows the column and its values before and
+                 after
+        """
+        import pandas as pd
+
+        if sources is None:
+            sources = list(self.get_snapshots(year=year, week=week)[
+                "source"].unique())
+
+        since = self._get_time(since)
+        until = self._get_time(until)
+
+        changes = []
+        for source in sources:
+            before_id, _ = self._resolve(source, year, week, taken_at=since)
+            after_id, _ = self._resolve(source, year, week, taken_at=until)
+            before = self._get_snapshot_rows(source, year, week, before_id)
+            after = self._get_snapshot_rows(source, year, week, after_id)
+
+            for key, (_, data) in after.items():
+                if key not in before:
+                    changes.append((source, key, INSERTED, None, None, None))
+                    continue
+                old_data = before[key][1]
+                for column in dict.fromkeys(list(old_data) + list(data)):
+                    if old_data.get(column) != data.get(column):
+                        changes.append((source, key, CHANGED, column,
+                                        old_data.get(column),
+                                        data.get(column)))
+            for key in before:
+                if key not in after:
+                    changes.append((source, key, DELETED, None, None, None))
+
+        return pd.DataFrame(changes, columns=["source", "key", "change",
+                                              "column", "before", "after"])
+
+    def _get_time(self, snapshot):
+        """
+        :param snapshot: a snapshot id, a datetime, or None
+        :return: the time.time() value of the datetime or of when the
+                 snapshot was taken, or None
+        """
+        if snapshot is None:
+            return None
+        if isinstance(snapshot, datetime):
+            return snapshot.timestamp()
+        with self._lock:
+            row = self._get_connection().execute(
+                "SELECT taken_at FROM snapshots WHERE id = ?",
+                (int(snapshot),)).fetchone()
+        if row is None:
+            raise ValueError(f"There is no snapshot {snapshot}")
+        return row[0]
+
+    def _resolve(self, source, year, week, snapshot=None, taken_at=None):
+        """
+        :param source: the source module's name
+        :param year: the year scraped
+        :param week: the week scraped
+        :param snapshot: a snapshot id, a datetime, or None for the latest
+        :param taken_at: if given, the latest snapshot taken at or before
+                         this time.time() value is used instead
+        :return: A tuple of the snapshot's id and columns, or (None, []) if
+                 there is no such snapshot yet
+        """
+        if isinstance(snapshot, datetime):
+            snapshot, taken_at = None, snapshot.timestamp()
+
+        query = "SELECT id, columns FROM snapshots WHERE source = ? AND " \
+                "year = ? AND week = ?"
+        params = [source, int(year), int(week)]
+        if taken_at is not None:
+            query += " AND taken_at <= ?"
+            params.append(taken_at)
+        elif snapshot is not None:
+            query += " AND id = ?"
+            params.append(int(snapshot))
+
+        with self._lock:
+            row = self._get_connection().execute(
+                query + " ORDER BY taken_at DESC, id DESC LIMIT 1", params
+            ).fetchone()
+        if row is None:
+            if snapshot is not None:
+                raise ValueError(f"There is no snapshot {snapshot} of "
+                                 f"{source} {year} week {week}")
+            return None, []
+        return row[0], json.loads(row[1])
+
+    def _get_snapshot_rows(self, source, year, week, snapshot_id):
+        """
+        :param source: the source module's name
+        :param year: the year scraped
+        :param week: the week scraped
+        :param snapshot_id: the snapshot's id, or None for no rows
+        :return: dict mapping each row's key to a tuple of the snapshot its
+                 version appeared in and its data
+        """
+        if snapshot_id is None:
+            return {}
+        with self._lock:
+            rows = self._get_connection().execute(
+                "SELECT key, rowid, data FROM versions WHERE source = ? "
+                "AND year = ? AND week = ? AND first_id <= ? AND "
+                "(ended_id IS NULL OR ended_id > ?)",
+                (source, int(year), int(week), snapshot_id, snapshot_id)
+            ).fetchall()
+        # rowid orders the versions by when they were stored
+        return {key: (rowid, json.loads(data)) for key, rowid, data in rows}
+
+
+def _get_rows(df):
+    """
+    :param df: a scraper's DataFrame
+    :return: dict mapping each row's key to a tuple of its hash and its data
+             (JSON of its non-missing values by column)
+    """
+    import pandas as pd
+
+    if "Player ID" in df.columns:
+        key_columns = ["Player ID"]
+    else:
+        key_columns = [column for column in _KEY_COLUMNS
+                       if column in df.columns]
+    if not key_columns:
+        raise ValueError(f"Can't identify players without any of "
+                         f"{['Player ID'] + _KEY_COLUMNS} columns")
+
+    columns = [str(column) for column in df.columns]
+    keys = df[key_columns].astype(object).where(df[key_columns].notna(), "") \
+        .astype(str).agg("|".join, axis=1)
+    # Rows with the same key are told apart by their order
+    occurrence = keys.groupby(keys).cumcount()
+    keys = keys.where(occurrence == 0, keys + "#" + occurrence.astype(str))
+
+    rows = {}
+    values = df.astype(object).to_numpy()
+    for key, row_values in zip(keys, values):
+        data = json.dumps({column: value for column, value in
+                           zip(columns, row_values) if not pd.isna(value)},
+                          separators=(",", ":"), default=str)
+        rows[key] = (hashlib.sha1(data.encode("utf-8")).hexdigest(), data)
+    return rows
+
+
+def _get_checksum(path):
+    """
+    :param path: the path of a file
+    :return: the SHA-256 hash of the file's contents
+    """
+    file_hash = hashlib.sha256()
+    with open(path, "rb") as file:
+        for chunk in iter(lambda: file.read(1024 * 1024), b""):
+            file_hash.update(chunk)
+    return file_hash.hexdigest()
+
+
+def _get_conditions(**values):
+    """
+    :param values: column -> value to filter on (None means no filter)
+    :return: A tuple of the WHERE clause (empty if there are no filters)
+             and its parameters
+    """
+    conditions = [f"{column} = ?" for column, value in values.items()
+                  if value is not None]
+    params = [value for value in values.values() if value is not None]
+    if not conditions:
+        return "", []
+    return " WHERE " + " AND ".join(conditions), params
+
+
+# Snapshot store shared by all scrapers
+SNAPSHOTS = SnapshotStore()
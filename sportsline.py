@@ -3,10 +3,19 @@ File: sportsline.py
 Description: Downloads Fantasy Football projections from SportsLine
 """
 
-import requests
-import pandas as pd
-import util_scripts
-from bs4 import BeautifulSoup
+import html_tables
+from instrumentation import INSTRUMENTATION
+from columnar_store import STORE
+from page_cache import CACHE
+from snapshots import SNAPSHOTS
+
+
+URL = 'https://www.sportsline.com/nfl/expert-projections/simulation/'
+
+# SportsLine's names for the columns every source's stored output shares.
+# The CSV keeps SportsLine's headers
+STORE_LABELS = {"PLAYER": "Name", "POS": "Pos", "TEAM": "Team"}
+
 
 def scrape(year, week, save_location="projections_{year}_{week}_sportsline.csv"):
     """
@@ -19,23 +28,62 @@ def scrape(year, week, save_location="projections_{year}_{week}_sportsline.csv")
     :return: A DataFrame of each player's projected stats
     """ 
     
-    # Read page
-    url = 'https://www.sportsline.com/nfl/expert-projections/simulation/'
+    with INSTRUMENTATION.run("sportsline", year=year, week=week):
+        # Read page
+        html = CACHE.fetch(URL, source="sportsline")
 
-    page = requests.get(url)
-    soup = BeautifulSoup(page.text, 'html.parser')
+        return _parse_page(html=html, year=year, week=week,
+                           save_location=save_location)
+
+
+async def scrape_async(year, week,
+                       save_location="projections_{year}_{week}_sportsline.csv"):
+    """
+    coroutine version of scrape()
+
+    :param year: the current year
+    :param week: the current week
+    :return: A DataFrame of each player's projected stats
+    """
+
+    with INSTRUMENTATION.run("sportsline", year=year, week=week):
+        # Read page
+        html = await CACHE.fetch_async(URL, source="sportsline")
+
+        return _parse_page(html=html, year=year, week=week,
+                           save_location=save_location)
+
+
+def _parse_page(html, year, week, save_location):
+    """
+    parses the projections page and saves it to a CSV
+
+    :param html: the page's HTML
+    :param year: the current year
+    :param week: the current week
+    :param save_location: the path to save to
+    :return: A DataFrame of each player's projected stats
+    """
+
+    with INSTRUMENTATION.stage("parse"):
+        root = html_tables.parse_html(html)
+
+        tables = html_tables.find_all(root, "table")
+
+        if len(tables) != 1:
+            raise Exception("Expected one table, page has {num} tables".format(num=len(tables)))
+
+        # Convert to DataFrame
+        df = html_tables.read_table(tables[0], header_style="pandas",
+                                    convert_numeric=True)
 
-    tables = soup.find_all("table")
-    
-    if len(tables) != 1:
-        raise Exception("Expected one table, page has {num} tables".format(num=len(tables)))
-    
-    # Convert to DataFrame
-    html_table = str(tables[0])
-    
-    df = pd.read_html(html_table)[0]
-    
     # Save to CSV
-    df.to_csv(path_or_buf=save_location.format(year=year, week=week), index=False, na_rep='-')
-    
-    return df
\ No newline at end of file
+    with INSTRUMENTATION.stage("write"):
+        SNAPSHOTS.save(df, save_location.format(year=year, week=week),
+                       source="sportsline", year=year, week=week,
+                       index=False, na_rep='-')
+        STORE.write(df.rename(columns=STORE_LABELS), source="sportsline",
+                    year=year, week=week)
+    INSTRUMENTATION.count("rows", len(df))
+
+    return df
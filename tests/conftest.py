@@ -0,0 +1,10 @@
+"""
+File: conftest.py
+Description: Lets the tests import the repository's top-level modules
+"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(
+    os.path.abspath(__file__))))
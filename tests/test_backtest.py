@@ -0,0 +1,99 @@
+"""
+File: test_backtest.py
+Description: Tests for backtest
+"""
+
+import numpy as np
+import pandas as pd
+import pandas.testing as pdt
+import pytest
+
+import schema
+from backtest import Backtester
+
+
+def _get_week(week):
+    """
+    :param week: the week
+    :return: A tuple of two sources' projections and the actual stats for
+             the week
+    """
+    actuals = pd.DataFrame({
+        "Name": ["Josh Allen", "Jalen Hurts", "Joe Burrow",
+                 "Tony Pollard"],
+        "Pos": ["QB", "QB", "QB", "RB"],
+        "Pass Yd": [300 - 10 * week, 250, 200 + 10 * week, "-"],
+        "Rush Yd": [20, 40, 5, 90],
+    })
+    projections = []
+    for source, pass_yards in [("nfl", [280, 240, 260]),
+                               ("sportsline", [310, 200, 220])]:
+        projections.append(pd.DataFrame({
+            "source": source,
+            # Other sources' spellings join on the normalized name
+            "Name": ["Josh Allen", "Jalen Hurts", "Joe Burrow Jr.",
+                     "Tony Pollard"],
+            "Pos": ["QB", "QB", "QB", "RB"],
+            "Pass Yd": pass_yards + ["-"],
+            "Rush Yd": [25, 35, 10, 70 + week],
+        }))
+    return pd.concat(projections, ignore_index=True), actuals
+
+
+def test_add_week_matches_compute():
+    projections, actuals = [], []
+    incremental = Backtester(stats=["Pass Yd"])
+    for week in [1, 2, 3]:
+        week_projections, week_actuals = _get_week(week)
+        incremental.add_week(week_projections, week_actuals, year=2023,
+                             week=week)
+        projections.append(week_projections.assign(year=2023, week=week))
+        actuals.append(week_actuals.assign(year=2023, week=week))
+    # Replacing a week leaves the aggregates as they were
+    incremental.add_week(*_get_week(2), year=2023, week=2)
+
+    full = Backtester(stats=["Pass Yd"]).compute(
+        pd.concat(projections, ignore_index=True),
+        pd.concat(actuals, ignore_index=True))
+    for by in [("source",), ("source", "Pos"), ("week",)]:
+        pdt.assert_frame_equal(incremental.summary(by=by),
+                               full.summary(by=by))
+
+
+def test_summary_metrics():
+    projections, actuals = _get_week(1)
+    summary = Backtester(stats=["Pass Yd"]).add_week(
+        projections, actuals, year=2023, week=1).summary()
+    nfl = summary[(summary["source"] == "nfl") &
+                  (summary["stat"] == "Pass Yd")].iloc[0]
+
+    errors = np.array([280 - 290, 240 - 250, 260 - 210])
+    assert nfl["Player-Weeks"] == 3
+    assert nfl["MAE"] == pytest.approx(np.abs(errors).mean())
+    assert nfl["RMSE"] == pytest.approx(np.sqrt((errors ** 2).mean()))
+    assert nfl["Bias"] == pytest.approx(errors.mean())
+    # Ranks 3, 1, 2 against 3, 2, 1
+    assert nfl["Rank Corr"] == pytest.approx(0.5)
+
+
+def test_empty_weeks():
+    projections, actuals = _get_week(1)
+    backtester = Backtester().add_week(projections, actuals.iloc[:0],
+                                       year=2023, week=1)
+    assert len(backtester.summary()) == 0
+
+    backtester.add_week(projections, actuals, year=2023, week=2)
+    assert backtester.summary()["Player-Weeks"].tolist() == [4, 4]
+
+
+def test_typed_actuals():
+    projections, actuals = _get_week(1)
+    # PFR's counts and yards are nullable integers
+    typed = schema.apply_schema(actuals, source="pro_football_reference")
+    assert str(typed["Pass Yd"].dtype) == "Int16"
+
+    summary = Backtester(stats=["Pass Yd", "Rush Yd"]).add_week(
+        projections, actuals, year=2023, week=1).summary()
+    pdt.assert_frame_equal(
+        Backtester(stats=["Pass Yd", "Rush Yd"]).add_week(
+            projections, typed, year=2023, week=1).summary(), summary)
@@ -0,0 +1,147 @@
+"""
+File: test_checkpoint.py
+Description: Tests the checkpoint manifest, and that fantasy_data resumes
+             from (or, without resume, redoes) checkpointed pages
+"""
+
+import pandas as pd
+import pandas.testing as pdt
+import pytest
+
+import fantasy_data
+from checkpoint import CheckpointManifest
+from instrumentation import INSTRUMENTATION
+
+
+@pytest.fixture
+def manifest(tmp_path):
+    return CheckpointManifest(directory=str(tmp_path / "checkpoints"))
+
+
+def _get_page_df(value):
+    return pd.DataFrame({"Name": ["Player A", "Player B"],
+                         "Pass Yd": [value, value + 1.5]})
+
+
+def test_save_and_load_page(manifest):
+    assert manifest.load_page("fantasy_data", 2021, 1, 2, 0) is None
+
+    df = _get_page_df(200.0)
+    manifest.save_page("fantasy_data", 2021, 1, 2, 0, df)
+
+    pdt.assert_frame_equal(manifest.load_page("fantasy_data", 2021, 1, 2, 0),
+                           df)
+    # Other pages and weeks aren't done
+    assert manifest.load_page("fantasy_data", 2021, 1, 2, 1) is None
+    assert manifest.load_page("fantasy_data", 2021, 2, 2, 0) is None
+    assert manifest.count_pages("fantasy_data", 2021, 1) == 1
+
+
+def test_page_with_bad_checksum_is_redone(manifest):
+    manifest.save_page("fantasy_data", 2021, 1, 2, 0, _get_page_df(200.0))
+    path = manifest._get_entry("fantasy_data", 2021, 1, "2", "0")["path"]
+
+    with open(path, "ab") as page_file:
+        page_file.write(b"corrupt")
+
+    assert manifest.load_page("fantasy_data", 2021, 1, 2, 0) is None
+    # The entry is dropped, not just skipped
+    assert manifest.count_pages("fantasy_data", 2021, 1) == 0
+
+
+def test_partition_complete_until_csv_changes(manifest, tmp_path):
+    csv_path = str(tmp_path / "projections_2021_1.csv")
+    assert not manifest.is_partition_complete("fantasy_data", 2021, 1,
+                                              csv_path)
+
+    _get_page_df(200.0).to_csv(csv_path, index=False)
+    manifest.complete_partition("fantasy_data", 2021, 1, csv_path, rows=2)
+
+    assert manifest.is_partition_complete("fantasy_data", 2021, 1, csv_path)
+    # Saved somewhere else
+    assert not manifest.is_partition_complete(
+        "fantasy_data", 2021, 1, str(tmp_path / "other.csv"))
+
+    # Editing the CSV changes its checksum
+    _get_page_df(250.0).to_csv(csv_path, index=False)
+    assert not manifest.is_partition_complete("fantasy_data", 2021, 1,
+                                              csv_path)
+
+    # Writing the original contents back doesn't bring the entry back
+    _get_page_df(200.0).to_csv(csv_path, index=False)
+    assert not manifest.is_partition_complete("fantasy_data", 2021, 1,
+                                              csv_path)
+
+
+def test_disabled_manifest_records_nothing(tmp_path):
+    manifest = CheckpointManifest(directory=str(tmp_path), enabled=False)
+    manifest.save_page("fantasy_data", 2021, 1, 2, 0, _get_page_df(200.0))
+    assert manifest.load_page("fantasy_data", 2021, 1, 2, 0) is None
+    assert manifest.count_pages("fantasy_data", 2021, 1) == 0
+
+
+def _get_saved_page_df():
+    return pd.DataFrame({"Name": ["Saved"], "Team": ["GB"], "Pos": ["QB"],
+                         "Pass Yd": [99.0]})
+
+
+@pytest.fixture
+def scraped(tmp_path, monkeypatch, manifest):
+    """
+    Patches fantasy_data to use a temporary manifest and fake pages
+
+    :return: list of the (pos_indx, team_indx) of each page scraped
+    """
+    monkeypatch.setattr(INSTRUMENTATION, "directory", str(tmp_path))
+    monkeypatch.setattr(fantasy_data, "MANIFEST", manifest)
+
+    scraped = []
+
+    def get_team_position_df(year, week, playoffs, team_indx, pos_indx,
+                             webdriver):
+        scraped.append((pos_indx, team_indx))
+        return pd.DataFrame({"Name": [f"Player {pos_indx} {team_indx}"],
+                             "Team": ["GB"], "Pos": ["QB"],
+                             "Pass Yd": [1.0]})
+
+    monkeypatch.setattr(fantasy_data, "_get_team_position_df",
+                        get_team_position_df)
+    return scraped
+
+
+def test_resume_skips_checkpointed_pages(tmp_path, manifest, scraped):
+    save_path = str(tmp_path / "{year}_{week}.csv")
+    manifest.save_page("fantasy_data", 2021, 1, 2, 0, _get_saved_page_df())
+
+    df = fantasy_data.scrape(2021, 1, webdriver=None, save_path=save_path,
+                             resume=True)
+
+    assert (2, 0) not in scraped
+    assert len(scraped) == 9 * 32 - 1
+    assert "Saved" in df["Name"].tolist()
+
+    # The whole week is done now
+    scraped.clear()
+    fantasy_data.scrape(2021, 1, webdriver=None, save_path=save_path,
+                        resume=True)
+    assert scraped == []
+
+
+def test_without_resume_pages_are_redone_and_overwritten(tmp_path, manifest,
+                                                         scraped):
+    save_path = str(tmp_path / "{year}_{week}.csv")
+    csv_path = str(tmp_path / "2021_1.csv")
+    manifest.save_page("fantasy_data", 2021, 1, 2, 0, _get_saved_page_df())
+    _get_saved_page_df().to_csv(csv_path, index=False)
+    manifest.complete_partition("fantasy_data", 2021, 1, csv_path, rows=1)
+
+    df = fantasy_data.scrape(2021, 1, webdriver=None, save_path=save_path,
+                             resume=False)
+
+    assert len(scraped) == 9 * 32
+    assert "Saved" not in df["Name"].tolist()
+    # The earlier page's checkpoint is replaced by the new one
+    assert manifest.load_page("fantasy_data", 2021, 1, 2, 0)["Name"].tolist() \
+        == ["Player 2 0"]
+    assert "Saved" not in pd.read_csv(csv_path)["Name"].tolist()
+    assert manifest.is_partition_complete("fantasy_data", 2021, 1, csv_path)
@@ -0,0 +1,136 @@
+"""
+File: test_columnar_store.py
+Description: Tests for columnar_store
+"""
+
+import os
+
+import pandas as pd
+import pytest
+
+import benchmark
+import scrape
+import sportsline
+from columnar_store import STORE, ColumnarStore
+from instrumentation import INSTRUMENTATION
+from page_cache import CACHE
+from snapshots import SNAPSHOTS
+
+pytest.importorskip("pyarrow")
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = ColumnarStore(directory=str(tmp_path / "columnar"), enabled=True)
+    store.write(pd.DataFrame({"Name": ["Aaron Rodgers", "Davante Adams"],
+                              "Pos": ["QB", "WR"], "Team": ["GB", "GB"],
+                              "Pass Yd": ["280.5", "-"], "FPT": [21.0, 15.5]}),
+                source="nfl", year=2021, week=1)
+    store.write(pd.DataFrame({"Name": ["Aaron Rodgers"], "Pos": ["QB"],
+                              "Team": ["GB"], "Pass Yd": ["301"],
+                              "FPT": [23.0]}),
+                source="nfl", year=2021, week=2)
+    store.write(pd.DataFrame({"Name": ["Tom Brady", "Mike Evans"],
+                              "Pos": ["QB", "WR"], "Team": ["TB", "TB"],
+                              "Rec Yd": ["", "80"]}),
+                source="football_guys", year=2021, week=1)
+    return store
+
+
+def test_partition_layout(store, tmp_path):
+    directory = tmp_path / "columnar"
+    assert sorted(
+        os.path.relpath(os.path.join(root, name), directory)
+        for root, _, names in os.walk(directory) for name in names) == [
+        os.path.join("source=football_guys", "year=2021", "week=1",
+                     "data.parquet"),
+        os.path.join("source=nfl", "year=2021", "week=1", "data.parquet"),
+        os.path.join("source=nfl", "year=2021", "week=2", "data.parquet")]
+
+
+def test_write_types_columns(store):
+    df = store.load(sources=["nfl"], weeks=[1])
+    # '-' is missing, and numeric text is stored as numbers
+    assert df["Pass Yd"].dtype == "float64"
+    assert df["Pass Yd"].isna().tolist() == [False, True]
+
+
+def test_disabled_store_writes_nothing(tmp_path):
+    store = ColumnarStore(directory=str(tmp_path / "columnar"))
+    assert store.write(pd.DataFrame({"Name": ["A"]}), source="nfl",
+                       year=2021, week=1) is None
+    assert not (tmp_path / "columnar").exists()
+
+
+def test_load_prunes_partitions_and_columns(store, tmp_path):
+    # Files of other partitions aren't opened
+    other = tmp_path / "columnar" / "source=football_guys" / "year=2021" / \
+        "week=1" / "data.parquet"
+    other.write_bytes(b"not parquet")
+
+    df = store.load(sources=["nfl"], years=[2021], columns=["Name", "FPT"])
+    assert list(df.columns) == ["source", "year", "week", "Name", "FPT"]
+    assert sorted(df["week"].tolist()) == [1, 1, 2]
+
+    df = store.load(sources=["nfl"], weeks=[2], columns=["FPT"])
+    assert df["FPT"].tolist() == [23.0]
+
+    with pytest.raises(ValueError):
+        store.load(sources=["nfl"], columns=["Def Sack"])
+
+
+def test_load_unions_sources_columns(store):
+    df = store.load()
+    assert len(df) == 5
+    assert {"Pass Yd", "Rec Yd", "FPT"} <= set(df.columns)
+    assert df.loc[df["source"] == "football_guys", "FPT"].isna().all()
+
+
+def test_load_filters_positions(store):
+    df = store.load(positions=["QB"], columns=["Name"])
+    assert sorted(df["Name"]) == ["Aaron Rodgers", "Aaron Rodgers",
+                                  "Tom Brady"]
+
+    assert len(store.load(positions=["K"])) == 0
+
+
+def test_empty_store(tmp_path):
+    store = ColumnarStore(directory=str(tmp_path / "missing"))
+    assert list(store.load().columns) == ["source", "year", "week"]
+
+
+def test_sportsline_columns_are_standardized(tmp_path, monkeypatch):
+    monkeypatch.setattr(INSTRUMENTATION, "directory", str(tmp_path))
+    monkeypatch.setattr(STORE, "directory", str(tmp_path / "columnar"))
+    monkeypatch.setattr(STORE, "enabled", True)
+
+    df = sportsline._parse_page(benchmark.get_sportsline_page(20), 2021, 1,
+                                str(tmp_path / "sportsline.csv"))
+
+    # The CSV keeps SportsLine's headers
+    assert list(pd.read_csv(tmp_path / "sportsline.csv").columns[:3]) == \
+        ["PLAYER", "POS", "TEAM"]
+    loaded = STORE.load(sources=["sportsline"], positions=["QB"],
+                        columns=["Name", "Pos", "Team"])
+    assert len(loaded) == (df["POS"] == "QB").sum() > 0
+    assert set(loaded["Pos"]) == {"QB"}
+
+
+def test_columnar_flag(tmp_path, monkeypatch):
+    cache = benchmark.get_synthetic_cache(str(tmp_path / "page_cache"))
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(sportsline, "CACHE", cache)
+    monkeypatch.setattr(INSTRUMENTATION, "directory", str(tmp_path / "runs"))
+    monkeypatch.setattr(STORE, "directory", str(tmp_path / "columnar"))
+    # Restored after the test, since main() sets them
+    for singleton, attribute in [(STORE, "enabled"), (SNAPSHOTS, "enabled"),
+                                 (CACHE, "offline"),
+                                 (INSTRUMENTATION, "profile")]:
+        monkeypatch.setattr(singleton, attribute, getattr(singleton,
+                                                          attribute))
+
+    scrape.main(["--source", "sportsline", "--year", "2021", "--week", "1",
+                 "--offline", "--columnar"])
+
+    assert STORE.enabled
+    assert len(STORE.load(sources=["sportsline"])) == 300
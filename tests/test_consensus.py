@@ -0,0 +1,115 @@
+"""
+File: test_consensus.py
+Description: Tests for consensus
+"""
+
+import numpy as np
+import pandas as pd
+import pandas.testing as pdt
+
+from consensus import ConsensusEngine, _get_weighted_stats
+
+
+def _get_projections():
+    """
+    :return: DataFrame of three sources' projections over two weeks. One
+             source skips a player and one source has a missing stat
+    """
+    rows = []
+    for week in [1, 2]:
+        for source, offset in [("nfl", 0.0), ("sportsline", 1.5),
+                               ("football_guys", -2.0)]:
+            for name, pos, points, yards in [("Josh Allen", "QB", 24, 260),
+                                             ("Tony Pollard", "RB", 14, 80),
+                                             ("Evan McPherson", "K", 8, "-")]:
+                if source == "sportsline" and name == "Tony Pollard":
+                    continue
+                rows.append({"source": source, "year": 2023, "week": week,
+                             "Name": name, "Pos": pos,
+                             "FPTS": points + offset * week,
+                             "Pass Yd": yards})
+    return pd.DataFrame(rows)
+
+
+def test_weighted_median_matches_np_median():
+    rng = np.random.default_rng(0)
+    for num_sources in [1, 2, 3, 4, 5]:
+        values = rng.normal(size=(num_sources, 20, 3)).round(1)
+        # Ties between sources
+        values[1:, :5] = values[0, :5]
+        weights = np.ones_like(values)
+
+        means, medians, spreads = _get_weighted_stats(values, weights)
+        np.testing.assert_allclose(medians, np.median(values, axis=0))
+        np.testing.assert_allclose(means, values.mean(axis=0))
+        np.testing.assert_allclose(spreads, values.std(axis=0))
+
+
+def test_weighted_stats_skip_missing_values():
+    values = np.array([[[1.0]], [[np.nan]], [[3.0]], [[10.0]]])
+    weights = np.where(np.isnan(values), 0.0, 1.0)
+
+    means, medians, _ = _get_weighted_stats(values, weights)
+    assert means[0, 0] == np.nanmean(values)
+    assert medians[0, 0] == np.nanmedian(values)
+
+    means, medians, spreads = _get_weighted_stats(
+        np.full((2, 1, 1), np.nan), np.zeros((2, 1, 1)))
+    assert np.isnan(means[0, 0]) and np.isnan(medians[0, 0]) and \
+        np.isnan(spreads[0, 0])
+
+
+def test_weighted_median_uses_weights():
+    values = np.array([[[1.0]], [[2.0]], [[9.0]]])
+
+    # Half the weight on each side of 2 -> the middle of 2 and 9
+    _, medians, _ = _get_weighted_stats(
+        values, np.array([[[1.0]], [[1.0]], [[2.0]]]))
+    assert medians[0, 0] == 5.5
+
+    _, medians, _ = _get_weighted_stats(
+        values, np.array([[[1.0]], [[1.0]], [[3.0]]]))
+    assert medians[0, 0] == 9.0
+
+
+def test_compute_weights_sources():
+    projections = _get_projections()
+    result = ConsensusEngine(weights={"nfl": 3}).compute(projections)
+
+    allen = result[(result["Name"] == "Josh Allen") & (result["week"] == 2)]
+    assert allen["Sources"].iloc[0] == 3
+    # (3 * 24 + 27 + 20) / 5
+    assert allen["FPTS"].iloc[0] == 23.8
+    assert allen["FPTS Median"].iloc[0] == 24
+
+    kicker = result[result["Name"] == "Evan McPherson"]
+    assert kicker["Pass Yd"].isna().all()
+
+
+def test_update_matches_compute():
+    projections = _get_projections()
+    engine = ConsensusEngine(weights={"sportsline": 2})
+    for (source, year, week), snapshot in projections.groupby(
+            ["source", "year", "week"], sort=False):
+        result = engine.update(snapshot, source=source, year=year, week=week)
+
+    expected = ConsensusEngine(weights={"sportsline": 2}).compute(projections)
+    pdt.assert_frame_equal(result, expected)
+
+
+def test_update_replaces_a_snapshot():
+    projections = _get_projections()
+    engine = ConsensusEngine()
+    engine.compute(projections)
+
+    # A new scrape of week 2 drops a player and changes a projection
+    is_rescraped = (projections["source"] == "nfl") & \
+        (projections["week"] == 2)
+    rescrape = projections[is_rescraped &
+                           (projections["Name"] != "Tony Pollard")].copy()
+    rescrape.loc[rescrape["Name"] == "Josh Allen", "FPTS"] = 30
+    result = engine.update(rescrape, source="nfl", year=2023, week=2)
+
+    expected = ConsensusEngine().compute(
+        pd.concat([projections[~is_rescraped], rescrape]))
+    pdt.assert_frame_equal(result, expected)
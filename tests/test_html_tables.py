@@ -0,0 +1,76 @@
+"""
+File: test_html_tables.py
+Description: Tests that html_tables names and reads tables like
+             pd.read_html, which the scrapers used before
+"""
+
+import io
+import os
+
+import lxml.html
+import pandas as pd
+import pandas.testing as pdt
+import pytest
+
+import benchmark
+import html_tables
+
+_SAMPLE_PAGE = os.path.join(os.path.dirname(os.path.dirname(
+    os.path.abspath(__file__))), "sample pages",
+    "fantasydata 2021 week 1 gb qb")
+
+
+def _read_html(table):
+    """
+    :param table: a <table> lxml element
+    :return: the table read by pd.read_html, with multi-level headers joined
+             with "_" (as the scrapers joined them)
+    """
+    df = pd.read_html(io.StringIO(lxml.html.tostring(table,
+                                                     encoding="unicode")))[0]
+    if isinstance(df.columns, pd.MultiIndex):
+        df.columns = ["_".join(column) for column in df.columns]
+    return df
+
+
+def _assert_same_as_read_html(table):
+    expected = _read_html(table)
+    df = html_tables.read_table(table, header_style="pandas",
+                                convert_numeric=True)
+    assert list(df.columns) == list(expected.columns)
+    # read_html keeps numbers in mixed columns as strings like "39.0"
+    pdt.assert_frame_equal(df.astype(str), expected.astype(str),
+                           check_dtype=False)
+
+
+def test_fantasy_data_sample_page():
+    with open(_SAMPLE_PAGE, encoding="utf-8") as page_file:
+        root = html_tables.parse_html(page_file.read())
+    tables = html_tables.find_all(root, "table")
+    assert len(tables) == 7
+
+    for table in tables:
+        _assert_same_as_read_html(table)
+
+    # The header table has two header rows
+    headers = html_tables.read_headers(tables[4], header_style="pandas")
+    assert headers[:6] == ["Team_Team", "Pos_Pos", "WK_WK", "OPP_OPP",
+                           "Passing_CMP", "Passing_ATT"]
+
+
+@pytest.mark.parametrize("table_id", ["player_offense", "player_defense",
+                                      "returns", "kicking"])
+def test_pfr_multi_row_headers(table_id):
+    html = benchmark.get_pfr_game_page()
+    table = html_tables.extract_tables(html, [table_id])[table_id]
+    _assert_same_as_read_html(table)
+
+
+def test_header_styles():
+    table = lxml.html.fragment_fromstring(
+        "<table><tr><th>Yds</th><th> Yds </th><th></th></tr>"
+        "<tr><td>1</td><td>2</td><td>3</td></tr></table>")
+    assert html_tables.read_headers(table, header_style="pandas") == \
+        ["Yds", "Yds.1", "Unnamed: 2"]
+    assert html_tables.read_headers(table, header_style="count") == \
+        ["Yds", " Yds ", ""]
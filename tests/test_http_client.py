@@ -0,0 +1,193 @@
+"""
+File: test_http_client.py
+Description: Tests for http_client, with a fake requests session and a
+             local keep-alive server
+"""
+
+import gzip
+import threading
+from datetime import timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+from requests.structures import CaseInsensitiveDict
+
+import http_client
+import page_cache
+from http_client import HttpClient
+from page_cache import PageCache
+from request_scheduler import HostPolicy, RequestScheduler
+
+_URL = "https://www.sportsline.com/nfl/expert-projections/simulation/"
+
+
+class _FakeRaw:
+    def __init__(self, num_bytes):
+        self.num_bytes = num_bytes
+
+    def tell(self):
+        return self.num_bytes
+
+
+class _FakeResponse:
+    def __init__(self, text, headers=None, wire_bytes=None):
+        self.status_code = 200
+        self.text = text
+        self.content = text.encode("utf-8")
+        self.headers = CaseInsensitiveDict(headers or {})
+        self.raw = _FakeRaw(len(self.content) if wire_bytes is None
+                            else wire_bytes)
+        self.elapsed = timedelta(seconds=0.25)
+
+
+class _FakeSession:
+    """
+    Stands in for requests.Session, recording each session made and each
+    request's arguments
+    """
+
+    sessions = []
+
+    def __init__(self):
+        self.headers = CaseInsensitiveDict()
+        self.adapters = {}
+        self.requests = []
+        self.closed = False
+        self.response = _FakeResponse("page")
+        _FakeSession.sessions.append(self)
+
+    def mount(self, prefix, adapter):
+        self.adapters[prefix] = adapter
+
+    def get(self, url, **kwargs):
+        self.requests.append((url, kwargs))
+        return self.response
+
+    def close(self):
+        self.closed = True
+
+
+@pytest.fixture
+def sessions(monkeypatch):
+    monkeypatch.setattr(_FakeSession, "sessions", [])
+    monkeypatch.setattr(http_client.requests, "Session", _FakeSession)
+    return _FakeSession.sessions
+
+
+def test_one_session_is_reused(sessions):
+    client = HttpClient(pool_maxsize=4)
+    assert sessions == []  # created on first use
+
+    for _ in range(3):
+        client.get(_URL)
+    assert len(sessions) == 1
+    assert len(sessions[0].requests) == 3
+
+    adapter = sessions[0].adapters["https://"]
+    assert sessions[0].adapters["http://"] is adapter
+    assert adapter._pool_maxsize == 4
+    # Retrying is left to retry.RETRIER
+    assert adapter.max_retries.total == 0
+
+    client.close()
+    assert sessions[0].closed
+    client.get(_URL)
+    assert len(sessions) == 2
+
+
+def test_headers_and_timeouts(sessions):
+    client = HttpClient(timeout=(3, 7), headers={"User-Agent": "test"})
+    client.get(_URL, params={"week": 1}, headers={"If-None-Match": '"1"'})
+    client.get(_URL, timeout=60)
+
+    session = sessions[0]
+    assert session.headers["User-Agent"] == "test"
+    assert "gzip" in session.headers["Accept-Encoding"]
+    assert session.requests == [
+        (_URL, {"params": {"week": 1}, "headers": {"If-None-Match": '"1"'},
+                "timeout": (3, 7)}),
+        (_URL, {"params": None, "headers": None, "timeout": 60})]
+
+
+def test_stats(sessions):
+    client = HttpClient()
+    client.get(_URL)
+    sessions[0].response = _FakeResponse(
+        "compressed page", headers={"Content-Encoding": "gzip"},
+        wire_bytes=5)
+    client.get("https://www.sportsline.com/other")
+    client.get("https://www.nfl.com/")
+
+    stats = client.stats()
+    assert stats["www.sportsline.com"] == {
+        "requests": 2, "wire_bytes": 4 + 5, "content_bytes": 4 + 15,
+        "compressed": 1, "seconds": 0.5, "connections": 0}
+    assert stats["www.nfl.com"]["requests"] == 1
+
+    client.reset_stats()
+    assert client.stats() == {}
+
+
+def test_cache_fetch_passes_headers_and_timeouts(tmp_path, sessions,
+                                                 monkeypatch):
+    client = HttpClient(timeout=(3, 7), headers={"User-Agent": "test"})
+    monkeypatch.setattr(page_cache, "CLIENT", client)
+    monkeypatch.setattr(page_cache, "SCHEDULER", RequestScheduler(
+        default_policy=HostPolicy(min_delay=0)))
+    cache = PageCache(directory=str(tmp_path))
+
+    session = _FakeSession()
+    monkeypatch.setattr(http_client.requests, "Session", lambda: session)
+    session.response = _FakeResponse("projections",
+                                     headers={"ETag": '"abc"'})
+
+    cache.fetch(_URL, source="sportsline", params={"week": 1})
+    cache.fetch(_URL, source="sportsline", params={"week": 1})
+
+    assert session.headers["User-Agent"] == "test"
+    assert session.requests == [
+        (_URL, {"params": {"week": 1}, "headers": {}, "timeout": (3, 7)}),
+        # The page is revalidated with its ETag
+        (_URL, {"params": {"week": 1}, "headers": {"If-None-Match": '"abc"'},
+                "timeout": (3, 7)})]
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive
+
+    def do_GET(self):
+        body = gzip.compress(b"<html>" + b"projections " * 100 + b"</html>")
+        self.send_response(200)
+        self.send_header("Content-Encoding", "gzip")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def server():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+    server.server_close()
+
+
+def test_connections_are_kept_alive(server):
+    client = HttpClient()
+    try:
+        for page in range(5):
+            response = client.get(f"{server}/page/{page}")
+            assert response.text.startswith("<html>projections")
+    finally:
+        stats = client.stats()["127.0.0.1"]
+        client.close()
+
+    assert stats["requests"] == 5
+    assert stats["connections"] == 1
+    assert stats["compressed"] == 5
+    assert stats["wire_bytes"] < stats["content_bytes"]
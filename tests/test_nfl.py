@@ -0,0 +1,52 @@
+"""
+File: test_nfl.py
+Description: Tests the fantasy.nfl.com parser on benchmark.py's synthetic
+             projections pages
+"""
+
+import pytest
+
+import benchmark
+import nfl
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return benchmark.get_synthetic_cache(str(tmp_path))
+
+
+@pytest.mark.parametrize("position,num_players,labels", [
+    (0, 100, ["Name", "Pos", "Team", "Opp", "Pass Yd"]),
+    (7, 32, ["Name", "Pos", "Team", "Opp", "XP Made"]),
+    (8, 32, ["Name", "Pos", "Opp", "Def Sack"])])
+def test_get_position_df(cache, position, num_players, labels):
+    df = benchmark._with_cache(nfl, cache, nfl._get_position_df, week=1,
+                               position=position)
+
+    # Every page of 25 players is read
+    assert len(df) == num_players
+    assert list(df.columns) == nfl._get_labels(position)[1]
+    assert list(df.columns[:len(labels)]) == labels
+    assert df["Name"].tolist()[:2] == ["Player 1", "Player 2"]
+
+
+def test_get_position_df_splits_position_and_team(cache):
+    df = benchmark._with_cache(nfl, cache, nfl._get_position_df, week=1,
+                               position=0)
+
+    assert set(df["Pos"]) == {"QB", "RB", "WR", "TE", "K"}
+    assert set(df["Team"]) <= set(benchmark._TEAMS)
+    # "-" means no projection
+    assert df["Pass Yd"].notna().all()
+
+
+def test_get_position_df_defense(cache):
+    df = benchmark._with_cache(nfl, cache, nfl._get_position_df, week=1,
+                               position=8)
+    assert set(df["Pos"]) == {"DST"}
+    assert "Team" not in df.columns
+
+
+def test_get_position_df_rejects_bad_position():
+    with pytest.raises(ValueError):
+        nfl._get_position_df(week=1, position=3)
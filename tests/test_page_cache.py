@@ -0,0 +1,106 @@
+"""
+File: test_page_cache.py
+Description: Tests for page_cache, with a fake HTTP client
+"""
+
+import pytest
+
+import page_cache
+from page_cache import CacheMissError, PageCache
+from request_scheduler import HostPolicy, RequestScheduler
+
+_URL = "https://www.sportsline.com/nfl/expert-projections/simulation/"
+_BOX_SCORE_URL = \
+    "https://www.pro-football-reference.com/boxscores/202109090tam.htm"
+_WEEK_URL = "https://www.pro-football-reference.com/years/2021/week_1.htm"
+
+
+class _FakeResponse:
+    def __init__(self, status_code, text="", headers=None):
+        self.status_code = status_code
+        self.text = text
+        self.content = text.encode("utf-8")
+        self.headers = headers or {}
+
+
+class _FakeClient:
+    """
+    Serves one page per URL with an ETag, answering 304 to a request that
+    sends the current ETag back
+    """
+
+    def __init__(self):
+        self.pages = {}
+        self.requests = []
+
+    def get(self, url, params=None, headers=None):
+        self.requests.append((url, dict(headers or {})))
+        text = self.pages[url]
+        etag = f'"{hash(text)}"'
+        if (headers or {}).get("If-None-Match") == etag:
+            return _FakeResponse(304)
+        return _FakeResponse(200, text, {"ETag": etag})
+
+
+@pytest.fixture
+def client(monkeypatch):
+    fake_client = _FakeClient()
+    monkeypatch.setattr(page_cache, "CLIENT", fake_client)
+    monkeypatch.setattr(page_cache, "SCHEDULER", RequestScheduler(
+        default_policy=HostPolicy(min_delay=0)))
+    return fake_client
+
+
+def test_live_pages_are_revalidated(tmp_path, client):
+    cache = PageCache(directory=str(tmp_path))
+    client.pages[_URL] = "week 1 projections"
+
+    assert cache.fetch(_URL, source="sportsline") == "week 1 projections"
+    # Unchanged: the cached page is revalidated, not downloaded again
+    assert cache.fetch(_URL, source="sportsline") == "week 1 projections"
+    assert "If-None-Match" not in client.requests[0][1]
+    assert client.requests[1][1]["If-None-Match"]
+
+    # Same URL, new projections
+    client.pages[_URL] = "week 2 projections"
+    assert cache.fetch(_URL, source="sportsline") == "week 2 projections"
+    assert len(client.requests) == 3
+
+
+def test_ttls(tmp_path, client):
+    cache = PageCache(directory=str(tmp_path), ttls={"sportsline": 3600})
+    client.pages[_URL] = "projections"
+
+    cache.fetch(_URL, source="sportsline")
+    cache.fetch(_URL, source="sportsline")
+    assert len(client.requests) == 1
+
+
+def test_box_scores_never_expire(tmp_path):
+    cache = PageCache(directory=str(tmp_path))
+    loads = []
+
+    def load(text):
+        loads.append(text)
+        return text
+
+    for url in [_BOX_SCORE_URL, _WEEK_URL]:
+        for indx in range(2):
+            cache.capture(url, source="pro_football_reference",
+                          load_function=lambda: load(f"{url} {indx}"))
+
+    # The box score is loaded once, the week page every time
+    assert loads == [f"{_BOX_SCORE_URL} 0", f"{_WEEK_URL} 0",
+                     f"{_WEEK_URL} 1"]
+
+
+def test_offline_serves_stale_pages(tmp_path, client):
+    cache = PageCache(directory=str(tmp_path))
+    client.pages[_URL] = "projections"
+    cache.fetch(_URL, source="sportsline")
+
+    cache.offline = True
+    assert cache.fetch(_URL, source="sportsline") == "projections"
+    assert len(client.requests) == 1
+    with pytest.raises(CacheMissError):
+        cache.fetch(_URL + "?week=2", source="sportsline")
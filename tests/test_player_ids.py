@@ -0,0 +1,62 @@
+"""
+File: test_player_ids.py
+Description: Tests for player_ids
+"""
+
+import pandas as pd
+
+from player_ids import (PlayerResolver, normalize_name, normalize_position,
+                        normalize_team)
+
+
+def test_normalize_name():
+    assert normalize_name("D.J. Moore Jr.") == "dj moore"
+    assert normalize_name("Ja'Marr Chase") == "jamarr chase"
+    assert normalize_name("Amon-Ra St. Brown") == "amon ra st brown"
+    assert normalize_name("Kenneth Walker III") == "kenneth walker"
+    assert normalize_name(None) == ""
+
+
+def test_normalize_team_and_position():
+    assert normalize_team("GNB") == "GB"
+    assert normalize_team(" oak ") == "LV"
+    assert normalize_team("FA") == ""
+    assert normalize_position("PK") == "K"
+    assert normalize_position("RB/WR") == "RB"
+    assert normalize_position("XX") == ""
+
+
+def test_resolve_matches_registered_players(tmp_path):
+    resolver = PlayerResolver(path=str(tmp_path / "player_ids.sqlite"))
+    resolver.register_players(pd.DataFrame({
+        "ID": ["MoorDJ00", "AlleJo02"],
+        "Name": ["DJ Moore", "Josh Allen"],
+        "Team": ["CHI", "BUF"],
+        "Pos": ["WR", "QB"],
+    }))
+
+    ids = resolver.resolve(pd.DataFrame({
+        "Name": ["D.J. Moore", "J. Allen", "Packers D/ST"],
+        "Team": ["CHI", "BUF", "GB"],
+        "Pos": ["WR", "QB", "DST"],
+    }), source="nfl")
+    assert ids.tolist() == ["MoorDJ00", "AlleJo02", "DST-GB"]
+
+
+def test_register_players_takes_over_provisional_ids(tmp_path):
+    path = str(tmp_path / "player_ids.sqlite")
+    resolver = PlayerResolver(path=path)
+    rookie = pd.DataFrame({"Name": ["Bijan Robinson"], "Team": ["ATL"],
+                           "Pos": ["RB"]})
+
+    provisional_id = resolver.resolve(rookie, source="nfl").iloc[0]
+    assert provisional_id.startswith("~")
+
+    resolver.register_players(pd.DataFrame({
+        "ID": ["RobiBi01"], "Name": ["Bijan Robinson"], "Team": ["ATL"],
+        "Pos": ["RB"]}))
+    assert resolver.resolve(rookie, source="nfl").iloc[0] == "RobiBi01"
+
+    # The handover is saved to the crosswalk
+    reopened = PlayerResolver(path=path)
+    assert reopened.resolve(rookie, source="nfl").iloc[0] == "RobiBi01"
@@ -0,0 +1,82 @@
+"""
+File: test_pro_football_reference.py
+Description: Tests the pro-football-reference.com box score parser on
+             benchmark.py's synthetic box scores
+"""
+
+import pandas.testing as pdt
+
+import benchmark
+import html_tables
+import pro_football_reference
+
+
+def test_extracts_commented_tables():
+    html = benchmark.get_pfr_game_page()
+
+    # PFR wraps every table after the first in a comment
+    root = html_tables.parse_html(html)
+    assert len(html_tables.find_all(root, "table")) == 1
+
+    tables = html_tables.extract_tables(
+        html, pro_football_reference.GAME_TABLE_IDS)
+    assert sorted(tables) == sorted(pro_football_reference.GAME_TABLE_IDS)
+
+
+def test_parse_pfr_table():
+    html = benchmark.get_pfr_game_page(rows_per_team=5)
+    table = html_tables.extract_tables(html, ["player_offense"])[
+        "player_offense"]
+
+    df = pro_football_reference._parse_pfr_table(table)
+
+    # The repeated header row and the spacer row between teams are dropped
+    assert len(df) == 10
+    assert list(df.columns[:4]) == ["_Player", "ID", "_Tm", "Passing_Cmp"]
+    assert "Passing_Yds2" in df.columns
+    assert df["ID"].tolist()[:2] == ["PlayKAN000", "PlayKAN001"]
+    assert df["_Tm"].tolist() == ["KAN"] * 5 + ["CLE"] * 5
+    # Blank cells are missing
+    assert df.isna().any().any()
+
+
+def test_parse_game():
+    df = pro_football_reference._parse_game(
+        benchmark.get_pfr_game_page(rows_per_team=12))
+
+    # Each team's 12 players (in every table) and its defense
+    assert len(df) == 26
+    assert list(df.columns[:4]) == ["Name", "ID", "Team", "Pos"]
+    for column in ["Pass Sack Yd", "Tkl Total", "Def Pass Yd Net", "FG Att",
+                   "KR Avg", "PR Long"]:
+        assert column in df.columns
+
+    # Positions come from the snap counts tables
+    players = df[df["Pos"] != "DST"]
+    assert len(players) == 24
+    assert set(players["Pos"]) <= {"QB", "RB", "WR", "TE"}
+
+    defenses = df[df["Pos"] == "DST"].set_index("Team")
+    assert sorted(defenses.index) == ["CLE", "KAN"]
+    assert defenses["ID"].isna().all()
+
+
+def test_process_pool_parse_matches_serial(tmp_path, monkeypatch):
+    cache = benchmark.get_synthetic_cache(str(tmp_path / "page_cache"))
+    monkeypatch.setattr(pro_football_reference, "CACHE", cache)
+    game_urls = pro_football_reference._get_game_urls(
+        benchmark.get_pfr_week_page(num_games=16))[:4]
+    save_path = str(tmp_path / "{year}_{week}_{name}.csv")
+
+    # Every game is in the cache, so the webdriver is never used
+    serial_df = pro_football_reference._scrape_games(
+        2021, 1, game_urls, webdriver=None,
+        save_path=save_path.replace("{name}", "serial"))
+    pool_df = pro_football_reference._scrape_games(
+        2021, 1, game_urls, webdriver=None,
+        save_path=save_path.replace("{name}", "pool"), parse_workers=2)
+
+    assert len(pool_df) == 4 * 26
+    pdt.assert_frame_equal(pool_df, serial_df)
+    assert (tmp_path / "2021_1_pool.csv").read_text() == \
+        (tmp_path / "2021_1_serial.csv").read_text()
@@ -0,0 +1,102 @@
+"""
+File: test_query_store.py
+Description: Tests for query_store
+"""
+
+import pandas as pd
+import pytest
+
+from query_store import QueryStore
+
+
+def _write_nfl(directory, week, pass_yd):
+    pd.DataFrame({"Name": ["Aaron Rodgers", "Davante Adams"],
+                  "Pos": ["QB", "WR"], "Team": ["GB", "GB"],
+                  "Pass Yd": [str(pass_yd), "-"],
+                  "Rec Yd": ["-", "95"]}).to_csv(
+        directory / f"projections_2021_{week}_nfl.csv", index=False)
+
+
+def _write_sportsline(directory, week):
+    # SportsLine's CSVs keep the site's headers
+    pd.DataFrame({"PLAYER": ["Aaron Rodgers", "Tom Brady"],
+                  "POS": ["QB", "QB"], "TEAM": ["GB", "TB"],
+                  "PASS YDS": ["275", "301"]}).to_csv(
+        directory / f"projections_2021_{week}_sportsline.csv", index=False)
+
+
+@pytest.fixture
+def directory(tmp_path):
+    directory = tmp_path / "projections"
+    directory.mkdir()
+    for week in [1, 2]:
+        _write_nfl(directory, week, pass_yd=250 + week)
+    _write_sportsline(directory, 1)
+    # Not a scraper's output
+    pd.DataFrame({"Name": ["x"]}).to_csv(directory / "notes.csv")
+    return directory
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = QueryStore(str(tmp_path / "projections.sqlite"))
+    yield store
+    store.close()
+
+
+def test_ingest_directory(store, directory):
+    assert store.ingest_directory(str(directory)) == 3
+    assert store.query("SELECT COUNT(*) AS n FROM stats")["n"][0] == 6
+
+    df = store.get_week(2021, 1, sources=["nfl"])
+    # '-' is stored as NULL and numbers as numbers
+    assert df["Pass Yd"].tolist()[0] == 251.0
+    assert pd.isna(df["Pass Yd"].tolist()[1])
+
+
+def test_reingest_loads_only_changed_weeks(store, directory):
+    store.ingest_directory(str(directory))
+    assert store.ingest_directory(str(directory)) == 0
+
+    _write_nfl(directory, 2, pass_yd=320)
+    assert store.ingest_directory(str(directory)) == 1
+
+    # The week's rows are replaced, not added to
+    df = store.get_player("Aaron Rodgers", sources=["nfl"],
+                          columns=["Pass Yd"])
+    assert df["week"].tolist() == [1, 2]
+    assert df["Pass Yd"].tolist() == [251.0, 320.0]
+
+
+def test_get_player_includes_sportsline(store, directory):
+    store.ingest_directory(str(directory))
+
+    df = store.get_player("Aaron Rodgers")
+    assert list(zip(df["week"], df["source"])) == [(1, "nfl"),
+                                                   (1, "sportsline"),
+                                                   (2, "nfl")]
+    assert df["Pos"].tolist() == ["QB"] * 3
+    assert df["PASS YDS"].tolist()[1] == 275.0
+    # Stat columns no row of the player has are dropped
+    assert "Rec Yd" not in df.columns
+    assert "PLAYER" not in store.query("SELECT * FROM stats").columns
+
+
+def test_get_team(store, directory):
+    store.ingest_directory(str(directory))
+
+    df = store.get_team("GB", weeks=[1], columns=["Rec Yd"])
+    assert list(df.columns) == ["source", "year", "week", "Name", "Pos",
+                                "Team", "Rec Yd"]
+    assert sorted(zip(df["source"], df["Name"])) == [
+        ("nfl", "Aaron Rodgers"), ("nfl", "Davante Adams"),
+        ("sportsline", "Aaron Rodgers")]
+    assert len(store.get_team("TB")) == 1
+
+    with pytest.raises(ValueError):
+        store.get_team("GB", columns=["Def Sack"])
+
+
+def test_ingest_file_rejects_other_names(store, directory):
+    with pytest.raises(ValueError):
+        store.ingest_file(str(directory / "notes.csv"))
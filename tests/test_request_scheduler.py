@@ -0,0 +1,142 @@
+"""
+File: test_request_scheduler.py
+Description: Tests for request_scheduler, on a fake clock
+"""
+
+import random
+import time
+
+import pytest
+
+from request_scheduler import HostPolicy, RequestScheduler, get_host
+
+
+class _FakeClock:
+    """
+    Stands in for time.monotonic and time.sleep: sleeping moves the clock
+    forward instead of waiting
+    """
+
+    def __init__(self):
+        self.now = 1000.0
+        self.sleeps = []
+
+    def monotonic(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    fake_clock = _FakeClock()
+    monkeypatch.setattr(time, "monotonic", fake_clock.monotonic)
+    monkeypatch.setattr(time, "sleep", fake_clock.sleep)
+    return fake_clock
+
+
+def _get_request_times(scheduler, clock, url, num_requests):
+    """
+    :return: the clock's time when each of num_requests requests to url is
+             let through, one after another
+    """
+    times = []
+    for _ in range(num_requests):
+        scheduler.acquire(url)
+        times.append(clock.now)
+    return times
+
+
+def test_requests_to_a_host_are_spaced(clock):
+    scheduler = RequestScheduler()
+    scheduler.set_policy("nfl.com", min_delay=3)
+
+    times = _get_request_times(scheduler, clock,
+                               "https://fantasy.nfl.com/research", 4)
+    assert times == [1000, 1003, 1006, 1009]
+    assert clock.sleeps == [3, 3, 3]
+
+
+def test_hosts_are_spaced_separately(clock):
+    scheduler = RequestScheduler(default_policy=HostPolicy(min_delay=5))
+    scheduler.set_policy("nfl.com", min_delay=3)
+
+    assert scheduler.acquire("https://fantasy.nfl.com/a") == 0
+    assert scheduler.acquire("https://www.sportsline.com/a") == 0
+    assert scheduler.acquire("https://www.footballguys.com/a") == 0
+    # Only the same host waits, with its own policy or the default
+    assert scheduler.acquire("https://fantasy.nfl.com/b") == 3
+    assert scheduler.acquire("https://www.sportsline.com/b") == 2
+
+
+def test_burst_and_idle_refill(clock):
+    scheduler = RequestScheduler()
+    scheduler.set_policy("footballguys.com", min_delay=2, burst=3)
+    url = "https://www.footballguys.com/projections"
+
+    assert [scheduler.acquire(url) for _ in range(4)] == [0, 0, 0, 2]
+
+    # Idling refills at most burst tokens
+    clock.now += 60
+    assert [scheduler.acquire(url) for _ in range(4)] == [0, 0, 0, 2]
+
+
+def test_jitter_bounds(clock):
+    random.seed(0)
+    scheduler = RequestScheduler()
+    scheduler.set_policy("pro-football-reference.com", min_delay=6,
+                         jitter=4)
+
+    times = _get_request_times(
+        scheduler, clock, "https://www.pro-football-reference.com/", 200)
+    gaps = [later - earlier for earlier, later in zip(times, times[1:])]
+    assert all(6 <= gap <= 10 for gap in gaps)
+    # The jitter actually varies the spacing
+    assert max(gaps) - min(gaps) > 3
+    # On average the host gets min_delay + jitter / 2
+    assert (times[-1] - times[0]) / len(gaps) == pytest.approx(8, abs=0.5)
+
+
+def test_set_policy_replaces_the_hosts_bucket(clock):
+    scheduler = RequestScheduler()
+    scheduler.set_policy("nfl.com", min_delay=3)
+    url = "https://fantasy.nfl.com/research"
+    scheduler.acquire(url)
+
+    scheduler.set_policy("nfl.com", min_delay=10)
+    assert scheduler.acquire(url) == 0
+    assert scheduler.acquire(url) == 10
+
+
+def test_stats(clock):
+    scheduler = RequestScheduler()
+    scheduler.set_policy("nfl.com", min_delay=3)
+    url = "https://fantasy.nfl.com/research"
+
+    assert scheduler.fetch(url, lambda: "page") == "page"
+
+    def fail():
+        raise ConnectionError("reset")
+
+    with pytest.raises(ConnectionError):
+        scheduler.fetch(url, fail)
+
+    stats = scheduler.stats()["fantasy.nfl.com"]
+    assert (stats["requests"], stats["errors"], stats["wait_seconds"]) == \
+        (2, 1, 3)
+
+    scheduler.reset_stats()
+    assert scheduler.stats()["fantasy.nfl.com"]["requests"] == 0
+
+
+def test_policy_validation_and_hosts():
+    with pytest.raises(ValueError):
+        HostPolicy(min_delay=-1)
+    with pytest.raises(ValueError):
+        HostPolicy(min_delay=1, burst=0)
+    assert get_host("https://Fantasy.NFL.com/research?x=1") == \
+        "fantasy.nfl.com"
+    with pytest.raises(ValueError):
+        get_host("not a url")
@@ -0,0 +1,221 @@
+"""
+File: test_retry.py
+Description: Tests for retry, on a fake clock
+"""
+
+import random
+import time
+
+import pytest
+import requests
+
+from retry import (CircuitOpenError, Retrier, RetryError, RetryPolicy,
+                   is_retryable)
+
+_URL = "https://www.example.com/page"
+
+
+class _FakeClock:
+    """
+    Stands in for time.monotonic and time.sleep: sleeping moves the clock
+    forward instead of waiting
+    """
+
+    def __init__(self):
+        self.now = 1000.0
+        self.sleeps = []
+
+    def monotonic(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    fake_clock = _FakeClock()
+    monkeypatch.setattr(time, "monotonic", fake_clock.monotonic)
+    monkeypatch.setattr(time, "sleep", fake_clock.sleep)
+    # Back off by the longest delay, so the schedule is predictable
+    monkeypatch.setattr(random, "uniform", lambda low, high: high)
+    return fake_clock
+
+
+class _Fetch:
+    """
+    Fetch function that fails with each of errors in turn, then returns
+    "page"
+    """
+
+    def __init__(self, errors):
+        self.errors = list(errors)
+        self.calls = 0
+
+    def __call__(self):
+        self.calls += 1
+        if self.errors:
+            raise self.errors.pop(0)
+        return "page"
+
+
+def _get_http_error(status):
+    response = requests.Response()
+    response.status_code = status
+    return requests.HTTPError(f"{status} error", response=response)
+
+
+class TimeoutException(Exception):
+    """
+    Named like selenium's, which is matched by name
+    """
+
+
+def test_is_retryable():
+    for error in [requests.ConnectionError(), requests.Timeout(),
+                  ConnectionResetError(), TimeoutError(),
+                  _get_http_error(429), _get_http_error(503),
+                  TimeoutException()]:
+        assert is_retryable(error), error
+    for error in [_get_http_error(404), _get_http_error(403),
+                  requests.HTTPError("no response"), ValueError("parse"),
+                  KeyError("missing"), RetryError(), CircuitOpenError()]:
+        assert not is_retryable(error), error
+
+
+def test_backoff_schedule(monkeypatch):
+    policy = RetryPolicy(base_delay=2, max_delay=60)
+    monkeypatch.setattr(random, "uniform", lambda low, high: (low, high))
+    assert [policy.get_delay(attempt) for attempt in range(1, 8)] == [
+        (1, 2), (2, 4), (4, 8), (8, 16), (16, 32), (30, 60), (30, 60)]
+
+
+def test_retries_until_success(clock):
+    retrier = Retrier(RetryPolicy(max_attempts=5, base_delay=2))
+    fetch = _Fetch([requests.ConnectionError(), _get_http_error(503)])
+
+    assert retrier.call(_URL, fetch) == "page"
+    assert fetch.calls == 3
+    assert clock.sleeps == [2, 4]
+
+
+def test_gives_up_after_max_attempts(clock):
+    retrier = Retrier(RetryPolicy(max_attempts=3, base_delay=1))
+    fetch = _Fetch([requests.Timeout()] * 5)
+
+    with pytest.raises(RetryError) as error_info:
+        retrier.call(_URL, fetch)
+    assert not isinstance(error_info.value, CircuitOpenError)
+    assert isinstance(error_info.value.__cause__, requests.Timeout)
+    assert fetch.calls == 3
+    assert clock.sleeps == [1, 2]
+
+
+def test_other_errors_are_raised_straight_away(clock):
+    retrier = Retrier()
+    fetch = _Fetch([_get_http_error(404)])
+    with pytest.raises(requests.HTTPError):
+        retrier.call(_URL, fetch)
+    assert fetch.calls == 1
+    assert clock.sleeps == []
+
+
+def test_one_failing_fetch_does_not_trip_the_breaker(clock):
+    # With the defaults, a fetch that runs out of attempts leaves the host
+    # usable
+    retrier = Retrier()
+    with pytest.raises(RetryError) as error_info:
+        retrier.call(_URL, _Fetch([requests.Timeout()] * 5))
+    assert not isinstance(error_info.value, CircuitOpenError)
+
+    assert retrier.call(_URL, _Fetch([])) == "page"
+    assert retrier.stats()["www.example.com"]["trips"] == 0
+
+
+def test_breaker_trips_and_resets(clock):
+    retrier = Retrier(RetryPolicy(max_attempts=2, base_delay=1,
+                                  failure_threshold=3, reset_seconds=300))
+
+    # The third fetch in a row to run out of attempts opens the breaker
+    for _ in range(2):
+        with pytest.raises(RetryError):
+            retrier.call(_URL, _Fetch([requests.Timeout()] * 2))
+    with pytest.raises(CircuitOpenError):
+        retrier.call(_URL, _Fetch([requests.Timeout()] * 2))
+
+    # Fetches are rejected without being tried, on any page of the host
+    fetch = _Fetch([])
+    with pytest.raises(CircuitOpenError):
+        retrier.call("https://www.example.com/other", fetch)
+    assert fetch.calls == 0
+    # Other hosts aren't affected
+    assert retrier.call("https://other.example.com/", _Fetch([])) == "page"
+
+    # Once reset_seconds have passed, one failed attempt reopens it
+    clock.now += 300
+    fetch = _Fetch([requests.Timeout()] * 2)
+    with pytest.raises(CircuitOpenError):
+        retrier.call(_URL, fetch)
+    assert fetch.calls == 1
+    with pytest.raises(CircuitOpenError):
+        retrier.call(_URL, _Fetch([]))
+
+    # and one success closes it
+    clock.now += 300
+    assert retrier.call(_URL, _Fetch([])) == "page"
+    with pytest.raises(RetryError) as error_info:
+        retrier.call(_URL, _Fetch([requests.Timeout()] * 2))
+    assert not isinstance(error_info.value, CircuitOpenError)
+
+
+def test_success_resets_the_failure_count(clock):
+    retrier = Retrier(RetryPolicy(max_attempts=1, failure_threshold=2))
+    for _ in range(3):
+        with pytest.raises(RetryError) as error_info:
+            retrier.call(_URL, _Fetch([requests.Timeout()]))
+        assert not isinstance(error_info.value, CircuitOpenError)
+        retrier.call(_URL, _Fetch([]))
+
+
+def test_stats(clock):
+    retrier = Retrier(RetryPolicy(max_attempts=2, base_delay=4,
+                                  failure_threshold=2, reset_seconds=60))
+
+    retrier.call(_URL, _Fetch([requests.Timeout()]))
+    with pytest.raises(RetryError):
+        retrier.call(_URL, _Fetch([requests.Timeout()] * 2))
+    with pytest.raises(CircuitOpenError):
+        retrier.call(_URL, _Fetch([requests.Timeout()] * 2))
+    with pytest.raises(CircuitOpenError):
+        retrier.call(_URL, _Fetch([]))
+
+    assert retrier.stats() == {"www.example.com": {
+        "calls": 3, "retries": 3, "failures": 2, "rejected": 1, "trips": 1,
+        # Backing off 4s before each retry (the fake attempts take no time)
+        "seconds_lost": pytest.approx(12.0, abs=0.1)}}
+
+    retrier.reset_stats()
+    assert retrier.stats()["www.example.com"]["calls"] == 0
+    # The breaker is still open
+    with pytest.raises(CircuitOpenError):
+        retrier.call(_URL, _Fetch([]))
+
+
+def test_call_async(clock, monkeypatch):
+    import asyncio
+
+    sleeps = []
+
+    async def fake_sleep(seconds):
+        sleeps.append(seconds)
+
+    monkeypatch.setattr(asyncio, "sleep", fake_sleep)
+    retrier = Retrier(RetryPolicy(base_delay=2))
+    fetch = _Fetch([requests.ConnectionError()])
+
+    async def fetch_async():
+        return fetch()
+
+    assert asyncio.run(retrier.call_async(_URL, fetch_async)) == "page"
+    assert sleeps == [2]
@@ -0,0 +1,66 @@
+"""
+File: test_schema.py
+Description: Tests for schema
+"""
+
+import pandas as pd
+import pandas.testing as pdt
+
+import schema
+
+
+def _get_df():
+    return pd.DataFrame({"Name": ["Josh Allen", "Tony Pollard", "Bills"],
+                         "Pos": ["QB", "RB", "DST"],
+                         "Pass Att": ["35", "-", ""],
+                         "Rush Yd": ["-3", "1,024", "-"],
+                         "Pass Rate": ["95.3", "-", "-"],
+                         "Def Sack": ["-", "-", "2.5"]})
+
+
+def test_projections_are_float64():
+    df = schema.apply_schema(_get_df())
+    for column in ["Pass Att", "Rush Yd", "Pass Rate", "Def Sack"]:
+        assert df[column].dtype == "float64"
+    assert df["Pos"].dtype == "category"
+    assert df["Rush Yd"].tolist()[:2] == [-3.0, 1024.0]
+
+
+def test_actual_counts_are_nullable_integers():
+    df = schema.apply_schema(_get_df(), source="pro_football_reference")
+
+    assert df["Pass Att"].dtype == "Int8"
+    assert df["Rush Yd"].dtype == "Int16"
+    # Rates, averages and sacks (which can be halves) stay float64
+    assert df["Pass Rate"].dtype == "float64"
+    assert df["Def Sack"].dtype == "float64"
+
+    assert df["Pass Att"].isna().tolist() == [False, True, True]
+    assert df["Rush Yd"].tolist()[:2] == [-3, 1024]
+
+    # Applying the schema again changes nothing
+    pdt.assert_frame_equal(
+        schema.apply_schema(df, source="pro_football_reference"), df)
+
+
+def test_fractional_or_out_of_range_counts_are_mistyped():
+    df = pd.DataFrame({"Name": ["A", "B", "C"],
+                       "Rush Att": ["12", "7.5", "300"]})
+    typed = schema.apply_schema(df, source="pro_football_reference")
+    assert typed["Rush Att"].isna().tolist() == [False, True, True]
+
+    issues = schema.check_schema(df, source="pro_football_reference")
+    assert issues[["column", "issue", "count"]].values.tolist() == [
+        ["Rush Att", "not Int8", 2]]
+    assert len(schema.check_schema(df)) == 0
+
+
+def test_csv_is_unchanged(tmp_path):
+    # Whole numbers are written the same either way
+    for source in [None, "pro_football_reference"]:
+        df = schema.apply_schema(_get_df(), source=source)
+        path = tmp_path / f"{source}.csv"
+        df.to_csv(path, index=False, na_rep="-",
+                  float_format=schema.FLOAT_FORMAT)
+    assert (tmp_path / "None.csv").read_text() == \
+        (tmp_path / "pro_football_reference.csv").read_text()
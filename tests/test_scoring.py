@@ -0,0 +1,98 @@
+"""
+File: test_scoring.py
+Description: Tests for scoring
+"""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import schema
+from scoring import RULE_SETS, extend_rule_set, parse_range, score
+
+
+def test_parse_range():
+    assert parse_range("1-6") == (1, 6)
+    assert parse_range("50+") == (50, np.inf)
+    assert parse_range("0") == (0, 0)
+    with pytest.raises(ValueError):
+        parse_range("six")
+
+
+def test_score_offense_under_each_rule_set():
+    df = pd.DataFrame({
+        "Name": ["Josh Allen", "Tony Pollard"],
+        "Pos": ["QB", "RB"],
+        "Pass Yd": [250, "-"], "Pass Td": [2, "-"], "Pass Int": [1, "-"],
+        "Rush Yd": [30, 80], "Rush Td": [1, 0],
+        "Rec": ["-", 4], "Rec Yd": ["-", 30], "Fum Lost": [0, 1],
+    })
+    points = score(df)
+
+    assert list(points.columns) == list(RULE_SETS)
+    # 10 + 8 - 2 + 3 + 6
+    assert points.loc[0, "standard"] == pytest.approx(25)
+    assert points.loc[0, "ppr"] == pytest.approx(25)
+    # 8 + 3 - 2, plus 0.5 or 1 per reception
+    assert points.loc[1, "standard"] == pytest.approx(9)
+    assert points.loc[1, "half_ppr"] == pytest.approx(11)
+    assert points.loc[1, "ppr"] == pytest.approx(13)
+
+
+def test_score_nullable_integer_stats():
+    df = pd.DataFrame({
+        "Name": ["Josh Allen", "Tony Pollard"], "Pos": ["QB", "RB"],
+        "Pass Yd": ["250", "-"], "Pass Td": ["2", "-"],
+        "Rush Yd": ["30", "80"], "Rec": ["-", "4"]})
+    typed = schema.apply_schema(df, source="pro_football_reference")
+    assert str(typed["Rec"].dtype) == "Int8"
+
+    # Missing stats score 0, like '-'
+    pd.testing.assert_frame_equal(score(typed), score(df))
+
+
+def test_field_goal_buckets():
+    df = pd.DataFrame({
+        "Pos": ["K", "K"],
+        "FG Made 20-29": [1, "-"], "FG Made 40-49": [2, "-"],
+        "FG Made 50+": [1, "-"], "FG Made": [4, 3], "XP Made": [2, 1],
+    })
+    points = score(df, rule_sets={"standard": RULE_SETS["standard"]})
+
+    # Bucketed field goals replace the total: 3 + 2 * 4 + 5 + 2
+    assert points.loc[0, "standard"] == pytest.approx(18)
+    # Rows without buckets score the total: 3 * 3 + 1
+    assert points.loc[1, "standard"] == pytest.approx(10)
+
+    # A source's bucket scores as the rule bucket with its shortest distance
+    long_kicks = extend_rule_set(RULE_SETS["standard"],
+                                 fg_buckets={"0-44": 3, "45+": 6})
+    points = score(df.iloc[[0]], rule_sets={"long": long_kicks})
+    assert points.loc[0, "long"] == pytest.approx(3 + 2 * 3 + 6 + 2)
+
+
+def test_team_defense_points_allowed_and_position_points():
+    df = pd.DataFrame({
+        "Name": ["Bills D/ST", "Bills D/ST", "Bills D/ST", "Micah Parsons"],
+        "Pos": ["DST", "DEF", "D/ST", "LB"],
+        "Def Pt": [0, 17, 35, "-"],
+        "Def Sack": [3, 1, 0, 2], "Def Int": [1, 0, 0, 0],
+        "Tkl Solo": ["-", "-", "-", 5],
+    })
+    points = score(df, rule_sets={"standard": RULE_SETS["standard"],
+                                  "idp": RULE_SETS["idp"]})
+
+    # Team defenses: sacks and interceptions plus the points allowed tier
+    assert points.loc[0, "standard"] == pytest.approx(3 + 2 + 10)
+    assert points.loc[1, "standard"] == pytest.approx(1 + 1)
+    assert points.loc[2, "standard"] == pytest.approx(-4)
+    # Defenders only score under IDP: 2 * 2 sacks + 5 tackles
+    assert points.loc[3, "standard"] == 0
+    assert points.loc[3, "idp"] == pytest.approx(9)
+
+
+def test_stat_aliases():
+    df = pd.DataFrame({"Pos": ["RB", "RB"], "Fum Lost": [1, "-"],
+                       "Off Fum Lost": ["-", 1]})
+    points = score(df, rule_sets={"standard": RULE_SETS["standard"]})
+    assert points["standard"].tolist() == [-2, -2]
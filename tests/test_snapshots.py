@@ -0,0 +1,154 @@
+"""
+File: test_snapshots.py
+Description: Tests for snapshots
+"""
+
+import os
+
+import pandas as pd
+import pandas.testing as pdt
+
+import benchmark
+import schema
+import sportsline
+from instrumentation import INSTRUMENTATION
+from snapshots import CHANGED, DELETED, INSERTED, SnapshotStore
+
+
+def _get_scrape(points):
+    """
+    :param points: dict mapping name -> projected points
+    :return: a typed DataFrame like a scraper saves
+    """
+    return schema.apply_schema(pd.DataFrame({
+        "Name": list(points), "Team": ["BUF"] * len(points),
+        "Pos": ["QB"] * len(points), "FPT": list(points.values())}))
+
+
+def test_write_stores_only_differences(tmp_path):
+    store = SnapshotStore(path=str(tmp_path / "snapshots.sqlite"))
+    assert store.write(_get_scrape({"Josh Allen": 24.5}), source="nfl",
+                       year=2023, week=1) is None
+
+    store.enabled = True
+    first = store.write(_get_scrape({"Josh Allen": 24.5, "Kyle Allen": 3}),
+                        source="nfl", year=2023, week=1)
+    second = store.write(_get_scrape({"Josh Allen": 24.5, "Kyle Allen": 3}),
+                         source="nfl", year=2023, week=1)
+    third = store.write(_get_scrape({"Josh Allen": 26.1, "Matt Barkley": 1}),
+                        source="nfl", year=2023, week=1)
+
+    assert (first["inserted"], first["changed"], first["deleted"]) == \
+        (2, 0, 0)
+    assert (second["inserted"], second["changed"], second["deleted"]) == \
+        (0, 0, 0)
+    assert (third["inserted"], third["changed"], third["deleted"]) == \
+        (1, 1, 1)
+    assert store.get_snapshots(source="nfl")["rows"].tolist() == [2, 2, 2]
+
+
+def test_load_rebuilds_each_snapshot(tmp_path):
+    store = SnapshotStore(path=str(tmp_path / "snapshots.sqlite"),
+                          enabled=True)
+    scrapes = [_get_scrape({"Josh Allen": 24.5, "Kyle Allen": 3}),
+               _get_scrape({"Josh Allen": 26.1, "Kyle Allen": 3}),
+               _get_scrape({"Kyle Allen": 3})]
+    ids = [store.write(df, source="nfl", year=2023, week=1)["id"]
+           for df in scrapes]
+
+    for snapshot_id, df in zip(ids, scrapes):
+        loaded = store.load("nfl", 2023, 1, snapshot=snapshot_id)
+        pdt.assert_frame_equal(
+            loaded.sort_values("Name", ignore_index=True),
+            df.sort_values("Name", ignore_index=True))
+    assert len(store.load("nfl", 2023, 2)) == 0
+
+
+def test_changes(tmp_path):
+    store = SnapshotStore(path=str(tmp_path / "snapshots.sqlite"),
+                          enabled=True)
+    morning = store.write(_get_scrape({"Josh Allen": 24.5, "Kyle Allen": 3}),
+                          source="nfl", year=2023, week=1)
+    store.write(_get_scrape({"Josh Allen": 26.1, "Matt Barkley": 1}),
+                source="nfl", year=2023, week=1)
+
+    changes = store.changes(2023, 1, since=morning["id"])
+    assert sorted(changes["change"]) == sorted([CHANGED, INSERTED, DELETED])
+    changed = changes[changes["change"] == CHANGED].iloc[0]
+    assert (changed["column"], changed["before"], changed["after"]) == \
+        ("FPT", 24.5, 26.1)
+
+
+def _save(store, path, points):
+    """
+    :return: whether the scrape's CSV was written
+    """
+    # An old modification time shows whether the file was written again
+    if os.path.exists(path):
+        os.utime(path, ns=(0, 0))
+    store.save(_get_scrape(points), path, source="nfl", year=2023, week=1,
+               index=False, na_rep="-")
+    return os.stat(path).st_mtime_ns != 0
+
+
+def test_save_only_rewrites_changed_scrapes(tmp_path):
+    store = SnapshotStore(path=str(tmp_path / "snapshots.sqlite"),
+                          enabled=True)
+    path = str(tmp_path / "projections.csv")
+
+    assert _save(store, path, {"Josh Allen": 24.5, "Kyle Allen": 3})
+    assert not _save(store, path, {"Josh Allen": 24.5, "Kyle Allen": 3})
+    assert not _save(store, path, {"Kyle Allen": 3, "Josh Allen": 24.5})
+    assert _save(store, path, {"Josh Allen": 26.1, "Kyle Allen": 3})
+    assert pd.read_csv(path)["FPT"].tolist() == [26.1, 3]
+    assert store.get_snapshots()["changed"].tolist() == [0, 0, 0, 1]
+
+    # A CSV edited or deleted since it was saved is rewritten
+    with open(path, "a") as csv_file:
+        csv_file.write("Matt Barkley,BUF,QB,1\n")
+    assert _save(store, path, {"Josh Allen": 26.1, "Kyle Allen": 3})
+    assert len(pd.read_csv(path)) == 2
+    os.remove(path)
+    assert _save(store, path, {"Josh Allen": 26.1, "Kyle Allen": 3})
+
+
+def test_save_rewrites_csvs_saved_before_a_change(tmp_path):
+    store = SnapshotStore(path=str(tmp_path / "snapshots.sqlite"),
+                          enabled=True)
+    first_path = str(tmp_path / "first.csv")
+    other_path = str(tmp_path / "other.csv")
+
+    assert _save(store, first_path, {"Josh Allen": 24.5})
+    # The week changes while being saved somewhere else
+    assert _save(store, other_path, {"Josh Allen": 26.1})
+    assert _save(store, first_path, {"Josh Allen": 26.1})
+    assert pd.read_csv(first_path)["FPT"].tolist() == [26.1]
+
+
+def test_save_without_snapshots_always_writes(tmp_path):
+    store = SnapshotStore(path=str(tmp_path / "snapshots.sqlite"))
+    path = str(tmp_path / "projections.csv")
+    assert _save(store, path, {"Josh Allen": 24.5})
+    assert _save(store, path, {"Josh Allen": 24.5})
+    assert not os.path.exists(tmp_path / "snapshots.sqlite")
+
+
+def test_unchanged_rescrape_does_not_write_the_csv(tmp_path, monkeypatch):
+    store = SnapshotStore(path=str(tmp_path / "snapshots.sqlite"),
+                          enabled=True)
+    monkeypatch.setattr(sportsline, "SNAPSHOTS", store)
+    monkeypatch.setattr(INSTRUMENTATION, "directory", str(tmp_path))
+    save_location = str(tmp_path / "projections_{year}_{week}.csv")
+    path = tmp_path / "projections_2023_1.csv"
+
+    sportsline._parse_page(benchmark.get_sportsline_page(50), 2023, 1,
+                           save_location)
+    os.utime(path, ns=(0, 0))
+    sportsline._parse_page(benchmark.get_sportsline_page(50), 2023, 1,
+                           save_location)
+    assert path.stat().st_mtime_ns == 0
+
+    sportsline._parse_page(benchmark.get_sportsline_page(50, seed=1), 2023,
+                           1, save_location)
+    assert path.stat().st_mtime_ns != 0
+    assert store.get_snapshots()["id"].tolist() == [1, 2, 3]
@@ -0,0 +1,54 @@
+"""
+File: test_util_scripts.py
+Description: Tests for util_scripts
+"""
+
+import warnings
+
+import pandas as pd
+
+from instrumentation import INSTRUMENTATION
+import schema
+import util_scripts
+
+
+def test_combine_frames_aligns_on_keys():
+    passing = schema.apply_schema(pd.DataFrame({
+        "Name": ["Josh Allen", "Bills D/ST"], "Team": ["BUF", "BUF"],
+        "Pos": ["QB", "DST"], "Pass Yd": ["250", "-"], "Week": ["1", "1"]}))
+    # No Team column, so its rows are keyed on name and position only
+    rushing = schema.apply_schema(pd.DataFrame({
+        "Name": ["Josh Allen"], "Pos": ["QB"], "Rush Yd": ["30"]}))
+    returns = schema.apply_schema(pd.DataFrame({
+        "Name": ["Josh Allen"], "Team": ["BUF"], "Pos": ["QB"],
+        "Rush Yd": ["35"]}))
+
+    with warnings.catch_warnings():
+        warnings.simplefilter("error")
+        combined_df = util_scripts.combine_frames(
+            [passing, rushing, returns], keys=["Name", "Team", "Pos"])
+
+    assert list(combined_df.columns) == ["Name", "Team", "Pos", "Pass Yd",
+                                         "Week", "Rush Yd"]
+    assert len(combined_df) == 3
+    allen = combined_df[combined_df["Team"] == "BUF"].iloc[0]
+    assert (allen["Pass Yd"], allen["Rush Yd"]) == (250, 35)
+    assert combined_df["Week"].dtype == "Int8"
+
+
+def test_combine_frames_returns_conflicts(tmp_path, monkeypatch):
+    monkeypatch.setattr(INSTRUMENTATION, "directory", str(tmp_path))
+    offense = pd.DataFrame({"Name": ["Deebo Samuel", "Brandon Aiyuk"],
+                            "Ret Td": [1, 0]})
+    returns = pd.DataFrame({"Name": ["Deebo Samuel", "Brandon Aiyuk"],
+                            "Ret Td": [2, 0]})
+
+    with INSTRUMENTATION.run("test"):
+        combined_df, conflicts = util_scripts.combine_frames(
+            [offense, returns], keys=["Name"], return_conflicts=True)
+
+    assert combined_df["Ret Td"].tolist() == [1, 0]
+    assert conflicts["column"].tolist() == ["Ret Td"]
+    assert conflicts["players"].tolist() == [1]
+    assert conflicts["examples"].iloc[0] == ["Deebo Samuel"]
+    assert INSTRUMENTATION.runs[-1]["key_conflicts"] == 1
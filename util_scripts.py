@@ -2,10 +2,10 @@
 File: util_scripts.py
 Description: Misc functions for performing useful tasks
 """
-import pandas as pd
-import bs4
+import html_tables
+from instrumentation import INSTRUMENTATION
 
-def set_df_headers(df: pd.DataFrame, labels: dict, check:bool=True,
+def set_df_headers(df: "pd.DataFrame", labels: dict, check:bool=True,
                    check_order:bool=True):
     """
     Renames a DataFrame's columns. If 'check' is True, then it will check
@@ -43,120 +43,100 @@ def set_df_headers(df: pd.DataFrame, labels: dict, check:bool=True,
 
     return df
 
-def read_raw_html_table(table: bs4.element.Tag):
+@INSTRUMENTATION.stage("merge")
+def combine_frames(frames, keys, context="", return_conflicts=False):
     """
-    :param table: HTML table represented as a BeautifulSoup object
-    :return: A DataFrame in which entries are BeautifulSoup objects
-    """ 
-    
-    # Get headers
-    table_head = table.find("thead")
-    header_rows = table_head.find_all("tr")
-    
-    headers = []
-    
-    for header_row in header_rows:
-        header_row_list = read_row(header_row)
-        
-        #print(header_row_list)
-        
-        for i in range(len(header_row_list)):
-            header_row_list[i] = header_row_list[i].get_text()
-        
-        if len(headers) == 0:
-            headers = header_row_list
-            #print(headers)
-        else:
-            #print(header_row_list)
-            # combine multi-level headers
-            if len(headers) != len(header_row_list):
-                raise Exception("Lengths of lists aren't the same: {len1} vs {len2}".format(
-                    len1=len(headers), len2=len(header_row_list)))
-            
-            for i in range(len(headers)):
-                headers[i] = headers[i] + "_" + header_row_list[i]
-    
-    # Rename duplicate headers
-    header_counts = {}
-    for index in range(len(headers)):
-        header = headers[index]
-
-        if header not in header_counts:
-            header_counts[header] = 1
-        else:
-            count = header_counts[header]
-            new_count = count + 1
-            header_counts[header] = new_count
-            headers[index] = header + str(new_count)
-    
-    # Get contents
-    table_body = table.find("tbody")
-    table_rows = table_body.find_all("tr")
-    rows = []
-
-    for table_row in table_rows:
-        row = read_row(table_row)
-        #for i in range(len(row)):
-        #    row[i] = str(row[i])
-
-        rows.append(row)
-    
-    # Convert to DataFrame and return
-    df = pd.DataFrame(rows, columns=headers)
-    
-    return df
+    Combines tables of different stats about the same players (e.g. one per
+    position or stat group) into one row per player. Rows are aligned only
+    on the key columns, in one concatenate-and-group pass, so stat columns
+    that two tables share (e.g. "Ret Td") don't split or duplicate rows.
 
-def read_row(row):
+    Each player's row takes the first non-missing value of every column, in
+    the order of frames. Players with different values for the same column
+    (from two tables, or a table listing them twice) are printed and
+    counted as the run's "key_conflicts" (see instrumentation), and the
+    first value is kept. Rows missing a key column (e.g. team defenses
+    without a PFR ID) are keyed on the other key columns.
+
+    :param frames: list of DataFrames to combine
+    :param keys: the columns identifying a player, e.g. ["Name", "Team",
+                 "Pos"] or ["ID"]
+    :param context: what was combined (e.g. "nfl 2021 week 1"), for messages
+    :param return_conflicts: whether to also return the conflicts
+    :return: A DataFrame with one row per distinct key, and the columns of
+             every frame in the order they first appear. If return_conflicts,
+             a tuple of it and a DataFrame of the conflicts: the column, the
+             number of players with different values and a few of their keys
     """
-    :param table: HTML <tr> represented as a BeautifulSoup object
-    :return: A list of raw BeautifulSoup objects corresponding to each cell in the table
-    """ 
-    
-    cells_list = []
-    cells = row.find_all(["th", "td"])
-    # print(cells)
-    
-    for cell in cells:
-        #print("here")
-        colspan = 1
-        # Address multiple column cells
-        if cell.has_attr("colspan"):
-            colspan = int(cell["colspan"])
-            
-        for col in range(colspan):
-            cells_list.append(cell)
-            
-    return cells_list
-
-def get_dataframe_from_table_tr_headers(table):
+    import pandas as pd
+
+    frames = [frame for frame in frames if len(frame.columns) > 0]
+    if len(frames) == 0:
+        combined_df = pd.DataFrame(columns=keys)
+        return (combined_df, _get_conflicts_df([])) if return_conflicts \
+            else combined_df
+
+    # Columns given by more than one row of a player are checked for
+    # conflicts
+    column_counts = {}
+    for frame in frames:
+        for column in frame.columns:
+            column_counts[column] = column_counts.get(column, 0) + 1
+    shared_columns = [column for column, count in column_counts.items()
+                      if count > 1 and column not in keys]
+    for frame in frames:
+        present_keys = [key for key in keys if key in frame.columns]
+        if present_keys and frame.duplicated(subset=present_keys).any():
+            shared_columns = [column for column in column_counts
+                              if column not in keys]
+            break
+
+    # Missing key columns are treated as missing values. concat fills in
+    # columns a frame doesn't have, keeping the dtypes of the frames that do
+    concat_df = pd.concat(frames, axis=0, ignore_index=True)
+    for key in keys:
+        if key not in concat_df.columns:
+            concat_df[key] = None
+    columns = list(concat_df.columns)
+
+    groups = concat_df.groupby(keys, sort=False, dropna=False, observed=True)
+    combined_df = groups.first()
+
+    conflicts = []
+    if shared_columns:
+        num_values = groups[shared_columns].nunique(dropna=True)
+        for column in shared_columns:
+            is_conflict = (num_values[column] > 1).to_numpy()
+            if is_conflict.any():
+                examples = num_values.index[is_conflict][:3].tolist()
+                conflicts.append((column, int(is_conflict.sum()), examples))
+                print(f"{context}: {int(is_conflict.sum())} players have "
+                      f"different {column} values (e.g. {examples}), keeping "
+                      "the first")
+    if conflicts:
+        INSTRUMENTATION.count("key_conflicts",
+                              sum(conflict[1] for conflict in conflicts))
+
+    combined_df = combined_df.reset_index()[columns]
+    if return_conflicts:
+        return combined_df, _get_conflicts_df(conflicts)
+    return combined_df
+
+def _get_conflicts_df(conflicts):
+    """
+    :param conflicts: list of (column, number of players, examples) tuples
+    :return: the conflicts as a DataFrame
     """
-    :param table: HTML table represented as a string, with the header row being <tr>
-    :return: A DataFrame corresponding to the HTML table
+    import pandas as pd
+
+    return pd.DataFrame(conflicts, columns=["column", "players", "examples"])
+
+def read_raw_html_table(table):
+    """
+    :param table: HTML table represented as an lxml element
+    :return: A DataFrame in which entries are lxml elements
     """ 
-    
-    table_rows = table.find_all("tr")
-    
-    # Get headers
-    headers = []
-    for header in table_rows[0]:
-        headers.append(header.get_text())
-        
-    # Get contents
-    rows = []
-    for row_indx in range(1, len(table_rows)):
-        row = []
-        
-        table_row = table_rows[row_indx]
-        row_cells = table_row.find_all("td")
-            
-        for row_cell in row_cells:
-            row.append(row_cell.get_text())
-
-        rows.append(row)
-    
-    # Convert to DataFrame and return
-    df = pd.DataFrame(rows, columns=headers)
-    return df
+    return html_tables.read_table(table, raw=True, header_style="count")
 
 def get_team_name_from_abbreviation(abbreviation):
     abbreviations = {
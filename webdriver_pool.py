@@ -0,0 +1,186 @@
+"""
+File: webdriver_pool.py
+Description: Pool of browser sessions for loading pages in parallel
+"""
+
+import contextvars
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+
+class WebDriverPool:
+    """
+    Manages N webdriver sessions. Work items are handed to whichever session
+    is free, and results are returned in the order of the work items, so the
+    output doesn't depend on which session finished first. Politeness is
+    still enforced per host by the shared request scheduler.
+    """
+
+    def __init__(self, size: int = None, factory=None, drivers=None):
+        """
+        :param size: the number of sessions to start with factory
+        :param factory: function taking no arguments that starts a new
+                        webdriver session (e.g. create_chrome_driver)
+        :param drivers: existing webdriver sessions to use instead of
+                        starting new ones. These aren't quit by close()
+        """
+        if drivers is not None:
+            self._drivers = list(drivers)
+            self._owns_drivers = False
+        elif size is not None and factory is not None:
+            if size < 1:
+                raise ValueError(f"Pool size is {size}, should be at least 1")
+            self._drivers = [factory() for _ in range(size)]
+            self._owns_drivers = True
+        else:
+            raise ValueError("Either drivers, or both size and factory, "
+                             "must be given")
+
+        if len(self._drivers) == 0:
+            raise ValueError("The pool needs at least one webdriver")
+
+        self._idle = queue.Queue()
+        for driver in self._drivers:
+            self._idle.put(driver)
+
+    @property
+    def size(self):
+        """
+        :return: the number of sessions in the pool
+        """
+        return len(self._drivers)
+
+    def map(self, function, items):
+        """
+        Calls function(webdriver, item) for each item, running up to one call
+        per session at a time
+
+        :param function: function taking a webdriver and a work item
+        :param items: the work items (e.g. (position, team) tuples or game
+                      URLs)
+        :return: list of function's results, in the same order as items
+        """
+        items = list(items)
+
+        def run(item):
+            driver = self._idle.get()
+            try:
+                return function(driver, item)
+            finally:
+                self._idle.put(driver)
+
+        if self.size == 1:
+            return [run(item) for item in items]
+
+        # Each call runs in a copy of the caller's context, so it is recorded
+        # under the caller's run (see instrumentation)
+        def run_in_context(context, item):
+            return context.run(run, item)
+
+        contexts = [contextvars.copy_context() for _ in items]
+        with ThreadPoolExecutor(max_workers=self.size) as executor:
+            return list(executor.map(run_in_context, contexts, items))
+
+    def close(self):
+        """
+        Quits every session the pool started
+        """
+        if self._owns_drivers:
+            for driver in self._drivers:
+                try:
+                    driver.quit()
+                except Exception:
+                    pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, exc_traceback):
+        self.close()
+
+
+def as_pool(webdriver):
+    """
+    :param webdriver: a webdriver session or a WebDriverPool
+    :return: webdriver if it is already a pool, otherwise a pool wrapping the
+             single session
+    """
+    if isinstance(webdriver, WebDriverPool):
+        return webdriver
+    return WebDriverPool(drivers=[webdriver])
+
+
+class LazyWebDriver:
+    """
+    Stands in for a webdriver session, starting it with factory the first
+    time it is used, so a scraper whose pages all come from the page cache
+    never launches a browser. Pass a factory making these to a WebDriverPool
+    to start each session only when it is needed.
+    """
+
+    def __init__(self, factory):
+        """
+        :param factory: function taking no arguments that starts the session
+        """
+        self._factory = factory
+        self._driver = None
+        self._lock = threading.Lock()
+
+    @property
+    def started(self):
+        """
+        :return: whether the session has been started
+        """
+        return self._driver is not None
+
+    def __getattr__(self, name):
+        # Only called for attributes the proxy itself doesn't have
+        with self._lock:
+            if self._driver is None:
+                self._driver = self._factory()
+        return getattr(self._driver, name)
+
+    def quit(self):
+        """
+        Quits the session, if it was started
+        """
+        with self._lock:
+            driver, self._driver = self._driver, None
+        if driver is not None:
+            driver.quit()
+
+
+_factory_lock = threading.Lock()
+
+
+def create_chrome_driver():
+    """
+    Starts a Chrome session with the options used by the scraping notebooks
+
+    :return: a selenium Chrome webdriver
+    """
+    from selenium import webdriver
+    from selenium.webdriver.chrome.service import Service
+    from webdriver_manager.chrome import ChromeDriverManager
+
+    # ChromeDriverManager downloads the driver on first use; don't let
+    # several sessions race to install it
+    with _factory_lock:
+        service = Service(ChromeDriverManager().install())
+
+    options = webdriver.ChromeOptions()
+    options.add_argument("start-maximized")
+    options.add_argument('--disable-blink-features=AutomationControlled')
+    options.add_experimental_option("excludeSwitches", ["enable-automation"])
+    options.add_experimental_option('useAutomationExtension', False)
+    options.add_argument('--disable-features=UserAgentClientHint')
+    options.add_argument("window-size=1366,768")
+    options.add_argument("user-agent=Mozilla/5.0 (Windows NT 10.0; Win64; x64) "
+                         "AppleWebKit/537.36 (KHTML, like Gecko) "
+                         "Chrome/96.0.4664.110 Safari/537.36")
+
+    driver = webdriver.Chrome(service=service, options=options)
+    driver.execute_script("Object.defineProperty(navigator, 'webdriver', "
+                          "{get: () => undefined})")
+    return driver